@@ -11,19 +11,20 @@ from PyQt5.QtWidgets import QApplication, QDialog
 from ui.gui_widget import MappsConverter
 from config import Config
 
-config_ini = Config(script_path)
+# the guard keeps worker processes (e.g. of the solar panel computation) from starting the GUI again
+if __name__ == '__main__':
+    # settings changed in the GUI are written in the background, in batches
+    config_ini = Config(script_path, temp_flush_delay_s=1.0)
 
-app = QApplication(sys.argv)
-window = QDialog()
-window.setWindowTitle("JUICE - Mapps2Cosmographia")
+    app = QApplication(sys.argv)
+    window = QDialog()
+    window.setWindowTitle("JUICE - Mapps2Cosmographia")
 
+    def window_close_event(_):
+        sys.exit()
 
-def window_close_event(_):
-    sys.exit()
+    window.closeEvent = window_close_event
 
-
-window.closeEvent = window_close_event
-
-ui = MappsConverter(window, config_ini)
-window.show()
-sys.exit(app.exec_())
+    ui = MappsConverter(window, config_ini)
+    window.show()
+    sys.exit(app.exec_())
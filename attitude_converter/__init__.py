@@ -1,15 +1,68 @@
-from attitude_converter.attitude_provider import MappsReader, JuiceMex2Ker
+from typing import List, Tuple
 
+from attitude_converter.attitude_provider import MappsReader, JuiceMex2Ker, Mex2Ker, QuaternionStore, run_concurrently
+from attitude_converter.ck_cache import CkCache
+from attitude_converter.decimation import AttitudeDecimator
+from instrumentation import span
 
-def convert(mapps_attitude_path: str, output_ck_path: str) -> None:
+
+def convert(mapps_attitude_path: str, output_ck_path: str, backend: str = None, cache: CkCache = None,
+            decimation_tolerance_deg: float = None) -> None:
     """
     :param mapps_attitude_path: Path to attitude .csv file containing Quaternions.
-    :param output_ck_path: Path to output file to be created by Mex2Ker.
+    :param output_ck_path: Path to output CK file to be created.
+    :param backend: (optional) CK backend, one of Mex2Ker.BACKENDS. Defaults to Mex2Ker.DEFAULT_BACKEND.
+    :param cache: (optional) Cache of previously generated CK kernels.
+    :param decimation_tolerance_deg: (optional) If set, samples that SLERP between their neighbours recovers
+                                     to within this angle are dropped before the CK is generated. Ignored for
+                                     backends that don't interpolate with SLERP, see Mex2Ker.SLERP_BACKENDS.
     """
+    bc2ck = JuiceMex2Ker(backend)
+    if decimation_tolerance_deg and bc2ck.backend not in Mex2Ker.SLERP_BACKENDS:
+        print(" Warning: attitude decimation is skipped, its tolerance only holds for CK backends: {}."
+              .format(", ".join(Mex2Ker.SLERP_BACKENDS)))
+        decimation_tolerance_deg = None
+    decimator = AttitudeDecimator(decimation_tolerance_deg) if decimation_tolerance_deg else None
+    if cache is not None:
+        settings = bc2ck.cache_settings()
+        if decimator is not None:
+            settings['decimation'] = decimator.settings()
+        cache_key = CkCache.key(mapps_attitude_path, settings)
+        if cache.fetch(cache_key, output_ck_path):
+            print(" Using cached CK kernel {} for MAPPS attitude file: {}".format(cache_key, mapps_attitude_path))
+            return
     print(" Reading MAPPS attitude file: {}".format(mapps_attitude_path))
-    bc_reader = MappsReader()
-    bc_reader.read(mapps_attitude_path)
-    quats = bc_reader.quaternions
-    print(" Running Mex2Ker.")
-    bc2ck = JuiceMex2Ker()
-    bc2ck.convert(quats, output_ck_path)
+    with span('read_attitude') as counts:
+        bc_reader = MappsReader()
+        bc_reader.read(mapps_attitude_path)
+        quats = bc_reader.store
+        counts['quaternions'] = len(quats)
+    if decimator is not None:
+        with span('decimate_attitude') as counts:
+            quats = decimator.decimate(quats)
+            counts['quaternions'] = len(quats)
+        print(" Decimated attitude from {} to {} samples (ratio {:.1f}), max. error {:.4f} deg.".format(
+            decimator.report.input_samples, decimator.report.output_samples,
+            decimator.report.compression_ratio, decimator.report.max_error_deg))
+    print(" Generating CK kernel using '{}' backend.".format(bc2ck.backend))
+    with span('write_ck_' + bc2ck.backend) as counts:
+        bc2ck.convert(quats, output_ck_path)
+        counts['quaternions'] = len(quats)
+    if cache is not None:
+        cache.store(cache_key, output_ck_path)
+
+
+def convert_many(conversions: List[Tuple[str, str]], backend: str = None, max_workers: int = None,
+                 cache: CkCache = None, decimation_tolerance_deg: float = None) -> None:
+    """ Runs several conversions at once. Each conversion works in its own temporary workspace,
+    so conversions never share files.
+
+    :param conversions: List of (mapps_attitude_path, output_ck_path) tuples.
+    :param backend: (optional) CK backend, one of Mex2Ker.BACKENDS. Defaults to Mex2Ker.DEFAULT_BACKEND.
+    :param max_workers: (optional) Maximum number of simultaneous conversions.
+    :param cache: (optional) Cache of previously generated CK kernels.
+    :param decimation_tolerance_deg: (optional) Decimation tolerance, see convert().
+    """
+    run_concurrently([(output_ck_path, convert,
+                       (mapps_attitude_path, output_ck_path, backend, cache, decimation_tolerance_deg))
+                      for mapps_attitude_path, output_ck_path in conversions], max_workers)
@@ -1,10 +1,23 @@
 import re
 import os
-from subprocess import call
-from attitude_converter.time_utils import MappsTime
+import tempfile
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import Popen, TimeoutExpired
+from typing import Callable, List, Tuple, Union
+from collections import OrderedDict
+from attitude_converter.ck_cache import CkCache
+from attitude_converter.ck_writer import SpiceCkWriter
+from attitude_converter.time_utils import MappsTime, utc_str_to_epoch, parse_mapps_utc_batch, \
+    format_epochs_str_batch, utc_to_tdb_str_batch
+from instrumentation.cancellation import GenerationCancelled, activate, check_cancelled, current_token
+from instrumentation.progress import ProgressReporter, progress
 from sys import platform as _platform
 import shutil
 
+import numpy as np
+import spiceypy as spy
+
 
 class MappsTimedQuaternion:
 
@@ -23,84 +36,243 @@ class MappsTimedQuaternion:
         return '%s %f %f %f %f' % (self.get_time(), self.axis1, self.axis2, self.axis3, self.value)
 
 
+class QuaternionStore:
+    """ Columnar storage of a timed quaternion series.
+
+    Epochs are kept as UTC POSIX seconds in a float64 array, and quaternions as an
+    N x 4 float64 array in MAPPS order (value, axis1, axis2, axis3).
+    """
+
+    # An interval longer than GAP_FACTOR times the median sampling step is a gap in the data
+    GAP_FACTOR = 1.5
+
+    def __init__(self, epochs, quaternions, gap_starts=None):
+        """
+        :param gap_starts: (optional) Indices of the samples followed by a gap in the data, for samples that are
+                           not uniformly spaced. If not given, gaps are found from the sampling steps, see gaps().
+        """
+        self.epochs = np.ascontiguousarray(epochs, dtype=np.float64).reshape(-1)
+        self.quaternions = np.ascontiguousarray(quaternions, dtype=np.float64).reshape(-1, 4)
+        if len(self.epochs) != len(self.quaternions):
+            raise ValueError("Epoch and quaternion arrays have different lengths ({} != {})."
+                             .format(len(self.epochs), len(self.quaternions)))
+        self._gap_starts = None if gap_starts is None else np.asarray(gap_starts, dtype=np.int64).reshape(-1)
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def __getitem__(self, index: slice) -> 'QuaternionStore':
+        if not isinstance(index, slice):
+            raise TypeError("QuaternionStore can only be sliced.")
+        gap_starts = None
+        if self._gap_starts is not None and index.step in (None, 1):
+            start, stop, _ = index.indices(len(self))
+            gap_starts = self._gap_starts[(self._gap_starts >= start) & (self._gap_starts < stop - 1)] - start
+        return QuaternionStore(self.epochs[index], self.quaternions[index], gap_starts)
+
+    @staticmethod
+    def find_gaps(epochs: np.ndarray, gap_factor: float = GAP_FACTOR) -> np.ndarray:
+        """ :return: Indices of the epochs followed by a step longer than gap_factor times the median step. """
+        if len(epochs) < 2:
+            return np.empty(0, dtype=np.int64)
+        steps = np.diff(epochs)
+        return np.flatnonzero(steps > gap_factor * np.median(steps))
+
+    def gaps(self, gap_factor: float = GAP_FACTOR) -> np.ndarray:
+        """ :return: Indices of the samples followed by a gap, as given to the constructor, or else found with
+                     find_gaps(). There is no attitude data between such a sample and the next one.
+        """
+        if self._gap_starts is not None:
+            return self._gap_starts
+        return QuaternionStore.find_gaps(self.epochs, gap_factor)
+
+    def utc_strings(self) -> List[str]:
+        return format_epochs_str_batch(self.epochs, 'Z')
+
+    def tdb_strings(self) -> List[str]:
+        return utc_to_tdb_str_batch(self.epochs)[1]
+
+    def moc_lines(self, precision: int = 6) -> List[str]:
+        line_format = moc_line_format(precision)
+        return [line_format % (time, axis1, axis2, axis3, value)
+                for time, (value, axis1, axis2, axis3) in zip(self.tdb_strings(), self.quaternions.tolist())]
+
+    def export_moc_lines(self, fd, precision: int = 6, chunk_size: int = 10000,
+                         reporter: ProgressReporter = None) -> None:
+        """ Writes the MOC quaternion lines (one per row, each terminated by os.linesep) to
+        a binary sink. Only chunk_size lines are formatted in memory at a time.
+
+        :param reporter: (optional) Progress of the export, advanced by the number of written lines.
+        """
+        line_format = moc_line_format(precision) + os.linesep
+        for i in range(0, len(self), chunk_size):
+            check_cancelled()
+            chunk = self[i:i + chunk_size]
+            values = chunk.quaternions[:, [1, 2, 3, 0]].tolist()
+            # one % operation formats the whole chunk
+            fields = [field for time, quaternion in zip(chunk.tdb_strings(), values) for field in (time, *quaternion)]
+            fd.write(((line_format * len(chunk)) % tuple(fields)).encode())
+            if reporter is not None:
+                reporter.advance(len(chunk))
+
+    def to_timed_quaternions(self) -> List[MappsTimedQuaternion]:
+        return [MappsTimedQuaternion(utc, *quaternion)
+                for utc, quaternion in zip(self.utc_strings(), self.quaternions.tolist())]
+
+    @staticmethod
+    def from_timed_quaternions(quaternions: List[MappsTimedQuaternion]) -> 'QuaternionStore':
+        epochs = [q.time.utc.timestamp() for q in quaternions]
+        values = [(q.value, q.axis1, q.axis2, q.axis3) for q in quaternions]
+        return QuaternionStore(epochs, values)
+
+
+QuaternionSource = Union[QuaternionStore, List[MappsTimedQuaternion]]
+
+
+def moc_line_format(precision: int = 6) -> str:
+    """ Format string of a MOC quaternion line: TDB time, the three axes and the value. """
+    return '%s' + ' %.{}f'.format(int(precision)) * 4
+
+
+def as_quaternion_store(quaternions: QuaternionSource) -> QuaternionStore:
+    """ Returns the columnar form of either a QuaternionStore or a list of MappsTimedQuaternions. """
+    if isinstance(quaternions, QuaternionStore):
+        return quaternions
+    return QuaternionStore.from_timed_quaternions(quaternions)
+
+
 class MappsReader:
 
     EXPECTED_MSG = "Expected format<br>{julian-date}{doy-date}{utc-date}{q-value}{q-axis-1}{q-axis-2}{q-axis-3}"
+    CHUNK_SIZE = 65536
 
     def __init__(self):
-        self.quaternions = []
+        self.store = QuaternionStore([], [])
         self.errors = []
+        self._quaternions = None
+
+    @property
+    def quaternions(self) -> List[MappsTimedQuaternion]:
+        """ List of MappsTimedQuaternions, built from the columnar store on first access. """
+        if self._quaternions is None:
+            self._quaternions = self.store.to_timed_quaternions()
+        return self._quaternions
 
     def read(self, filename):
+        epochs = array('d')
+        values = array('d')
+        # UTC strings are collected in chunks and decoded in one vectorized pass per chunk
+        utc_chunk = []
+        line_chunk = []
+
+        def flush_utc_chunk():
+            try:
+                epochs.frombytes(parse_mapps_utc_batch(utc_chunk).tobytes())
+            except ValueError:
+                for line_number, utc in zip(line_chunk, utc_chunk):
+                    try:
+                        utc_str_to_epoch(utc)
+                    except ValueError:
+                        raise ValueError('Error processing %s (ln: %d)<br><br>%s' %
+                                         (os.path.basename(str(filename)),
+                                          line_number, MappsReader.EXPECTED_MSG))
+                raise
+            utc_chunk.clear()
+            line_chunk.clear()
+
+        check_cancelled()
+        # the position in pipes and other special files is no measure of progress
+        reporter = progress("Reading attitude", os.path.getsize(filename), 'bytes') if os.path.isfile(filename) \
+            else None
         with open(filename) as qmapps:
             nlines = 0
             for line in qmapps:
-                quat_match = re.match('(\d+).*', line)
+                quat_match = re.match(r'(\d+).*', line)
                 if quat_match:
                     fields = line.split(',')
                     try:
-                        tq = MappsTimedQuaternion(fields[2], fields[3], fields[4], fields[5], fields[6])
-                        self.quaternions.append(tq)
+                        utc = fields[2]
+                        quaternion = (float(fields[3]), float(fields[4]), float(fields[5]), float(fields[6]))
                     except:
                         raise ValueError('Error processing %s (ln: %d)<br><br>%s' %
                                          (os.path.basename(str(filename)),
                                           nlines, MappsReader.EXPECTED_MSG))
+                    utc_chunk.append(utc)
+                    line_chunk.append(nlines)
+                    values.extend(quaternion)
+                    if len(utc_chunk) >= MappsReader.CHUNK_SIZE:
+                        flush_utc_chunk()
+                        check_cancelled()
+                        if reporter is not None:
+                            # position of the underlying file, which is read ahead of the lines
+                            reporter.update(qmapps.buffer.tell())
 
                 nlines += 1
+            flush_utc_chunk()
+            if reporter is not None:
+                reporter.finish()
             print("  Lines read: {}".format(nlines))
+        self.store = QuaternionStore(np.frombuffer(epochs, dtype=np.float64),
+                                     np.frombuffer(values, dtype=np.float64))
+        self._quaternions = None
 
 
 class MocExporter:
 
     BLOCK_SIZE = 500000
-
-    def __init__(self, quaternions, leapsecond, sclk, object_name, object_id):
-        self.quaternions = quaternions
+    WRITE_BUFFER_SIZE = 1 << 20
+    INTERPOLATION_DEGREE = 9
+
+    def __init__(self, quaternions: QuaternionSource, leapsecond, sclk, object_name, object_id,
+                 precision: int = 6):
+        """
+        :param quaternions: Timed quaternions to be exported.
+        :param precision: Number of decimals of exported quaternion components.
+        """
+        self.quaternions = as_quaternion_store(quaternions)
         self.leapsecond = leapsecond
         self.sclk = sclk
         self.object_name = object_name
         self.object_id = object_id
+        self.precision = precision
         self.creation_date = '2016-10-07T17:00:00'
 
     @staticmethod
     def export_moc_header():
         return 'ESOC_TOS_GFI_ATTITUDE_FILE_VERSION = 1.0' + os.linesep
 
-    def export_moc_block(self, quaternion_list):
-
-        block_st = quaternion_list[0].get_time()
-        block_et = quaternion_list[-1].get_time()
-
-        block = os.linesep + 'META_START' + os.linesep
-        block += ('OBJECT_NAME          = %s' + os.linesep) % self.object_name
-        block += ('OBJECT_ID            = %d' + os.linesep) % self.object_id
-        block += 'REF_FRAME            = EME2000' + os.linesep
-        block += 'TIME_SYSTEM          = TDB' + os.linesep
-        block += ('START_TIME           = %s' + os.linesep) % block_st
-        block += ('STOP_TIME            = %s' + os.linesep) % block_et
-        block += ('CREATION_DATE        = %s' + os.linesep) % self.creation_date
-        block += 'FILE_TYPE            = ATTITUDE FILE' + os.linesep
-        block += 'VARIABLES_NUMBER     = 4' + os.linesep
-        block += 'DERIVATIVES_FLAG     = 0' + os.linesep
-        block += 'META_STOP' + os.linesep
-
-        for tquat in quaternion_list:
-            block += ("%s" + os.linesep) % (tquat.get_moc_format())
-
-        return block
+    def export_moc_block(self, quaternion_list: QuaternionSource, fd, reporter: ProgressReporter = None):
+        """ Streams one META section followed by its quaternion lines into fd. """
+        quaternion_store = as_quaternion_store(quaternion_list)
+        block_st, block_et = utc_to_tdb_str_batch(quaternion_store.epochs[[0, -1]])[1]
+
+        self.fd_write(os.linesep + 'META_START' + os.linesep, fd)
+        self.fd_write(('OBJECT_NAME          = %s' + os.linesep) % self.object_name, fd)
+        self.fd_write(('OBJECT_ID            = %d' + os.linesep) % self.object_id, fd)
+        self.fd_write('REF_FRAME            = EME2000' + os.linesep, fd)
+        self.fd_write('TIME_SYSTEM          = TDB' + os.linesep, fd)
+        self.fd_write(('START_TIME           = %s' + os.linesep) % block_st, fd)
+        self.fd_write(('STOP_TIME            = %s' + os.linesep) % block_et, fd)
+        self.fd_write(('CREATION_DATE        = %s' + os.linesep) % self.creation_date, fd)
+        self.fd_write('FILE_TYPE            = ATTITUDE FILE' + os.linesep, fd)
+        self.fd_write('VARIABLES_NUMBER     = 4' + os.linesep, fd)
+        self.fd_write('DERIVATIVES_FLAG     = 0' + os.linesep, fd)
+        self.fd_write('META_STOP' + os.linesep, fd)
+
+        quaternion_store.export_moc_lines(fd, self.precision, reporter=reporter)
 
     def export_moc(self, fd):
         self.fd_write(self.export_moc_header(), fd)
         total = len(self.quaternions)
-        for i in range(0, total, MocExporter.BLOCK_SIZE):
-            block = self.export_moc_block(self.quaternions[i:min(i + MocExporter.BLOCK_SIZE, total)])
-            self.fd_write(block, fd)
+        with progress("Exporting MOC", total, 'quaternions') as reporter:
+            for i in range(0, total, MocExporter.BLOCK_SIZE):
+                self.export_moc_block(self.quaternions[i:min(i + MocExporter.BLOCK_SIZE, total)], fd, reporter)
 
     def export_setup(self, fd):
         self.fd_write("\\begindata\n", fd)
         self.fd_write(f"LEAPSECONDS_FILE     = '{self.leapsecond}'{os.linesep}", fd)
         self.fd_write(f"SCLK_KERNEL          = '{self.sclk}'{os.linesep}", fd)
-        self.fd_write(f"INTERPOLATION_DEGREE = 9{os.linesep}", fd)
+        self.fd_write(f"INTERPOLATION_DEGREE = {MocExporter.INTERPOLATION_DEGREE}{os.linesep}", fd)
         self.fd_write(f"INTERPOLATION_METHOD = 'LAGRANGE'{os.linesep}", fd)
         self.fd_write(f"NOMINAL_SCLK_RATE    = 0.152587890625D-4{os.linesep}", fd)
         self.fd_write(f"APPEND_TO_OUTPUT     = 'NO'{os.linesep}", fd)
@@ -115,68 +287,172 @@ class MocExporter:
 
 
 class Mex2Ker:
-
-    def __init__(self, tls_path, tsc_path, object_name, object_id):
+    """ Converts timed quaternions into a CK kernel, using one of two backends:
+
+     - BACKEND_SPICE: CK segments are written in-process using spiceypy (SpiceCkWriter).
+     - BACKEND_MEX2KER: a MOC file is exported, and the Mex2Ker executable is run on it.
+    """
+
+    BACKEND_SPICE = 'spice'
+    BACKEND_MEX2KER = 'mex2ker'
+    BACKENDS = (BACKEND_SPICE, BACKEND_MEX2KER)
+    DEFAULT_BACKEND = BACKEND_SPICE
+    # backends whose kernels interpolate linearly between quaternions, as assumed by the tolerance of attitude
+    # decimation and of adaptive panel sampling. Mex2Ker interpolates with Lagrange polynomials instead.
+    SLERP_BACKENDS = (BACKEND_SPICE,)
+    DATA_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data')
+    MEX2KER_VERSION = '2.1.0'
+    # how often a running Mex2Ker is checked for cancellation, and how long it may take to exit when terminated
+    POLL_INTERVAL_S = 0.2
+    TERMINATE_TIMEOUT_S = 5.0
+
+    def __init__(self, tls_path, tsc_path, object_name, object_id, backend: str = None):
         self.tls_path = tls_path
         self.tsc_path = tsc_path
         self.object_name = object_name
         self.object_id = object_id
-
-    def convert(self, quaternions, ck_path):
-        # if the output path contains a space, Mex2Ker will fail. instead we output the
-        # file into current folder, and then move it into desired folder
-        if " " in ck_path:
-            output_ck_path = "temp_ck_file.ck"
-            print("Space in output CK path. Creating temporary file: {}".format(output_ck_path))
+        self.backend = backend if backend else Mex2Ker.DEFAULT_BACKEND
+        if self.backend not in Mex2Ker.BACKENDS:
+            raise ValueError("Unknown CK backend '{}'. Available backends: {}"
+                             .format(self.backend, ", ".join(Mex2Ker.BACKENDS)))
+
+    def cache_settings(self) -> dict:
+        """ Everything besides the input quaternions that determines the generated CK. Used as
+        part of the CkCache key, so it must change whenever the produced CK would change.
+        """
+        if self.backend == Mex2Ker.BACKEND_SPICE:
+            backend_version = "SpiceCkWriter {} ({})".format(SpiceCkWriter.VERSION, spy.tkvrsn("TOOLKIT"))
+            interpolation = "CK type {}".format(SpiceCkWriter.DEFAULT_CK_TYPE)
         else:
-            output_ck_path = ck_path
-
-        moc_exp = MocExporter(quaternions, self.tls_path, self.tsc_path, self.object_name, self.object_id)
-
-        working_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data')
-
-        moc_path = os.path.join(working_path, 'quaternion.moc')
-        with open(moc_path, 'wb') as moc_file:
-            moc_exp.export_moc(moc_file)
-
-        setup_path = os.path.join(working_path, 'quaternion.setup')
-        with open(setup_path, 'wb') as setup_file:
-            moc_exp.export_setup(setup_file)
-
-        try:
-            os.remove(output_ck_path)
-        except OSError:
-            print('pass')
-        original_cwd = os.getcwd()
-        os.chdir(working_path)
-
-        if _platform == "win32":
-            # Windows
-            return_val = call(['./mex2ker_win_32bit',
-                               '-input', 'quaternion.moc',
-                               '-setup', 'quaternion.setup',
-                               '-output', output_ck_path])
-            if return_val:
-                raise RuntimeError("Mex2Ker returned error value: {}".format(return_val))
+            backend_version = "MEX2KER {}".format(Mex2Ker.MEX2KER_VERSION)
+            interpolation = "LAGRANGE {}".format(MocExporter.INTERPOLATION_DEGREE)
+        return OrderedDict([
+            ('backend', self.backend),
+            ('backend_version', backend_version),
+            ('object_name', self.object_name),
+            ('object_id', self.object_id),
+            ('leapseconds_kernel', CkCache.file_hash(os.path.join(Mex2Ker.DATA_PATH, self.tls_path))),
+            ('sclk_kernel', CkCache.file_hash(os.path.join(Mex2Ker.DATA_PATH, self.tsc_path))),
+            ('interpolation', interpolation),
+        ])
+
+    def convert(self, quaternions: QuaternionSource, ck_path):
+        if self.backend == Mex2Ker.BACKEND_SPICE:
+            self._convert_in_process(quaternions, ck_path)
         else:
-            return_val = call(['./mex2ker_linux_32bit',
-                               '-input', 'quaternion.moc',
-                               '-setup', 'quaternion.setup',
-                               '-output', output_ck_path])
+            self._convert_mex2ker(quaternions, ck_path)
+
+    def _convert_in_process(self, quaternions: QuaternionSource, ck_path):
+        ck_writer = SpiceCkWriter(os.path.join(Mex2Ker.DATA_PATH, self.tls_path),
+                                  os.path.join(Mex2Ker.DATA_PATH, self.tsc_path),
+                                  self.object_name, self.object_id)
+        ck_writer.write(as_quaternion_store(quaternions), ck_path)
+
+    def _convert_mex2ker(self, quaternions: QuaternionSource, ck_path):
+        # Each conversion runs in its own temporary workspace, so that concurrent conversions
+        # don't share any files. Mex2Ker fails on paths containing spaces, hence all of its
+        # inputs and its output are referenced relative to the workspace.
+        workspace = tempfile.mkdtemp(prefix='mex2ker_')
+        try:
+            for kernel in (self.tls_path, self.tsc_path):
+                shutil.copy(os.path.join(Mex2Ker.DATA_PATH, kernel), workspace)
+
+            moc_exp = MocExporter(quaternions, self.tls_path, self.tsc_path, self.object_name, self.object_id)
+            with open(os.path.join(workspace, 'quaternion.moc'), 'wb',
+                      buffering=MocExporter.WRITE_BUFFER_SIZE) as moc_file:
+                moc_exp.export_moc(moc_file)
+            with open(os.path.join(workspace, 'quaternion.setup'), 'wb') as setup_file:
+                moc_exp.export_setup(setup_file)
+
+            return_val = self._run_mex2ker(['-input', 'quaternion.moc',
+                                            '-setup', 'quaternion.setup',
+                                            '-output', 'output.ck'], workspace)
             if return_val:
                 raise RuntimeError("Mex2Ker returned error value: {}".format(return_val))
 
-        # if we had a space, we move the output ck into the desired location
-        if " " in ck_path:
-            print(f'Current directory: {os.getcwd()}')
-            print('Moving file "{}" to "{}"'.format(output_ck_path, ck_path))
-            shutil.move(output_ck_path, ck_path)
-        os.chdir(original_cwd)
+            if os.path.exists(ck_path):
+                os.remove(ck_path)
+            shutil.move(os.path.join(workspace, 'output.ck'), ck_path)
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    def _run_mex2ker(self, arguments: List[str], workspace: str) -> int:
+        """ Runs the Mex2Ker executable, and terminates it if the generation is cancelled meanwhile.
+
+        :return: Exit code of Mex2Ker.
+        :raises GenerationCancelled: If the generation was cancelled, after Mex2Ker has exited.
+        """
+        token = current_token()
+        process = Popen([self.executable_path()] + arguments, cwd=workspace)
+        while True:
+            try:
+                return_val = process.wait(timeout=Mex2Ker.POLL_INTERVAL_S)
+                break
+            except TimeoutExpired:
+                if token is not None and token.is_cancelled:
+                    process.terminate()
+                    try:
+                        return_val = process.wait(timeout=Mex2Ker.TERMINATE_TIMEOUT_S)
+                    except TimeoutExpired:
+                        process.kill()
+                        return_val = process.wait()
+                    break
+        # also when Mex2Ker was interrupted together with this process, e.g. by Ctrl+C in a terminal
+        if token is not None:
+            token.raise_if_cancelled()
+        return return_val
+
+    @staticmethod
+    def executable_path() -> str:
+        if _platform == "win32":
+            return os.path.join(Mex2Ker.DATA_PATH, 'mex2ker_win_32bit.exe')
+        return os.path.join(Mex2Ker.DATA_PATH, 'mex2ker_linux_32bit')
+
+    @staticmethod
+    def convert_concurrently(jobs: List[Tuple['Mex2Ker', QuaternionSource, str]], max_workers: int = None) -> None:
+        """ Runs several conversions at once in a thread pool. Mex2Ker conversions run in parallel
+        as separate processes, in-process SPICE conversions are serialized on SPICE_LOCK.
+
+        :param jobs: List of (converter, quaternions, ck_path) tuples.
+        :param max_workers: (optional) Maximum number of simultaneous conversions.
+        :raises RuntimeError: If any of the conversions failed, after all of them have finished.
+        """
+        run_concurrently([(ck_path, m2k.convert, (quaternions, ck_path)) for m2k, quaternions, ck_path in jobs],
+                         max_workers)
+
+
+def run_concurrently(tasks: List[Tuple[str, Callable, tuple]], max_workers: int = None) -> list:
+    """ Runs tasks in a thread pool and waits for all of them to finish.
+
+    :param tasks: List of (label, function, args) tuples. The label identifies the task in error messages.
+    :param max_workers: (optional) Maximum number of tasks running at once.
+    :return: List of results in the order of tasks.
+    :raises GenerationCancelled: If the generation of the calling thread was cancelled.
+    :raises RuntimeError: If any of the tasks failed, chained to the first failure.
+    """
+    # the cancellation token is thread-local, so the tasks check the token of the calling thread
+    token = current_token()
+
+    def run_task(function: Callable, args: tuple):
+        with activate(token):
+            return function(*args)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_task, function, args) for _, function, args in tasks]
+    errors = [(task[0], future.exception()) for task, future in zip(tasks, futures) if future.exception()]
+    for _, error in errors:
+        if isinstance(error, GenerationCancelled):
+            raise error
+    if errors:
+        raise RuntimeError("{} of {} tasks failed:\n{}".format(
+            len(errors), len(tasks), "\n".join("{}: {}".format(label, error) for label, error in errors))) \
+            from errors[0][1]
+    return [future.result() for future in futures]
 
 
 class JuiceMex2Ker(Mex2Ker):
 
-    def __init__(self):
+    def __init__(self, backend: str = None):
 
         tls_path = 'naif0011.tls'
         tsc_path = 'juice_fict_20160326.tsc'
@@ -187,12 +463,12 @@ class JuiceMex2Ker(Mex2Ker):
 
         object_name = 'JUICE'
         object_id = 28
-        Mex2Ker.__init__(self, tls_path, tsc_path, object_name, object_id)
+        Mex2Ker.__init__(self, tls_path, tsc_path, object_name, object_id, backend)
 
 
 class PanelMex2Ker(Mex2Ker):
 
-    def __init__(self):
+    def __init__(self, backend: str = None):
 
         tls_path = 'naif0011.tls'
         tsc_path = 'solar_panel_fict_20160326.tsc'
@@ -203,6 +479,6 @@ class PanelMex2Ker(Mex2Ker):
 
         object_name = 'STARDUST'
         object_id = 29
-        Mex2Ker.__init__(self, tls_path, tsc_path, object_name, object_id)
+        Mex2Ker.__init__(self, tls_path, tsc_path, object_name, object_id, backend)
 
 
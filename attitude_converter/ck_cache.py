@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from typing import List
+
+CacheEntry = namedtuple('CacheEntry', ['key', 'path', 'size', 'last_used'])
+
+
+def default_cache_path() -> str:
+    """ Per-user cache directory, e.g. ~/.cache/mapps2cosmographia/ck or %LOCALAPPDATA%/mapps2cosmographia/ck """
+    if sys.platform == "win32":
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'mapps2cosmographia', 'ck')
+
+
+def default_file_mode() -> int:
+    """ Permissions of a newly created file under the current umask, e.g. 0o644 for umask 022.
+    Files created with tempfile.mkstemp() are only readable by their owner, and get these permissions
+    before they are shared. """
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+class CkCache:
+    """ Content-addressed on-disk cache of generated CK kernels.
+
+    Entries are keyed by a hash of the MAPPS attitude file contents and of the converter
+    settings (including the backend version). Hits are hard-linked into the output folder
+    where possible, and copied otherwise. The cache is bounded in size, and the least
+    recently used entries are evicted first.
+    """
+
+    CK_EXTENSION = '.ck'
+    HASH_CHUNK_SIZE = 1 << 20
+
+    def __init__(self, path: str = None, max_size_bytes: int = 2 * 1024 ** 3):
+        """
+        :param path: (optional) Cache directory. Defaults to default_cache_path().
+        :param max_size_bytes: Size limit of the cache, enforced after each insertion.
+        """
+        self.path = os.path.abspath(path if path else default_cache_path())
+        self.max_size_bytes = max_size_bytes
+
+    @staticmethod
+    def file_hash(file_path: str) -> str:
+        sha = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CkCache.HASH_CHUNK_SIZE), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    @staticmethod
+    def key(attitude_path: str, settings: dict) -> str:
+        """ Computes the cache key of a conversion.
+
+        :param attitude_path: Path to MAPPS attitude .csv file.
+        :param settings: JSON-serializable converter settings, see Mex2Ker.cache_settings().
+        :return: Hex digest identifying the generated CK.
+        """
+        sha = hashlib.sha256()
+        sha.update(CkCache.file_hash(attitude_path).encode())
+        sha.update(json.dumps(settings, sort_keys=True).encode())
+        return sha.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[0:2], key + CkCache.CK_EXTENSION)
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """ Places the cached CK for key at output_path, if there is one.
+
+        :return: True on a cache hit.
+        """
+        entry_path = self._entry_path(key)
+        if not os.path.exists(entry_path):
+            return False
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        try:
+            # entries stored before they were made readable to everyone are repaired before they are shared
+            mode = default_file_mode()
+            if stat.S_IMODE(os.stat(entry_path).st_mode) != mode:
+                os.chmod(entry_path, mode)
+            os.link(entry_path, output_path)
+        except OSError:
+            # a copy gets the default permissions
+            shutil.copyfile(entry_path, output_path)
+        # mark entry as most recently used
+        os.utime(entry_path)
+        return True
+
+    def store(self, key: str, ck_path: str) -> None:
+        """ Adds a generated CK to the cache, and evicts old entries if the cache is too large. """
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        # copy under a temporary name first, so that concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(ck_path, tmp_path)
+            # entries are hard-linked into scenarios, which other users and viewers must be able to read
+            os.chmod(tmp_path, default_file_mode())
+            os.replace(tmp_path, entry_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def entries(self) -> List[CacheEntry]:
+        """ :return: All cache entries, least recently used first. """
+        entries = []
+        if not os.path.isdir(self.path):
+            return entries
+        for folder in os.listdir(self.path):
+            folder_path = os.path.join(self.path, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for file_name in os.listdir(folder_path):
+                if not file_name.endswith(CkCache.CK_EXTENSION):
+                    continue
+                entry_path = os.path.join(folder_path, file_name)
+                entry_stat = os.stat(entry_path)
+                entries.append(CacheEntry(file_name[:-len(CkCache.CK_EXTENSION)], entry_path,
+                                          entry_stat.st_size, entry_stat.st_mtime))
+        return sorted(entries, key=lambda e: e.last_used)
+
+    def size(self) -> int:
+        return sum(e.size for e in self.entries())
+
+    def evict(self, max_size_bytes: int = None) -> List[CacheEntry]:
+        """ Removes least recently used entries until the cache fits into max_size_bytes.
+
+        :param max_size_bytes: (optional) Size limit, defaults to the limit of this cache.
+        :return: List of removed entries.
+        """
+        if max_size_bytes is None:
+            max_size_bytes = self.max_size_bytes
+        entries = self.entries()
+        total = sum(e.size for e in entries)
+        removed = []
+        for entry in entries:
+            if total <= max_size_bytes:
+                break
+            os.remove(entry.path)
+            total -= entry.size
+            removed.append(entry)
+        return removed
+
+    def purge(self, older_than_days: float = None) -> List[CacheEntry]:
+        """ Removes all entries, or only those not used in the last older_than_days days.
+
+        :return: List of removed entries.
+        """
+        threshold = time.time() - older_than_days * 86400 if older_than_days is not None else float('inf')
+        removed = [e for e in self.entries() if e.last_used < threshold]
+        for entry in removed:
+            os.remove(entry.path)
+        return removed
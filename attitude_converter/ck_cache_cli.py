@@ -0,0 +1,39 @@
+""" Command-line interface of the CK cache.
+
+Usage: python -m attitude_converter.ck_cache_cli [--path PATH] {list,info,purge}
+"""
+import argparse
+import time
+from typing import List
+
+from attitude_converter.ck_cache import CkCache, default_cache_path
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect or purge the cache of generated CK kernels.")
+    parser.add_argument('--path', default=None, help="Cache directory (default: {})".format(default_cache_path()))
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('list', help="List cache entries, least recently used first.")
+    subparsers.add_parser('info', help="Show cache location, number of entries and total size.")
+    purge_parser = subparsers.add_parser('purge', help="Remove cache entries.")
+    purge_parser.add_argument('--older-than-days', type=float, default=None,
+                              help="Only remove entries not used for this many days.")
+    args = parser.parse_args(argv)
+
+    cache = CkCache(args.path)
+    if args.command == 'list':
+        for entry in cache.entries():
+            print("{}  {:>12d} B  {}".format(entry.key, entry.size,
+                                              time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.last_used))))
+    elif args.command == 'purge':
+        removed = cache.purge(args.older_than_days)
+        print("Removed {} entries ({} B).".format(len(removed), sum(e.size for e in removed)))
+    else:
+        entries = cache.entries()
+        print("Cache directory: {}".format(cache.path))
+        print("Entries: {}".format(len(entries)))
+        print("Total size: {} B".format(sum(e.size for e in entries)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import os
+import threading
+
+import numpy as np
+import spiceypy as spy
+
+from attitude_converter.time_utils import utc_to_et_batch
+from instrumentation.cancellation import check_cancelled
+
+# CSPICE is not thread-safe, and furnished kernels live in a process-global pool.
+# Every in-process SPICE operation of the converter must hold this lock.
+SPICE_LOCK = threading.RLock()
+
+
+class SpiceCkWriter:
+    """ Writes CK kernels in-process through the spiceypy CK writer routines.
+
+    This is the in-process alternative to running the Mex2Ker executable. Quaternions are
+    taken straight from a QuaternionStore, so no MOC text file is produced.
+    """
+
+    # Bump whenever the produced CK files change, this invalidates cached kernels
+    VERSION = 2
+    SEGMENT_SIZE = 500000
+    # SCLK encoding takes a few microseconds per record, so cancellation is checked every CANCEL_CHECK_SIZE records
+    CANCEL_CHECK_SIZE = 10000
+    SUPPORTED_CK_TYPES = (2, 3)
+    DEFAULT_CK_TYPE = 3
+    # Nominal rate of the fictional SCLK kernels in seconds per tick (as NOMINAL_SCLK_RATE in Mex2Ker setup)
+    NOMINAL_SCLK_RATE = 0.152587890625e-4
+
+    def __init__(self, tls_path: str, tsc_path: str, object_name: str, object_id: int, ck_type: int = DEFAULT_CK_TYPE):
+        """
+        :param tls_path: Path to leapseconds kernel.
+        :param tsc_path: Path to SCLK kernel of the object.
+        :param object_name: Name of the object, used as internal file name and segment ID.
+        :param object_id: Object ID as in the MOC file, i.e. 28 for CK ID -28000 and SCLK ID -28.
+        :param ck_type: CK segment type, 3 (linear interpolation) or 2 (constant between samples).
+        """
+        if ck_type not in SpiceCkWriter.SUPPORTED_CK_TYPES:
+            raise ValueError("Unsupported CK type: {}. Supported types are {}."
+                             .format(ck_type, SpiceCkWriter.SUPPORTED_CK_TYPES))
+        self.tls_path = tls_path
+        self.tsc_path = tsc_path
+        self.object_name = object_name
+        self.object_id = object_id
+        self.ck_type = ck_type
+
+    @property
+    def instrument_id(self) -> int:
+        return -1000 * self.object_id
+
+    @property
+    def sclk_id(self) -> int:
+        return -self.object_id
+
+    @staticmethod
+    def spice_quaternions(quaternions: np.ndarray) -> np.ndarray:
+        """ Converts N x 4 MAPPS quaternions (value, axis1, axis2, axis3) into SPICE quaternions
+        of the C-matrix (J2000 to body frame). Both conventions share the scalar part, while
+        the vector part of the SPICE quaternion has the opposite sign.
+        """
+        spice = -np.asarray(quaternions, dtype=np.float64)
+        spice[:, 0] = -spice[:, 0]
+        return spice
+
+    def write(self, quaternion_store, ck_path: str) -> None:
+        """ Writes the quaternions into a new CK file. An existing file at ck_path is replaced.
+
+        :param quaternion_store: QuaternionStore with strictly increasing epochs. The CK has no pointing
+                                 inside the gaps of the store, see QuaternionStore.gaps().
+        :param ck_path: Path of CK file to be created.
+        """
+        if len(quaternion_store) == 0:
+            raise ValueError("No quaternions to write into CK kernel.")
+        ets = utc_to_et_batch(quaternion_store.epochs)
+        gaps = quaternion_store.gaps()
+        quaternions = self.spice_quaternions(quaternion_store.quaternions)
+
+        if os.path.exists(ck_path):
+            os.remove(ck_path)
+        with SPICE_LOCK:
+            spy.furnsh(self.tls_path)
+            spy.furnsh(self.tsc_path)
+            try:
+                sclks = np.empty(len(ets))
+                for i in range(0, len(ets), SpiceCkWriter.CANCEL_CHECK_SIZE):
+                    check_cancelled()
+                    sclks[i:i + SpiceCkWriter.CANCEL_CHECK_SIZE] = [
+                        spy.sce2c(self.sclk_id, et) for et in ets[i:i + SpiceCkWriter.CANCEL_CHECK_SIZE].tolist()]
+            finally:
+                spy.unload(self.tsc_path)
+                spy.unload(self.tls_path)
+
+            handle = spy.ckopn(ck_path, self.object_name, 0)
+            try:
+                for i in range(0, len(sclks), SpiceCkWriter.SEGMENT_SIZE):
+                    check_cancelled()
+                    # segments share their boundary record, so that there is no coverage gap between them
+                    segment_gaps = gaps[(gaps >= i) & (gaps < i + SpiceCkWriter.SEGMENT_SIZE)] - i
+                    self._write_segment(handle, sclks[i:i + SpiceCkWriter.SEGMENT_SIZE + 1],
+                                        quaternions[i:i + SpiceCkWriter.SEGMENT_SIZE + 1], segment_gaps)
+            except Exception:
+                # ckcls refuses to close a file without segments, so the file is closed at DAF level
+                spy.dafcls(handle)
+                os.remove(ck_path)
+                raise
+            spy.ckcls(handle)
+
+    def _write_segment(self, handle: int, sclks: np.ndarray, quaternions: np.ndarray, gaps: np.ndarray) -> None:
+        """ Writes one segment covering the given records.
+
+        :param sclks: Encoded SCLK times of the records.
+        :param quaternions: SPICE quaternions of the records.
+        :param gaps: Indices of the records followed by a gap, where the segment has no pointing.
+        """
+        n = len(sclks)
+        segment_id = "{} ATTITUDE".format(self.object_name)[0:40]
+        angular_velocities = np.zeros((n, 3))
+        if self.ck_type == 3:
+            # SPICE only interpolates between records of the same interval, so each gap starts a new interval
+            starts = sclks[np.append(0, gaps + 1)]
+            spy.ckw03(handle, sclks[0], sclks[-1], self.instrument_id, "J2000", False, segment_id,
+                      n, sclks, quaternions, angular_velocities, len(starts), starts)
+        else:
+            # each record is constant until the next one, the last record and the records before a gap are held
+            # for one median sampling step, at most until the next record
+            held = np.append(gaps, n - 1)
+            stops = np.append(sclks[1:], np.inf)
+            stops[held] = np.minimum(sclks[held] + (np.median(np.diff(sclks)) if n > 1 else 1.0), stops[held])
+            spy.ckw02(handle, sclks[0], stops[-1], self.instrument_id, "J2000", segment_id,
+                      n, sclks, stops, quaternions, angular_velocities,
+                      np.full(n, SpiceCkWriter.NOMINAL_SCLK_RATE))
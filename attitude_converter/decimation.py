@@ -0,0 +1,149 @@
+from collections import namedtuple, OrderedDict
+from typing import List, Tuple
+
+import numpy as np
+
+from attitude_converter.attitude_provider import QuaternionStore
+from attitude_converter.rotations import quaternion_angles, slerp
+from instrumentation.cancellation import check_cancelled
+from instrumentation.progress import ProgressReporter, progress
+
+
+class DecimationReport(namedtuple('DecimationReport', ['input_samples', 'output_samples', 'max_error_deg'])):
+    """ Outcome of a decimation: sample counts before and after, and the largest angle between a dropped
+    sample and its SLERP interpolation from the kept samples around it.
+    """
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.input_samples / self.output_samples if self.output_samples else 1.0
+
+
+class AttitudeDecimator:
+    """ Drops attitude samples which can be recovered by SLERP between the kept samples around them, to within
+    an angular tolerance.
+
+    Samples on both sides of a gap in the data, and samples where the angular rate changes abruptly (start
+    and end of slews), are always kept. The tolerance is exact for linear interpolation between samples,
+    as done by the 'spice' CK backend. It does not hold for the Lagrange interpolation of Mex2Ker, so
+    convert() only decimates for backends in Mex2Ker.SLERP_BACKENDS.
+    """
+
+    # Bump whenever the selection of samples changes, this invalidates cached kernels
+    VERSION = 1
+    GAP_FACTOR = QuaternionStore.GAP_FACTOR
+    # Angular rate change between consecutive intervals that marks a slew boundary, in degrees per second
+    SLEW_RATE_CHANGE_DEG_S = 0.005
+
+    def __init__(self, tolerance_deg: float, gap_factor: float = GAP_FACTOR,
+                 slew_rate_change_deg_s: float = SLEW_RATE_CHANGE_DEG_S):
+        """
+        :param tolerance_deg: Largest allowed angle between a dropped sample and its interpolation, in degrees.
+        :param gap_factor: Intervals longer than gap_factor times the median sampling step are gaps.
+        :param slew_rate_change_deg_s: Change of angular rate between consecutive intervals, in degrees per second,
+                                       above which a sample is a slew boundary.
+        """
+        if tolerance_deg <= 0:
+            raise ValueError("Decimation tolerance must be positive, got {}.".format(tolerance_deg))
+        self.tolerance_deg = tolerance_deg
+        self.gap_factor = gap_factor
+        self.slew_rate_change_deg_s = slew_rate_change_deg_s
+        self.report = None
+
+    def settings(self) -> OrderedDict:
+        """ Everything that determines the selected samples, for use in the CkCache key. """
+        return OrderedDict([
+            ('version', AttitudeDecimator.VERSION),
+            ('tolerance_deg', self.tolerance_deg),
+            ('gap_factor', self.gap_factor),
+            ('slew_rate_change_deg_s', self.slew_rate_change_deg_s),
+        ])
+
+    def _forced_indices(self, epochs: np.ndarray, quaternions: np.ndarray, gaps: np.ndarray) -> np.ndarray:
+        """ :return: Sorted indices of samples that are always kept: end points, gap sides and slew boundaries. """
+        n = len(epochs)
+        steps = np.diff(epochs)
+        rates = np.degrees(quaternion_angles(quaternions[:-1], quaternions[1:])) / np.maximum(steps, 1e-9)
+        # rate changes across gaps are meaningless, the gap sides are kept anyway
+        slew_boundaries = np.flatnonzero(np.abs(np.diff(rates)) > self.slew_rate_change_deg_s) + 1
+        return np.unique(np.concatenate(([0, n - 1], gaps, gaps + 1, slew_boundaries)))
+
+    def _span_error(self, epochs: np.ndarray, quaternions: np.ndarray, start: int, end: int) -> float:
+        """ :return: Largest angle in radians between the samples strictly inside start..end and their SLERP
+                     interpolation between the samples start and end.
+        """
+        if end - start < 2:
+            return 0.0
+        inner = slice(start + 1, end)
+        t = (epochs[inner] - epochs[start]) / (epochs[end] - epochs[start])
+        count = end - start - 1
+        interpolated = slerp(np.broadcast_to(quaternions[start], (count, 4)),
+                             np.broadcast_to(quaternions[end], (count, 4)), t)
+        return float(quaternion_angles(interpolated, quaternions[inner]).max())
+
+    def _decimate_span(self, epochs: np.ndarray, quaternions: np.ndarray, start: int, end: int,
+                       tolerance: float, reporter: ProgressReporter = None) -> Tuple[List[int], float]:
+        """ Greedily picks samples between two forced samples. From each kept sample, the next one is found by
+        doubling the span while it stays within tolerance, and then by binary search.
+
+        :param reporter: (optional) Progress of the decimation, advanced by the number of processed samples.
+        :return: 2-tuple of the indices kept strictly between start and end, and the largest error in radians.
+        """
+        kept = []
+        max_error = 0.0
+        anchor = start
+        while anchor < end:
+            check_cancelled()
+            good, good_error = anchor + 1, 0.0
+            bad = None
+            step = 2
+            while good < end:
+                candidate = min(anchor + step, end)
+                error = self._span_error(epochs, quaternions, anchor, candidate)
+                if error > tolerance:
+                    bad = candidate
+                    break
+                good, good_error = candidate, error
+                step *= 2
+            while bad is not None and bad - good > 1:
+                candidate = (good + bad) // 2
+                error = self._span_error(epochs, quaternions, anchor, candidate)
+                if error > tolerance:
+                    bad = candidate
+                else:
+                    good, good_error = candidate, error
+            max_error = max(max_error, good_error)
+            if good < end:
+                kept.append(good)
+            if reporter is not None:
+                reporter.advance(good - anchor)
+            anchor = good
+        return kept, max_error
+
+    def decimate(self, quaternion_store: QuaternionStore) -> QuaternionStore:
+        """ Decimates the attitude, and leaves a DecimationReport in the report attribute.
+
+        :param quaternion_store: QuaternionStore with strictly increasing epochs.
+        :return: QuaternionStore with the kept samples.
+        """
+        n = len(quaternion_store)
+        if n < 3:
+            self.report = DecimationReport(n, n, 0.0)
+            return quaternion_store
+        epochs = quaternion_store.epochs
+        quaternions = quaternion_store.quaternions
+        tolerance = np.radians(self.tolerance_deg)
+
+        gaps = quaternion_store.gaps(self.gap_factor)
+        forced = self._forced_indices(epochs, quaternions, gaps)
+        kept = [forced]
+        max_error = 0.0
+        with progress("Decimating attitude", n - 1, 'samples') as reporter:
+            for start, end in zip(forced[:-1].tolist(), forced[1:].tolist()):
+                span_kept, span_error = self._decimate_span(epochs, quaternions, start, end, tolerance, reporter)
+                kept.append(np.array(span_kept, dtype=np.int64))
+                max_error = max(max_error, span_error)
+        kept = np.unique(np.concatenate(kept))
+        self.report = DecimationReport(n, len(kept), float(np.degrees(max_error)))
+        # the kept samples are not uniformly spaced, so their gaps are passed on
+        return QuaternionStore(epochs[kept], quaternions[kept], np.searchsorted(kept, gaps))
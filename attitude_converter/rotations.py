@@ -0,0 +1,94 @@
+import numpy as np
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """ :return: N x 3 array of the given vectors scaled to unit length. """
+    vectors = np.asarray(vectors, dtype=np.float64)
+    return vectors / np.linalg.norm(vectors, axis=1)[:, np.newaxis]
+
+
+def frames_from_direction(directions: np.ndarray, ups: np.ndarray) -> np.ndarray:
+    """ Builds the right-handed frames whose Z axis points along direction, and whose Y axis
+    lies in the plane of direction and up.
+
+    :param directions: N x 3 array of direction vectors.
+    :param ups: N x 3 array of "upwards" orientation vectors.
+    :return: N x 3 x 3 array of rotation matrices, with the frame axes X, Y, Z as columns.
+    """
+    z = normalize(directions)
+    x = normalize(np.cross(normalize(ups), z))
+    y = normalize(np.cross(z, x))
+    return np.stack((x, y, z), axis=2)
+
+
+def matrices_to_quaternions(matrices: np.ndarray) -> np.ndarray:
+    """ Converts rotation matrices into quaternions (r, i, j, k) with a non-negative scalar part.
+
+    Uses Shepperd's method: the quaternion component of largest magnitude is computed from the
+    diagonal, and the other three from the off-diagonal terms. This stays accurate for rotations
+    close to 180 degrees, where the trace-only formula divides by a vanishing scalar part.
+
+    :param matrices: N x 3 x 3 array of rotation matrices.
+    :return: N x 4 array of unit quaternions.
+    """
+    m = np.asarray(matrices, dtype=np.float64)
+    m00, m11, m22 = m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]
+    # 4 * q_k^2 - 1 for k = r, i, j, k
+    pivots = np.stack((m00 + m11 + m22, m00 - m11 - m22, m11 - m00 - m22, m22 - m00 - m11), axis=1)
+    branch = np.argmax(pivots, axis=1)
+    pivot = 0.5 * np.sqrt(1.0 + np.take_along_axis(pivots, branch[:, np.newaxis], axis=1)[:, 0])
+    scale = 0.25 / pivot
+
+    r_terms = m[:, 2, 1] - m[:, 1, 2], m[:, 0, 2] - m[:, 2, 0], m[:, 1, 0] - m[:, 0, 1]
+    ij = m[:, 0, 1] + m[:, 1, 0]
+    ik = m[:, 0, 2] + m[:, 2, 0]
+    jk = m[:, 1, 2] + m[:, 2, 1]
+
+    # off-diagonal combinations for each branch, as rows (r, i, j, k) with the pivot left at zero
+    zeros = np.zeros_like(pivot)
+    candidates = np.stack((
+        np.stack((zeros, r_terms[0], r_terms[1], r_terms[2]), axis=1),
+        np.stack((r_terms[0], zeros, ij, ik), axis=1),
+        np.stack((r_terms[1], ij, zeros, jk), axis=1),
+        np.stack((r_terms[2], ik, jk, zeros), axis=1),
+    ), axis=1)
+    rows = np.arange(len(m))
+    quaternions = candidates[rows, branch] * scale[:, np.newaxis]
+    quaternions[rows, branch] = pivot
+    quaternions[quaternions[:, 0] < 0] *= -1.0
+    return quaternions
+
+
+def _half_angles(q0: np.ndarray, q1: np.ndarray) -> np.ndarray:
+    """ Angles between the quaternions as 4D unit vectors, after flipping q1 onto the same hemisphere as q0.
+    Uses the atan2 of chord lengths, which unlike arccos of the dot product stays accurate for tiny angles.
+    """
+    aligned = np.where(np.einsum('ij,ij->i', q0, q1)[:, np.newaxis] < 0.0, -q1, q1)
+    return 2.0 * np.arctan2(np.linalg.norm(q0 - aligned, axis=1), np.linalg.norm(q0 + aligned, axis=1))
+
+
+def quaternion_angles(q0: np.ndarray, q1: np.ndarray) -> np.ndarray:
+    """ :return: Array of rotation angles in radians between the N x 4 quaternion arrays q0 and q1. """
+    return 2.0 * _half_angles(np.asarray(q0, dtype=np.float64), np.asarray(q1, dtype=np.float64))
+
+
+def slerp(q0: np.ndarray, q1: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """ Spherical linear interpolation between unit quaternions, along the shorter arc.
+
+    :param q0: N x 4 array of quaternions at t = 0.
+    :param q1: N x 4 array of quaternions at t = 1.
+    :param t: Array of N interpolation parameters.
+    :return: N x 4 array of interpolated quaternions.
+    """
+    q0 = np.asarray(q0, dtype=np.float64)
+    q1 = np.asarray(q1, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)[:, np.newaxis]
+    theta = _half_angles(q0, q1)[:, np.newaxis]
+    q1 = np.where(np.einsum('ij,ij->i', q0, q1)[:, np.newaxis] < 0.0, -q1, q1)
+    sin_theta = np.sin(theta)
+    # nearly identical quaternions fall back to linear interpolation
+    small = sin_theta < 1e-12
+    safe_sin_theta = np.where(small, 1.0, sin_theta)
+    w0 = np.where(small, 1.0 - t, np.sin((1.0 - t) * theta) / safe_sin_theta)
+    w1 = np.where(small, t, np.sin(t * theta) / safe_sin_theta)
+    return normalize(w0 * q0 + w1 * q1)
@@ -1,95 +1,272 @@
+import os
+import sys
 import traceback
-from typing import Tuple, List
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
 from datetime import datetime
 
+import numpy as np
 import spiceypy as spy
 from spiceypy.utils.support_types import SpiceyError
-from math import sqrt
-from .attitude_provider import MappsTimedQuaternion, PanelMex2Ker
+from instrumentation import add_count, span
+from instrumentation.cancellation import check_cancelled
+from instrumentation.progress import progress
+from .attitude_provider import Mex2Ker, QuaternionStore, PanelMex2Ker
+from .rotations import normalize, frames_from_direction, matrices_to_quaternions, quaternion_angles, slerp
+from .time_utils import et_to_utc_batch
+
+
+def _fetch_geometry(probe: str, ets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Looks up the spacecraft Y axis and the direction to the Sun at each epoch.
+
+    :param probe: Name of the probe, its body frame is '<probe>_SPACECRAFT'.
+    :param ets: Array of ephemeris times.
+    :return: 2-tuple of N x 3 arrays, spacecraft Y axes and Sun vectors in J2000.
+    """
+    y_axes = np.empty((len(ets), 3))
+    sun_vectors = np.empty((len(ets), 3))
+    frame = f"{probe}_SPACECRAFT"
+    for i, et in enumerate(ets.tolist()):
+        # second column of the rotation matrix is the spacecraft Y axis expressed in J2000
+        y_axes[i] = spy.pxform(frame, "J2000", et)[:, 1]
+        sun_vectors[i] = spy.spkpos("SUN", et, "J2000", "LT+S", probe)[0]
+    return y_axes, sun_vectors
+
+
+def _init_geometry_worker(kernels: List[str]) -> None:
+    """ Loads the kernels once per worker process. Kernels inherited from a forked parent are dropped first,
+    so that every worker sees the same kernel pool regardless of the process start method.
+    """
+    spy.kclear()
+    for kernel in kernels:
+        spy.furnsh(kernel)
+
+
+def _fetch_geometry_chunk(args: Tuple[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    return _fetch_geometry(*args)
+
+# Outcome of the panel sampling: number of samples written, number a uniform grid would need, the largest
+# interpolation error at the checked points in degrees (0 for uniform sampling), and the number of grid points
+# at which the panel orientation was computed
+SamplingReport = namedtuple('SamplingReport', ['samples', 'uniform_samples', 'max_error_deg', 'geometry_evaluations'])
 
 
 class SolarPanelProcessor:
 
-    def __init__(self, probe: str):
+    # Chunks per worker process, more chunks give smoother progress reports and load balancing
+    CHUNKS_PER_WORKER = 4
+    PROGRESS_CHUNKS = 100
+    # Adaptive sampling starts from every ADAPTIVE_COARSE_STEPS-th step of the uniform grid
+    ADAPTIVE_COARSE_STEPS = 32
+    # Fractions of an interval at which adaptive sampling compares the panel orientation with the interpolation
+    ADAPTIVE_PROBES = (0.25, 0.5, 0.75)
+
+    def __init__(self, probe: str, ck_backend: str = None, workers: int = 1, tolerance_deg: float = None):
+        """
+        :param probe: Name of the probe, e.g. "JUICE".
+        :param ck_backend: (optional) CK backend of the panel kernel, see Mex2Ker.BACKENDS.
+        :param workers: Number of processes for the SPICE geometry lookups. 1 computes everything in this
+                        process, 0 uses one process per CPU core.
+        :param tolerance_deg: (optional) Angular tolerance of adaptive sampling. Samples are then only kept where
+                              interpolating between their neighbours would be off by more than this. If not set,
+                              every step of the sampling grid is kept. Ignored for backends that don't interpolate
+                              with SLERP, see Mex2Ker.SLERP_BACKENDS.
+        """
         self._probe = probe
-        self._m2k = PanelMex2Ker()
+        self._m2k = PanelMex2Ker(ck_backend)
+        self._workers = workers if workers > 0 else os.cpu_count() or 1
+        self._tolerance_deg = tolerance_deg if tolerance_deg else None
+        if self._tolerance_deg is not None and self._m2k.backend not in Mex2Ker.SLERP_BACKENDS:
+            print("Warning: adaptive solar panel sampling is skipped, its tolerance only holds for CK backends: {}."
+                  .format(", ".join(Mex2Ker.SLERP_BACKENDS)))
+            self._tolerance_deg = None
+        self.sampling_report = None
 
     @property
     def probe(self):
         return self._probe
 
     @staticmethod
-    def _create_quaternion(direction, up) -> Tuple[float, float, float, float]:
-        """ Generates a quaternion described by a direction vector and "upwards" orientation vector.
+    def _create_quaternions(directions: np.ndarray, ups: np.ndarray) -> np.ndarray:
+        """ Generates quaternions described by direction vectors and "upwards" orientation vectors.
 
-        https://stackoverflow.com/questions/32208838/rotation-matrix-to-quaternion-equivalence
-
-        :param direction: Direction vector for the quaternion.
-        :param up: Upwards direction for the quaternion.
-        :return: Desired quaternion (r, i, j, k)
+        :param directions: N x 3 array of direction vectors for the quaternions.
+        :param ups: N x 3 array of upwards directions for the quaternions.
+        :return: N x 4 array of desired quaternions (r, i, j, k)
         """
-        direction = direction / spy.vnorm(direction)
-        up = up / spy.vnorm(up)
+        return matrices_to_quaternions(frames_from_direction(directions, ups))
+
+    @staticmethod
+    def _find_new_XY_directions(static_Y_vectors: np.ndarray, sun_vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        nY = normalize(static_Y_vectors)
+        nS = normalize(sun_vectors)
 
-        x = spy.vcrss(up, direction)
-        x = x / spy.vnorm(x)
-        y = spy.vcrss(direction, x)
-        y = y / spy.vnorm(y)
-        z = direction
+        new_Z = nS - np.einsum('ij,ij->i', nS, nY)[:, np.newaxis] * nY
+        new_X = - np.cross(nY, new_Z)
 
-        r = sqrt(1.0 + x[0] + y[1] + z[2]) * 0.5
-        i = (y[2] - z[1]) / (4 * r)
-        j = (z[0] - x[2]) / (4 * r)
-        k = (x[1] - y[0]) / (4 * r)
+        return new_X, nY
 
-        return r, i, j, k
+    def _open_executor(self, kernels: List[str] = None) -> Optional[ProcessPoolExecutor]:
+        """ :return: Process pool for the geometry lookups, or None if everything runs in this process. """
+        if self._workers == 1:
+            return None
+        if not kernels:
+            raise ValueError("Kernels are required to compute solar panel geometry in worker processes.")
+        return ProcessPoolExecutor(self._workers, initializer=_init_geometry_worker, initargs=(kernels,))
 
-    @staticmethod
-    def _find_new_XY_directions(static_Y_vector, sun_vector):
-        nY = static_Y_vector / spy.vnorm(static_Y_vector)
-        nS = sun_vector / spy.vnorm(sun_vector)
+    def _fetch_geometry(self, ets: np.ndarray, executor: ProcessPoolExecutor = None,
+                        show_progress: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """ Looks up the spacecraft Y axis and the direction to the Sun at each epoch, either in this process
+        or split into chunks over a process pool. Chunks are merged in order, so the result does not depend
+        on the number of workers.
 
-        new_Z = nS - (spy.vdot(nS, nY)) * nY
-        new_X = - spy.vcrss(nY, new_Z)
+        :param ets: Array of ephemeris times.
+        :param executor: (optional) Process pool from _open_executor().
+        :param show_progress: Whether to report progress after each chunk.
+        :return: 2-tuple of N x 3 arrays, spacecraft Y axes and Sun vectors in J2000.
+        """
+        if executor is None:
+            chunks = np.array_split(ets, min(len(ets), SolarPanelProcessor.PROGRESS_CHUNKS) or 1)
+            results = (_fetch_geometry(self.probe, chunk) for chunk in chunks)
+        else:
+            chunks = np.array_split(ets, min(len(ets), self._workers * SolarPanelProcessor.CHUNKS_PER_WORKER) or 1)
+            results = executor.map(_fetch_geometry_chunk, [(self.probe, chunk) for chunk in chunks])
+        y_axes = []
+        sun_vectors = []
+        reporter = progress("Solar panel geometry", len(ets), 'samples') if show_progress else None
+        for chunk, (chunk_y_axes, chunk_sun_vectors) in zip(chunks, results):
+            check_cancelled()
+            if reporter is not None:
+                reporter.advance(len(chunk))
+            y_axes.append(chunk_y_axes)
+            sun_vectors.append(chunk_sun_vectors)
+        if reporter is not None:
+            reporter.finish()
+        return np.concatenate(y_axes), np.concatenate(sun_vectors)
 
-        return new_X, nY
+    def _quaternions_at(self, ets: np.ndarray, executor: ProcessPoolExecutor = None,
+                        show_progress: bool = True) -> np.ndarray:
+        """ :return: N x 4 array of panel quaternions at the given ephemeris times. """
+        y_axes, sun_vectors = self._fetch_geometry(ets, executor, show_progress)
+        new_X, nY = self._find_new_XY_directions(y_axes, sun_vectors)
+        return self._create_quaternions(new_X, nY)
 
-    def _generate_panel_quaternions(self, et_start: float, et_end: float, step_s: float) -> List[MappsTimedQuaternion]:
-        """ Generate a list of quaternions that describe the sun-optimized orientation of JUICE's solar panels.
+    def _adaptive_sample(self, ets: np.ndarray, executor: ProcessPoolExecutor = None) -> Tuple[np.ndarray, np.ndarray]:
+        """ Picks samples out of the uniform grid ets, by recursive bisection of a coarse grid. An interval is
+        split while the SLERP between its end points differs from the panel orientation at one of its probe
+        points (ADAPTIVE_PROBES) by more than the tolerance.
 
-        :param et_start: Start ephemeris time.
-        :param et_end: End ephemeris time.
-        :param step_s: Sampling step in seconds.
-        :return: List of MappsTimedQuaternions for the given period.
+        The orientation is only computed at the coarse grid and at the probe points, so the tolerance is checked
+        at these points, and the smooth panel motion is relied on between them. Probes of an interval are reused
+        as samples and probes of its halves.
+
+        :param ets: Uniform grid of ephemeris times.
+        :return: 2-tuple of sorted indices of the kept samples into ets, and their N x 4 quaternions.
         """
-        quaternions = []
-        ets = range(int(et_start), int(et_end), step_s)
         n = len(ets)
-        counter_pct = 0
-        for i, et in enumerate(ets):
-            if 100 * i / n > counter_pct:
-                print(f"Progress: {counter_pct} %")
-                counter_pct += 10
-            JUICE_Y_in_J2000 = spy.spkcpt([0.0, 1.0, 0.0], self.probe, f"{self.probe}_SPACECRAFT", et, "J2000",
-                                          "OBSERVER", "NONE", self.probe)[0][0:3]
-            JUICE_SUN_in_J2000 = spy.spkpos("SUN", et, "J2000", "LT+S", self.probe)[0]
+        tolerance = np.radians(self._tolerance_deg)
+        quaternions = np.empty((n, 4))
+        evaluated = np.zeros(n, dtype=bool)
 
-            new_X, nY = self._find_new_XY_directions(JUICE_Y_in_J2000, JUICE_SUN_in_J2000)
+        def evaluate(indices: np.ndarray, show_progress: bool = False) -> None:
+            indices = np.unique(indices)
+            indices = indices[~evaluated[indices]]
+            if len(indices):
+                quaternions[indices] = self._quaternions_at(ets[indices], executor, show_progress)
+                evaluated[indices] = True
 
-            utc_time_string = spy.et2utc(et, "ISOC", 0) + "Z"
-            quaternions.append(MappsTimedQuaternion(utc_time_string, *self._create_quaternion(new_X, nY)))
+        kept = np.unique(np.append(np.arange(0, n, SolarPanelProcessor.ADAPTIVE_COARSE_STEPS), n - 1))
+        evaluate(kept, show_progress=True)
+        intervals = np.stack((kept[:-1], kept[1:]), axis=1)
+        fractions = np.array(SolarPanelProcessor.ADAPTIVE_PROBES)
+        max_error = 0.0
+        level = 0
+        while True:
+            intervals = intervals[intervals[:, 1] - intervals[:, 0] > 1]
+            if len(intervals) == 0:
+                break
+            check_cancelled()
+            level += 1
+            starts, ends = intervals[:, 0], intervals[:, 1]
+            # probe points on the grid, one row per interval, rounded down so the midpoint probe is the split point
+            probes = np.clip(starts[:, None] + np.floor(np.outer(ends - starts, fractions)).astype(np.int64),
+                             (starts + 1)[:, None], (ends - 1)[:, None])
+            evaluate(probes.ravel())
+            t = (probes - starts[:, None]) / (ends - starts)[:, None]
+            count = len(fractions)
+            errors = quaternion_angles(slerp(np.repeat(quaternions[starts], count, axis=0),
+                                             np.repeat(quaternions[ends], count, axis=0), t.ravel()),
+                                       quaternions[probes.ravel()]).reshape(probes.shape).max(axis=1)
+            refine = errors > tolerance
+            max_error = max(max_error, errors[~refine].max(initial=0.0))
+            mids = (starts[refine] + ends[refine]) // 2
+            kept = np.append(kept, mids)
+            intervals = np.concatenate((np.stack((starts[refine], mids), axis=1),
+                                        np.stack((mids, ends[refine]), axis=1)))
+        add_count('refinement_levels', level)
+        kept.sort()
+        self.sampling_report = SamplingReport(len(kept), n, float(np.degrees(max_error)),
+                                              int(np.count_nonzero(evaluated)))
+        return kept, quaternions[kept]
 
-        return quaternions
+    def _generate_panel_quaternions(self, et_start: float, et_end: float, step_s: float,
+                                    kernels: List[str] = None) -> QuaternionStore:
+        """ Generate quaternions that describe the sun-optimized orientation of JUICE's solar panels.
 
-    def create_panel_ck(self, start_time: datetime, end_time: datetime, step_s: float, ck_filepath: str):
+        :param et_start: Start ephemeris time.
+        :param et_end: End ephemeris time.
+        :param step_s: Sampling step in seconds, with adaptive sampling the smallest step.
+        :param kernels: Kernels to load in worker processes, required when more than one worker is used.
+        :return: QuaternionStore for the given period.
+        """
+        ets = np.arange(int(et_start), int(et_end), step_s, dtype=np.float64)
+        executor = self._open_executor(kernels)
+        try:
+            if self._tolerance_deg is None or len(ets) < 2:
+                quaternions = self._quaternions_at(ets, executor)
+                self.sampling_report = SamplingReport(len(ets), len(ets), 0.0, len(ets))
+            else:
+                kept, quaternions = self._adaptive_sample(ets, executor)
+                ets = ets[kept]
+        finally:
+            if executor is not None:
+                if sys.version_info >= (3, 9):
+                    # chunks that have not started yet, e.g. of a cancelled generation, are dropped
+                    executor.shutdown(cancel_futures=True)
+                else:
+                    executor.shutdown()
+        print("Solar panel samples: {} of {} ({:.1f} %), max. interpolation error {:.4f} deg, "
+              "orientation computed at {} grid points".format(
+                  self.sampling_report.samples, self.sampling_report.uniform_samples,
+                  100.0 * self.sampling_report.samples / max(1, self.sampling_report.uniform_samples),
+                  self.sampling_report.max_error_deg, self.sampling_report.geometry_evaluations))
+        # panel epochs are whole UTC seconds, as in MAPPS attitude files
+        epochs = np.round(et_to_utc_batch(ets))
+        # the sampling grid has no gaps, while adaptive samples are spaced unevenly
+        return QuaternionStore(epochs, quaternions, gap_starts=[])
+
+    def create_panel_ck(self, start_time: datetime, end_time: datetime, step_s: float, ck_filepath: str,
+                        kernels: List[str] = None):
+        """ Computes the panel orientation and writes it into a CK kernel. The kernels for the computation
+        must be loaded in this process. Afterwards, sampling_report describes the samples that were written.
+
+        :param kernels: Paths of the same kernels (metakernel and attitude CK), which worker processes load
+                        once each. Required when the processor uses more than one worker.
+        """
         start_et = self._datetime2et(start_time)
         end_et = self._datetime2et(end_time)
         try:
-            quaternions = self._generate_panel_quaternions(start_et, end_et, step_s)
+            with span('panel_quaternions') as counts:
+                quaternions = self._generate_panel_quaternions(start_et, end_et, step_s, kernels)
+                counts['samples'] = len(quaternions)
+                counts['geometry_evaluations'] = self.sampling_report.geometry_evaluations
         except SpiceyError:
             traceback.print_exc()
             raise RuntimeError(f"Quaternion computation for solar panels failed.\nStart time: {start_time}\nEnd time: {end_time}\nCheck console for more details.")
-        self._m2k.convert(quaternions, ck_filepath)
+        with span('write_panel_ck') as counts:
+            self._m2k.convert(quaternions, ck_filepath)
+            counts['quaternions'] = len(quaternions)
 
     @staticmethod
     def _datetime2et(time: datetime) -> float:
@@ -1,6 +1,23 @@
 import unittest
 import os
-from attitude_converter.attitude_provider import MappsReader, JuiceMex2Ker
+import io
+import shutil
+import stat
+import tempfile
+
+import numpy as np
+import spiceypy as spy
+
+from attitude_converter.attitude_provider import MappsReader, Mex2Ker, JuiceMex2Ker, PanelMex2Ker, QuaternionStore, \
+    MocExporter
+from attitude_converter import convert
+from attitude_converter.ck_cache import CkCache, default_file_mode
+from attitude_converter.ck_writer import SpiceCkWriter
+from attitude_converter.decimation import AttitudeDecimator
+from attitude_converter.solar_panel_processor import SolarPanelProcessor
+from attitude_converter.rotations import matrices_to_quaternions, quaternion_angles, slerp
+from attitude_converter.time_utils import MappsTime, LEAP_SECOND_EPOCHS, epoch_to_utc_str, utc_to_tdb_str_batch, \
+    utc_to_et_batch, et_to_utc_batch
 
 
 class ReaderTests(unittest.TestCase):
@@ -10,15 +27,380 @@ class ReaderTests(unittest.TestCase):
         bc_reader = MappsReader()
         bc_reader.read(filename)
         quats = bc_reader.quaternions
-        bc2ck = JuiceMex2Ker()
+        bc2ck = JuiceMex2Ker(Mex2Ker.BACKEND_MEX2KER)
         tmp_ck = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data', 'test.ck')
         bc2ck.convert(quats, tmp_ck)
         self.assertTrue(os.path.exists(tmp_ck))
         self.assertEquals(os.path.getsize(tmp_ck), 8192)
 
+    def test_columnar_reader(self):
+        filename = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data', 'europa_fb_attitude.csv')
+        bc_reader = MappsReader()
+        bc_reader.read(filename)
+        store = bc_reader.store
+        self.assertEqual(len(store), 91)
+        self.assertEqual(store.quaternions.shape, (91, 4))
+        self.assertEqual(store.utc_strings()[0], '2030-10-03T00:00:00Z')
+        self.assertEqual(store.moc_lines()[0], '2030-10-03T00:01:09 -0.455840 -0.478101 0.318025 0.680065')
+        # object list is built lazily from the store and round-trips
+        quats = bc_reader.quaternions
+        self.assertEqual(len(quats), 91)
+        self.assertEqual(quats[-1].get_moc_format(), store.moc_lines()[-1])
+        round_trip = QuaternionStore.from_timed_quaternions(quats)
+        self.assertTrue((round_trip.epochs == store.epochs).all())
+        self.assertTrue((round_trip.quaternions == store.quaternions).all())
+
+    def test_moc_export_streaming(self):
+        filename = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data', 'europa_fb_attitude.csv')
+        bc_reader = MappsReader()
+        bc_reader.read(filename)
+        store = bc_reader.store
+        # chunked streaming output must not depend on the chunk size
+        streamed = io.BytesIO()
+        store.export_moc_lines(streamed, chunk_size=7)
+        self.assertEqual(streamed.getvalue().decode(), ''.join(line + os.linesep for line in store.moc_lines()))
+
+        moc = io.BytesIO()
+        MocExporter(store, 'naif0011.tls', 'juice_fict_20160326.tsc', 'JUICE', 28, precision=3).export_moc(moc)
+        lines = moc.getvalue().decode().split(os.linesep)
+        self.assertEqual(lines[7], 'START_TIME           = 2030-10-03T00:01:09')
+        self.assertEqual(lines[8], 'STOP_TIME            = 2030-10-03T01:31:09')
+        self.assertEqual(lines[14], '2030-10-03T00:01:09 -0.456 -0.478 0.318 0.680')
+        self.assertEqual(len(lines), 14 + 91 + 1)
+
+
+class CkBackendTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @staticmethod
+    def _quaternions_at(ck_path, ets):
+        kernels = [os.path.join(Mex2Ker.DATA_PATH, 'naif0011.tls'),
+                   os.path.join(Mex2Ker.DATA_PATH, 'juice_fict_20160326.tsc'), ck_path]
+        for kernel in kernels:
+            spy.furnsh(kernel)
+        try:
+            return np.array([spy.m2q(spy.ckgp(-28000, spy.sce2c(-28, et), 0, 'J2000')[0]) for et in ets])
+        finally:
+            for kernel in kernels:
+                spy.unload(kernel)
+
+    def test_spice_backend_parity(self):
+        filename = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data', 'europa_fb_attitude.csv')
+        bc_reader = MappsReader()
+        bc_reader.read(filename)
+        mex2ker_ck = os.path.join(self.tmp_dir, 'mex2ker.ck')
+        spice_ck = os.path.join(self.tmp_dir, 'spice with space.ck')
+        JuiceMex2Ker(Mex2Ker.BACKEND_MEX2KER).convert(bc_reader.store, mex2ker_ck)
+        JuiceMex2Ker(Mex2Ker.BACKEND_SPICE).convert(bc_reader.store, spice_ck)
+        self.assertTrue(os.path.exists(spice_ck))
+
+        # compare at samples and in between them, away from the coverage edges
+        ets = utc_to_et_batch(bc_reader.store.epochs)
+        probe_ets = np.linspace(ets[1], ets[-2], 4 * len(ets))
+        reference = self._quaternions_at(mex2ker_ck, probe_ets)
+        in_process = self._quaternions_at(spice_ck, probe_ets)
+        angles = 2 * np.arccos(np.clip(np.abs(np.sum(reference * in_process, axis=1)), 0.0, 1.0))
+        self.assertLess(angles.max(), 1e-5)
+
+    def test_no_pointing_in_gaps(self):
+        # 10 s samples of a slow rotation, with a gap of one hour
+        t = np.arange(0, 7200, 10, dtype=np.float64)
+        t = t[(t < 3000) | (t >= 6600)]
+        angle = np.radians(t * 0.01)
+        store = QuaternionStore(1.9e9 + t, np.column_stack((np.cos(angle / 2), np.sin(angle / 2),
+                                                           np.zeros((len(t), 2)))))
+        ets = utc_to_et_batch(store.epochs)
+        gap_ets = np.linspace(ets[299] + 20, ets[300] - 20, 5)
+        decimated = AttitudeDecimator(0.001).decimate(store)
+        np.testing.assert_array_equal(decimated.epochs[decimated.gaps()], [1.9e9 + 2990])
+        for ck_type, quaternions in ((3, store), (2, store), (3, decimated)):
+            ck_path = os.path.join(self.tmp_dir, 'gap.ck')
+            SpiceCkWriter(os.path.join(Mex2Ker.DATA_PATH, 'naif0011.tls'),
+                          os.path.join(Mex2Ker.DATA_PATH, 'juice_fict_20160326.tsc'), 'JUICE', 28,
+                          ck_type).write(quaternions, ck_path)
+            # pointing is found on both sides of the gap, but not inside it
+            self.assertEqual(len(self._quaternions_at(ck_path, ets[[0, 299, 300, -1]])), 4)
+            for et in gap_ets:
+                with self.assertRaises(spy.utils.exceptions.NotFoundError):
+                    self._quaternions_at(ck_path, [et])
+
+    def test_concurrent_conversions(self):
+        filename = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data', 'europa_fb_attitude.csv')
+        bc_reader = MappsReader()
+        bc_reader.read(filename)
+        cwd = os.getcwd()
+        jobs = []
+        for i in range(3):
+            for m2k in (JuiceMex2Ker(Mex2Ker.BACKEND_MEX2KER), PanelMex2Ker(Mex2Ker.BACKEND_MEX2KER),
+                        JuiceMex2Ker(Mex2Ker.BACKEND_SPICE)):
+                jobs.append((m2k, bc_reader.store, os.path.join(self.tmp_dir, '{} {}.ck'.format(i, len(jobs)))))
+        Mex2Ker.convert_concurrently(jobs, max_workers=len(jobs))
+        self.assertEqual(os.getcwd(), cwd)
+        for m2k, _, ck_path in jobs:
+            self.assertTrue(os.path.exists(ck_path))
+            if m2k.backend == Mex2Ker.BACKEND_MEX2KER:
+                self.assertEqual(os.path.getsize(ck_path), 8192)
+
+
+class CkCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = CkCache(os.path.join(self.tmp_dir, 'cache'))
+        self.attitude = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data', 'europa_fb_attitude.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cache_hit(self):
+        first = os.path.join(self.tmp_dir, 'first.ck')
+        second = os.path.join(self.tmp_dir, 'second.ck')
+        convert(self.attitude, first, Mex2Ker.BACKEND_SPICE, self.cache)
+        self.assertEqual(len(self.cache.entries()), 1)
+        convert(self.attitude, second, Mex2Ker.BACKEND_SPICE, self.cache)
+        self.assertEqual(len(self.cache.entries()), 1)
+        with open(first, 'rb') as f1, open(second, 'rb') as f2:
+            self.assertEqual(f1.read(), f2.read())
+        # a fetched kernel is as readable as a newly written one
+        self.assertEqual(stat.S_IMODE(os.stat(second).st_mode), default_file_mode())
+        # entries stored only readable by their owner are repaired on the next hit
+        os.chmod(self.cache.entries()[0].path, 0o600)
+        os.remove(second)
+        convert(self.attitude, second, Mex2Ker.BACKEND_SPICE, self.cache)
+        self.assertEqual(stat.S_IMODE(os.stat(second).st_mode), default_file_mode())
+        self.assertEqual(stat.S_IMODE(os.stat(self.cache.entries()[0].path).st_mode), default_file_mode())
+        # a different backend is a different cache entry
+        convert(self.attitude, second, Mex2Ker.BACKEND_MEX2KER, self.cache)
+        self.assertEqual(len(self.cache.entries()), 2)
+
+    def test_lru_eviction_and_purge(self):
+        ck_path = os.path.join(self.tmp_dir, 'input.ck')
+        with open(ck_path, 'wb') as f:
+            f.write(b'x' * 1000)
+        for i, key in enumerate(['aa01', 'bb02', 'cc03']):
+            self.cache.store(key, ck_path)
+            os.utime(os.path.join(self.cache.path, key[0:2], key + '.ck'), (i, i))
+        # 'aa01' becomes the most recently used entry
+        self.assertTrue(self.cache.fetch('aa01', os.path.join(self.tmp_dir, 'out.ck')))
+        self.assertFalse(self.cache.fetch('dd04', os.path.join(self.tmp_dir, 'out2.ck')))
+        removed = self.cache.evict(2000)
+        self.assertEqual([e.key for e in removed], ['bb02'])
+        self.assertEqual(self.cache.size(), 2000)
+        self.assertEqual(len(self.cache.purge()), 2)
+        self.assertEqual(self.cache.entries(), [])
+
+
+class SolarPanelTests(unittest.TestCase):
+    """ Panel orientation on a synthetic setup: the attitude of the test data file, and a spacecraft
+    moving along a straight line close to Jupiter's distance from the Sun.
+    """
+
+    FRAME_KERNEL = """\\begindata
+NAIF_BODY_NAME += 'JUICE'
+NAIF_BODY_CODE += -28
+FRAME_JUICE_SPACECRAFT = -28000
+FRAME_-28000_NAME = 'JUICE_SPACECRAFT'
+FRAME_-28000_CLASS = 3
+FRAME_-28000_CLASS_ID = -28000
+FRAME_-28000_CENTER = -28
+CK_-28000_SCLK = -28
+CK_-28000_SPK = -28
+\\begintext
+"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        bc_reader = MappsReader()
+        bc_reader.read(os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data', 'europa_fb_attitude.csv'))
+        ets = utc_to_et_batch(bc_reader.store.epochs)
+        self.et_start, self.et_end = ets[0], ets[-1]
+
+        # the reference computation needs angular velocities, which only Mex2Ker writes
+        ck_path = os.path.join(self.tmp_dir, 'attitude.ck')
+        JuiceMex2Ker(Mex2Ker.BACKEND_MEX2KER).convert(bc_reader.store, ck_path)
+        fk_path = os.path.join(self.tmp_dir, 'juice.tf')
+        with open(fk_path, 'w') as f:
+            f.write(self.FRAME_KERNEL)
+        spk_path = os.path.join(self.tmp_dir, 'juice.bsp')
+        handle = spy.spkopn(spk_path, 'JUICE', 0)
+        first, last = self.et_start - 7200.0, self.et_end + 7200.0
+        times = np.array([first, last])
+        states = np.array([[7.4e8, 1.0e7, 3.0e5, 10.0, -5.0, 2.0]] * 2)
+        states[1, 0:3] += (last - first) * states[1, 3:6]
+        spy.spkw08(handle, -28, 10, 'J2000', first, last, 'JUICE', 1, 2, states, first, last - first)
+        spy.spkw08(handle, 10, 0, 'J2000', first, last, 'SUN', 1, 2, np.zeros((2, 6)), first, last - first)
+        spy.spkcls(handle)
+
+        self.kernels = [os.path.join(Mex2Ker.DATA_PATH, 'naif0011.tls'),
+                        os.path.join(Mex2Ker.DATA_PATH, 'juice_fict_20160326.tsc'), fk_path, spk_path, ck_path]
+        for kernel in self.kernels:
+            spy.furnsh(kernel)
+
+    def tearDown(self):
+        for kernel in self.kernels:
+            spy.unload(kernel)
+        shutil.rmtree(self.tmp_dir)
+
+    @staticmethod
+    def _reference_quaternion(et: float) -> np.ndarray:
+        """ Scalar computation of a single panel quaternion, with the SPICE vector routines. """
+        y_axis = spy.spkcpt([0.0, 1.0, 0.0], 'JUICE', 'JUICE_SPACECRAFT', et, 'J2000', 'OBSERVER', 'NONE',
+                            'JUICE')[0][0:3]
+        sun = spy.spkpos('SUN', et, 'J2000', 'LT+S', 'JUICE')[0]
+        n_y = spy.vhat(y_axis)
+        n_s = spy.vhat(sun)
+        z = spy.vhat(-spy.vcrss(n_y, n_s - spy.vdot(n_s, n_y) * n_y))
+        x = spy.vhat(spy.vcrss(n_y, z))
+        y = spy.vhat(spy.vcrss(z, x))
+        q = spy.m2q(np.stack((x, y, z), axis=1))
+        return q if q[0] >= 0 else -q
+
+    def test_vectorized_panel_quaternions(self):
+        spp = SolarPanelProcessor('JUICE')
+        store = spp._generate_panel_quaternions(self.et_start + 60, self.et_end - 60, 10)
+        ets = np.arange(int(self.et_start + 60), int(self.et_end - 60), 10, dtype=np.float64)
+        self.assertEqual(len(store), len(ets))
+        np.testing.assert_array_equal(store.epochs, np.round(et_to_utc_batch(ets)))
+        reference = np.array([self._reference_quaternion(et) for et in ets])
+        np.testing.assert_allclose(store.quaternions, reference, atol=1e-12)
+
+    def test_process_pool_matches_serial(self):
+        serial = SolarPanelProcessor('JUICE')._generate_panel_quaternions(self.et_start, self.et_end, 7)
+        parallel = SolarPanelProcessor('JUICE', workers=3)._generate_panel_quaternions(self.et_start, self.et_end, 7,
+                                                                                      self.kernels)
+        np.testing.assert_array_equal(parallel.epochs, serial.epochs)
+        np.testing.assert_array_equal(parallel.quaternions, serial.quaternions)
+        with self.assertRaises(ValueError):
+            SolarPanelProcessor('JUICE', workers=2)._generate_panel_quaternions(self.et_start, self.et_end, 7)
+
+    def test_adaptive_sampling(self):
+        uniform = SolarPanelProcessor('JUICE')._generate_panel_quaternions(self.et_start, self.et_end, 1)
+        # the synthetic panels barely move, so the tolerance is tiny to force refinement
+        tolerance_deg = 3e-6
+        spp = SolarPanelProcessor('JUICE', tolerance_deg=tolerance_deg)
+        adaptive = spp._generate_panel_quaternions(self.et_start, self.et_end, 1)
+        self.assertEqual(spp.sampling_report.samples, len(adaptive))
+        self.assertEqual(spp.sampling_report.uniform_samples, len(uniform))
+        self.assertLess(len(adaptive), len(uniform) / 10)
+        # the orientation is only computed at the samples and the probes between them
+        self.assertLess(spp.sampling_report.geometry_evaluations, len(uniform) / 4)
+        self.assertGreaterEqual(spp.sampling_report.geometry_evaluations, len(adaptive))
+        self.assertLessEqual(spp.sampling_report.max_error_deg, tolerance_deg)
+
+        # samples are taken from the uniform grid, and interpolating them reproduces the uniform samples
+        indices = np.searchsorted(uniform.epochs, adaptive.epochs)
+        np.testing.assert_array_equal(uniform.quaternions[indices], adaptive.quaternions)
+        self.assertEqual((adaptive.epochs[0], adaptive.epochs[-1]), (uniform.epochs[0], uniform.epochs[-1]))
+        j = np.clip(np.searchsorted(adaptive.epochs, uniform.epochs, side='right') - 1, 0, len(adaptive) - 2)
+        t = (uniform.epochs - adaptive.epochs[j]) / (adaptive.epochs[j + 1] - adaptive.epochs[j])
+        errors = quaternion_angles(slerp(adaptive.quaternions[j], adaptive.quaternions[j + 1], t), uniform.quaternions)
+        # the tolerance is only checked at the probes, between them the smooth panel motion keeps the error close
+        self.assertLessEqual(np.degrees(errors.max()), 1.1 * tolerance_deg)
+        self.assertLessEqual(spp.sampling_report.max_error_deg, np.degrees(errors.max()) + 1e-12)
+
+        # with Mex2Ker, every step of the grid is kept
+        spp = SolarPanelProcessor('JUICE', Mex2Ker.BACKEND_MEX2KER, tolerance_deg=tolerance_deg)
+        self.assertEqual(len(spp._generate_panel_quaternions(self.et_start, self.et_end, 1)), len(uniform))
+
+    def test_matrix_to_quaternion_near_half_turn(self):
+        # rotations by almost 180 degrees, where the scalar part vanishes
+        axes = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0], [1.0, -2.0, 0.5]])
+        axes /= np.linalg.norm(axes, axis=1)[:, np.newaxis]
+        for angle in (np.pi, np.pi - 1e-9, np.pi - 1e-3):
+            quaternions = matrices_to_quaternions(np.array([spy.axisar(axis, angle) for axis in axes]))
+            np.testing.assert_allclose(np.linalg.norm(quaternions, axis=1), 1.0, atol=1e-12)
+            for q, axis in zip(quaternions, axes):
+                np.testing.assert_allclose(spy.q2m(q), spy.axisar(axis, angle), atol=1e-12)
+                self.assertGreaterEqual(q[0], 0.0)
+
+
+class DecimationTests(unittest.TestCase):
+
+    @staticmethod
+    def _synthetic_attitude() -> QuaternionStore:
+        """ 1 s samples of a rotation about a fixed axis: inertial pointing, a slew with abrupt start and end
+        at 0.1 deg/s, a slow 0.01 deg/s drift, and a gap of one hour.
+        """
+        t = np.arange(20000, dtype=np.float64)
+        angle = np.radians(np.clip(t - 5000, 0, 300) * 0.1 + np.clip(t - 10000, 0, None) * 0.01)
+        axis = np.array([0.3, 0.5, 0.8]) / np.linalg.norm([0.3, 0.5, 0.8])
+        quaternions = np.column_stack((np.cos(angle / 2), np.outer(np.sin(angle / 2), axis)))
+        keep = (t < 15000) | (t >= 18600)
+        return QuaternionStore(1.9e9 + t[keep], quaternions[keep])
+
+    def test_decimation_within_tolerance(self):
+        store = self._synthetic_attitude()
+        decimator = AttitudeDecimator(0.001)
+        decimated = decimator.decimate(store)
+        self.assertEqual(decimator.report.input_samples, len(store))
+        self.assertEqual(decimator.report.output_samples, len(decimated))
+        self.assertGreater(decimator.report.compression_ratio, 100)
+        self.assertLessEqual(decimator.report.max_error_deg, 0.001)
+        # slew start and end, and both sides of the gap are kept
+        for kept_epoch in (5000, 5300, 14999, 18600):
+            self.assertIn(1.9e9 + kept_epoch, decimated.epochs)
+
+        j = np.clip(np.searchsorted(decimated.epochs, store.epochs, side='right') - 1, 0, len(decimated) - 2)
+        t = (store.epochs - decimated.epochs[j]) / (decimated.epochs[j + 1] - decimated.epochs[j])
+        errors = quaternion_angles(slerp(decimated.quaternions[j], decimated.quaternions[j + 1], t), store.quaternions)
+        self.assertAlmostEqual(np.degrees(errors.max()), decimator.report.max_error_deg, places=9)
+
+    def test_decimated_conversion_is_cached_separately(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            cache = CkCache(os.path.join(tmp_dir, 'cache'))
+            attitude = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data', 'europa_fb_attitude.csv')
+            full_ck = os.path.join(tmp_dir, 'full.ck')
+            decimated_ck = os.path.join(tmp_dir, 'decimated.ck')
+            convert(attitude, full_ck, Mex2Ker.BACKEND_SPICE, cache)
+            convert(attitude, decimated_ck, Mex2Ker.BACKEND_SPICE, cache, 0.01)
+            self.assertEqual(len(cache.entries()), 2)
+            self.assertLess(os.path.getsize(decimated_ck), os.path.getsize(full_ck))
+            # Mex2Ker doesn't interpolate with SLERP, so its attitude is never decimated
+            convert(attitude, full_ck, Mex2Ker.BACKEND_MEX2KER, cache)
+            convert(attitude, decimated_ck, Mex2Ker.BACKEND_MEX2KER, cache, 0.01)
+            self.assertEqual(len(cache.entries()), 3)
+            self.assertEqual(os.path.getsize(decimated_ck), os.path.getsize(full_ck))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+class TimeTests(unittest.TestCase):
+
+    def test_batch_tdb_matches_mapps_time(self):
+        # probe every leap second boundary from both sides
+        epochs = [e + offset for e in LEAP_SECOND_EPOCHS[1:] for offset in (-1, 0, 1)]
+        epochs += [1917216000 + 86399 * i for i in range(400)]
+        utc_strs = [epoch_to_utc_str(e) for e in epochs]
+        tdb, tdb_strs = utc_to_tdb_str_batch(utc_strs)
+        self.assertEqual(tdb_strs, [MappsTime(s).tdb_str() for s in utc_strs])
+        self.assertEqual(list(tdb), [MappsTime(s).tdb.timestamp() for s in utc_strs])
+
+    def test_batch_rejects_invalid_dates(self):
+        with self.assertRaises(ValueError):
+            utc_to_tdb_str_batch(['2030-02-30T00:00:00Z'])
+        with self.assertRaises(ValueError):
+            utc_to_tdb_str_batch(['1971-06-01T00:00:00Z'])
+
+    def test_et_to_utc_round_trip(self):
+        epochs = np.array([e + offset for e in LEAP_SECOND_EPOCHS[1:] for offset in (-1.5, -1, 0, 0.25, 1)]
+                          + [1917216000 + 86399.5 * i for i in range(400)])
+        np.testing.assert_allclose(et_to_utc_batch(utc_to_et_batch(epochs)), epochs, rtol=0, atol=1e-6)
+
 
 def suite():
-    return unittest.TestLoader().loadTestsFromTestCase(ReaderTests)
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(ReaderTests),
+                               loader.loadTestsFromTestCase(CkBackendTests),
+                               loader.loadTestsFromTestCase(CkCacheTests),
+                               loader.loadTestsFromTestCase(SolarPanelTests),
+                               loader.loadTestsFromTestCase(DecimationTests),
+                               loader.loadTestsFromTestCase(TimeTests)])
 
 
 def main():
@@ -1,4 +1,9 @@
+import calendar
+from bisect import bisect_left
 from datetime import datetime, timedelta, tzinfo
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
 
 
 class UTC(tzinfo):
@@ -15,6 +20,31 @@ class UTC(tzinfo):
         return UTC.ZERO
 
 
+# UTC dates at which a leap second was introduced (POSIX seconds, sorted).
+LEAP_SECOND_EPOCHS = [calendar.timegm(date + (0, 0, 0)) for date in [
+    (1972, 1, 1), (1972, 7, 1), (1973, 1, 1), (1974, 1, 1), (1975, 1, 1), (1976, 1, 1), (1977, 1, 1),
+    (1978, 1, 1), (1979, 1, 1), (1980, 1, 1), (1981, 7, 1), (1982, 7, 1), (1983, 7, 1), (1985, 7, 1),
+    (1988, 1, 1), (1990, 1, 1), (1991, 1, 1), (1992, 7, 1), (1993, 7, 1), (1994, 7, 1), (1996, 1, 1),
+    (1997, 7, 1), (1999, 1, 1), (2006, 1, 1), (2009, 1, 1), (2012, 7, 1), (2015, 7, 1), (2017, 1, 1),
+]]
+_LEAP_SECOND_TABLE = np.array(LEAP_SECOND_EPOCHS, dtype=np.float64)
+
+# TDB - UTC = 32.184 s + (TAI - UTC), where TAI - UTC is 10 s plus one second per leap second
+TDB_UTC_OFFSET_S = 32.184
+
+# POSIX seconds of the J2000 epoch (2000-01-01T12:00:00), and the DELTET constants of the
+# NAIF leapseconds kernel for the periodic TDB - TT term
+J2000_POSIX_S = 946728000.0
+_DELTET_K = 1.657e-3
+_DELTET_EB = 1.671e-2
+_DELTET_M = (6.239996, 1.99096871e-7)
+
+# Fixed-width ISO format emitted by MAPPS: 'YYYY-MM-DDThh:mm:ssZ'
+_MAPPS_UTC_WIDTH = 20
+_MAPPS_UTC_SEPARATORS = {4: b'-', 7: b'-', 10: b'T', 13: b':', 16: b':', 19: b'Z'}
+_MAPPS_UTC_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+
+
 class MappsTime:
     """Time Utils"""
     mapps_pattern = '%Y-%m-%dT%H:%M:%S %Z'
@@ -22,43 +52,7 @@ class MappsTime:
 
     @staticmethod
     def leap_seconds(date: datetime) -> int:
-        leapsecond_dates = [
-            datetime(1972, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1972, 7, 1, 0, 0, 0, 0, UTC()),
-            datetime(1973, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1974, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1975, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1976, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1977, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1978, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1979, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1980, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1981, 7, 1, 0, 0, 0, 0, UTC()),
-            datetime(1982, 7, 1, 0, 0, 0, 0, UTC()),
-            datetime(1983, 7, 1, 0, 0, 0, 0, UTC()),
-            datetime(1985, 7, 1, 0, 0, 0, 0, UTC()),
-            datetime(1988, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1990, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1991, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1992, 7, 1, 0, 0, 0, 0, UTC()),
-            datetime(1993, 7, 1, 0, 0, 0, 0, UTC()),
-            datetime(1994, 7, 1, 0, 0, 0, 0, UTC()),
-            datetime(1996, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(1997, 7, 1, 0, 0, 0, 0, UTC()),
-            datetime(1999, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(2006, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(2009, 1, 1, 0, 0, 0, 0, UTC()),
-            datetime(2012, 7, 1, 0, 0, 0, 0, UTC()),
-            datetime(2015, 7, 1, 0, 0, 0, 0, UTC()),
-            datetime(2017, 1, 1, 0, 0, 0, 0, UTC()),
-        ]
-
-        search = -1
-        index = 0
-        while index < len(leapsecond_dates) and leapsecond_dates[index] < date:
-            search = index
-            index += 1
-
+        search = bisect_left(LEAP_SECOND_EPOCHS, date.timestamp()) - 1
         if search == -1:
             raise BaseException('Date too early')
 
@@ -90,6 +84,171 @@ class MappsTime:
     def from_bepi(utc_str_ntz: str) -> 'MappsTime':
         return MappsTime(utc_str_ntz + 'Z')
 
+    @staticmethod
+    def from_epoch(epoch: float) -> 'MappsTime':
+        return MappsTime(epoch_to_utc_str(epoch))
+
+
+def utc_str_to_epoch(mapps_utc_str: str) -> float:
+    """ Converts a MAPPS UTC string (e.g. '2030-10-03T00:00:00Z') to UTC POSIX seconds. """
+    utc = datetime.strptime(mapps_utc_str[0:-1], MappsTime.moc_pattern)
+    return float(calendar.timegm(utc.timetuple()))
+
+
+def epoch_to_utc_str(epoch: float) -> str:
+    """ Converts UTC POSIX seconds to a MAPPS UTC string (e.g. '2030-10-03T00:00:00Z'). """
+    return (datetime(1970, 1, 1) + timedelta(seconds=int(epoch))).strftime(MappsTime.moc_pattern) + 'Z'
+
+
+def _days_from_civil(year: np.ndarray, month: np.ndarray, day: np.ndarray) -> np.ndarray:
+    """ Days since 1970-01-01 of proleptic Gregorian dates (vectorized). """
+    year = year - (month <= 2)
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _civil_from_days(days: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Proleptic Gregorian (year, month, day) of days since 1970-01-01 (vectorized). """
+    days = days + 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = mp + np.where(mp < 10, 3, -9)
+    return yoe + era * 400 + (month <= 2), month, day
+
+
+def parse_mapps_utc_batch(mapps_utc_strs: Sequence[str]) -> np.ndarray:
+    """ Converts MAPPS UTC strings (e.g. '2030-10-03T00:00:00Z') to UTC POSIX seconds.
+
+    Strings in the fixed-width format emitted by MAPPS are decoded in one vectorized pass,
+    anything else falls back to utc_str_to_epoch.
+
+    :param mapps_utc_strs: Sequence of MAPPS UTC strings.
+    :return: float64 array of UTC POSIX seconds.
+    """
+    n = len(mapps_utc_strs)
+    if n == 0:
+        return np.zeros(0, dtype=np.float64)
+    try:
+        raw = ''.join(mapps_utc_strs).encode('ascii')
+    except UnicodeEncodeError:
+        raw = b''
+    if len(raw) != n * _MAPPS_UTC_WIDTH:
+        return np.array([utc_str_to_epoch(s) for s in mapps_utc_strs], dtype=np.float64)
+
+    chars = np.frombuffer(raw, dtype=np.uint8).reshape(n, _MAPPS_UTC_WIDTH)
+    valid = np.ones(n, dtype=bool)
+    for column, separator in _MAPPS_UTC_SEPARATORS.items():
+        valid &= chars[:, column] == ord(separator)
+    digits = chars[:, _MAPPS_UTC_DIGITS].astype(np.int64) - ord('0')
+    valid &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 4] * 10 + digits[:, 5]
+    day = digits[:, 6] * 10 + digits[:, 7]
+    hour = digits[:, 8] * 10 + digits[:, 9]
+    minute = digits[:, 10] * 10 + digits[:, 11]
+    second = digits[:, 12] * 10 + digits[:, 13]
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & \
+             (hour <= 23) & (minute <= 59) & (second <= 59)
+
+    epochs = (_days_from_civil(year, month, day) * 86400 + hour * 3600 + minute * 60 + second).astype(np.float64)
+    # day-of-month overflow (e.g. 30-Feb) is caught by the round trip through the civil calendar
+    valid &= _civil_from_days(np.floor_divide(epochs, 86400).astype(np.int64))[2] == day
+    for index in np.flatnonzero(~valid).tolist():
+        epochs[index] = utc_str_to_epoch(mapps_utc_strs[index])
+    return epochs
+
+
+def leap_seconds_batch(utc_epochs: np.ndarray) -> np.ndarray:
+    """ TAI - UTC in seconds for an array of UTC POSIX seconds, using binary search
+    in the leap second table. Same semantics as MappsTime.leap_seconds.
+    """
+    search = np.searchsorted(_LEAP_SECOND_TABLE, utc_epochs, side='left') - 1
+    if len(search) and search.min() == -1:
+        raise ValueError('Date too early')
+    return 10 + search
+
+
+def utc_to_tdb_batch(utc_epochs: np.ndarray) -> np.ndarray:
+    """ Converts UTC POSIX seconds to TDB seconds on the same (POSIX) scale. """
+    utc_epochs = np.asarray(utc_epochs, dtype=np.float64)
+    return utc_epochs + TDB_UTC_OFFSET_S + leap_seconds_batch(utc_epochs)
+
+
+def utc_to_et_batch(utc_epochs: np.ndarray) -> np.ndarray:
+    """ Converts UTC POSIX seconds to SPICE ephemeris time (TDB seconds past J2000), including
+    the periodic TDB - TT term, as str2et does with the NAIF leapseconds kernel.
+    """
+    utc_epochs = np.asarray(utc_epochs, dtype=np.float64)
+    tt = utc_epochs + TDB_UTC_OFFSET_S + leap_seconds_batch(utc_epochs) - J2000_POSIX_S
+    return tt + _tdb_minus_tt(tt)
+
+
+def et_to_utc_batch(ets: np.ndarray) -> np.ndarray:
+    """ Converts SPICE ephemeris times to UTC POSIX seconds, the inverse of utc_to_et_batch.
+    Epochs inside a leap second map onto the first second of the following day.
+    """
+    ets = np.asarray(ets, dtype=np.float64)
+    # TDB - TT is a few milliseconds at most, evaluating it at TDB instead of TT is accurate to ~1e-12 s
+    tai_like = ets - _tdb_minus_tt(ets) - TDB_UTC_OFFSET_S + J2000_POSIX_S
+    utc_epochs = tai_like - leap_seconds_batch(tai_like)
+    # the leap second count is a step function of UTC, one more pass settles epochs right after a leap second
+    return tai_like - leap_seconds_batch(utc_epochs)
+
+
+def _tdb_minus_tt(tt: np.ndarray) -> np.ndarray:
+    """ Periodic TDB - TT term of the NAIF leapseconds kernel, in seconds. """
+    mean_anomaly = _DELTET_M[0] + _DELTET_M[1] * tt
+    return _DELTET_K * np.sin(mean_anomaly + _DELTET_EB * np.sin(mean_anomaly))
+
+
+def format_epochs_batch(epochs: np.ndarray) -> np.ndarray:
+    """ Formats POSIX seconds as 'YYYY-MM-DDThh:mm:ss' (fractions are truncated, as strftime does).
+
+    :param epochs: Array of POSIX seconds.
+    :return: N x 19 uint8 array of ASCII characters.
+    """
+    seconds = np.floor(np.asarray(epochs, dtype=np.float64)).astype(np.int64)
+    days, second_of_day = np.divmod(seconds, 86400)
+    year, month, day = _civil_from_days(days)
+    hour, remainder = np.divmod(second_of_day, 3600)
+    minute, second = np.divmod(remainder, 60)
+
+    chars = np.empty((len(seconds), 19), dtype=np.uint8)
+    for column, value, width in ((0, year, 4), (5, month, 2), (8, day, 2),
+                                 (11, hour, 2), (14, minute, 2), (17, second, 2)):
+        for offset in range(width):
+            chars[:, column + offset] = (value // 10 ** (width - 1 - offset)) % 10 + ord('0')
+    chars[:, 4] = chars[:, 7] = ord('-')
+    chars[:, 10] = ord('T')
+    chars[:, 13] = chars[:, 16] = ord(':')
+    return chars
+
+
+def format_epochs_str_batch(epochs: np.ndarray, suffix: str = '') -> List[str]:
+    """ Formats POSIX seconds as a list of 'YYYY-MM-DDThh:mm:ss' strings with an optional suffix. """
+    raw = format_epochs_batch(epochs).tobytes().decode('ascii')
+    return [raw[i:i + 19] + suffix for i in range(0, len(raw), 19)]
+
+
+def utc_to_tdb_str_batch(utc: Union[Sequence[str], np.ndarray]) -> Tuple[np.ndarray, List[str]]:
+    """ Converts UTC times to TDB in one vectorized pass. This is the batch equivalent of
+    MappsTime(utc).tdb and MappsTime(utc).tdb_str().
+
+    :param utc: Either MAPPS UTC strings, or an array of UTC POSIX seconds.
+    :return: 2-tuple of TDB epochs (POSIX scale) and TDB strings in MOC format.
+    """
+    if len(utc) and isinstance(utc[0], str):
+        utc = parse_mapps_utc_batch(utc)
+    tdb = utc_to_tdb_batch(utc)
+    return tdb, format_epochs_str_batch(tdb)
+
 
 if __name__ == '__main__':
     t = MappsTime('2013-02-13T00:00:00Z')
@@ -0,0 +1,89 @@
+""" Per-observation configuration overhead: cached Config.StaticConfig against reading the files on every call.
+
+Run from the repository root:
+
+    python -m benchmarks.config_benchmark
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import timeit
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+
+from config import Config
+from timeline_processor import TimelineProcessor
+
+REPO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def uncached_template_observation() -> OrderedDict:
+    """ Loads the observation template the way it was done before caching, on every call. """
+    template_path = os.path.join(REPO_PATH, 'config', 'template_observation.json')
+    with open(template_path) as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+class UncachedConfig:
+    """ Config whose templates are read from disk on every call, as before caching. """
+
+    def __init__(self, config: Config):
+        self.config = config
+
+    def __getattr__(self, name):
+        return getattr(self.config, name)
+
+    @staticmethod
+    def get_template_observation() -> OrderedDict:
+        return uncached_template_observation()
+
+
+def per_call_us(function, number: int) -> float:
+    return 1e6 * min(timeit.repeat(function, number=number, repeat=3)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=20000, help='Calls per measurement.')
+    args = parser.parse_args()
+
+    # Config saves the temporary config on creation, so it works on a copy
+    tmp_dir = tempfile.mkdtemp(prefix='config_benchmark_')
+    try:
+        for file_name in ('config_static.ini', 'config_temp.ini'):
+            shutil.copy(os.path.join(REPO_PATH, file_name), tmp_dir)
+        config = Config(tmp_dir)
+        static = config.static
+        ini_colors = static.get_object_property('itl', 'sensor_colors')
+        ini_mode_sensors = static.get_object_property('itl', 'mode_sensors')
+        processor = TimelineProcessor(config)
+        uncached_processor = TimelineProcessor(UncachedConfig(config))
+        start = datetime(2031, 1, 1)
+        times = [(start, start + timedelta(minutes=10))]
+        color = config.get_sensor_colors()['JANUS']
+
+        rows = [
+            ('template_observation', lambda: uncached_template_observation(),
+             lambda: static.get_template_observation()),
+            ('sensor_colors', lambda: defaultdict(lambda: [0.5, 0.5, 0.5], json.loads(ini_colors)),
+             lambda: static.get_sensor_colors()),
+            ('mode_sensors', lambda: json.loads(ini_mode_sensors, object_pairs_hook=OrderedDict),
+             lambda: static.get_mode_sensors()),
+            # filling in one observation file, which also looked up the sensor colors for every observation
+            ('observation', lambda: uncached_processor._create_observation_json(
+                'JUICE_GEN_OBS_JUICE_JANUS_0', json.loads(ini_colors)['JANUS'], 'JUICE_JANUS', 'Ganymede', times),
+             lambda: processor._create_observation_json('JUICE_GEN_OBS_JUICE_JANUS_0', color, 'JUICE_JANUS',
+                                                        'Ganymede', times)),
+        ]
+        print("{:<22} {:>12} {:>12}".format('', 'uncached us', 'cached us'))
+        for name, before, after in rows:
+            print("{:<22} {:>12.1f} {:>12.1f}".format(name, per_call_us(before, args.number),
+                                                      per_call_us(after, args.number)))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
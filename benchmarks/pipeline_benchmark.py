@@ -0,0 +1,212 @@
+""" Times each stage of the scenario generation on synthetic MAPPS attitude and timeline files.
+
+Run from the repository root:
+
+    python -m benchmarks.pipeline_benchmark --attitude-rows 1000000 --timeline-lines 1000000 --output results.json
+
+The results are written as JSON, and can be compared with the results of another version:
+
+    python -m benchmarks.pipeline_benchmark --output new.json --compare old.json
+
+The solar panel stage needs ephemerides of JUICE and the Sun, so it only runs with --metakernel. The
+synthetic attitude then has to start within the coverage of the metakernel (--start).
+"""
+import argparse
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Tuple
+
+import simplejson as json
+import spiceypy as spy
+
+from attitude_converter.attitude_provider import JuiceMex2Ker, MappsReader, Mex2Ker, MocExporter
+from attitude_converter.solar_panel_processor import SolarPanelProcessor
+from benchmarks.synthetic import INSTRUMENT_MODES, write_synthetic_attitude, write_synthetic_timeline
+from config import Config
+from timeline_processor import TimelineProcessor
+from timeline_processor.timeline_parser import TimelineParser
+
+REPO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_VERSION = 1
+
+
+def time_stage(function: Callable[[], int], repeat: int) -> Tuple[float, int]:
+    """ Runs a stage repeat times.
+
+    :param function: Runs the stage once, and returns the number of items it processed.
+    :return: 2-tuple of the fastest run in seconds, and the number of items.
+    """
+    best_s, items = None, 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = function()
+        elapsed_s = time.perf_counter() - start
+        best_s = elapsed_s if best_s is None else min(best_s, elapsed_s)
+    return best_s, items
+
+
+def run(args: argparse.Namespace, work_dir: str) -> OrderedDict:
+    """ Generates the input files into work_dir, unless they exist, and times every stage.
+
+    :return: Results of all stages, with the benchmark parameters.
+    """
+    attitude_path = os.path.join(work_dir, 'attitude_{}_{}s.csv'.format(args.attitude_rows, args.attitude_step_s))
+    if not os.path.exists(attitude_path):
+        write_synthetic_attitude(attitude_path, args.attitude_rows, args.attitude_step_s, args.start)
+    timeline_path = os.path.join(work_dir, 'timeline_{}_{}s.asc'.format(args.timeline_lines, args.timeline_step_s))
+    if not os.path.exists(timeline_path):
+        write_synthetic_timeline(timeline_path, args.timeline_lines, args.instruments,
+                                 sections=max(1, args.timeline_lines // 1000000), start=args.start,
+                                 step_s=args.timeline_step_s)
+
+    # Config saves the temporary config on creation, so it works on a copy
+    for file_name in ('config_static.ini', 'config_temp.ini'):
+        shutil.copy(os.path.join(REPO_PATH, file_name), work_dir)
+    juice_config = Config(work_dir)
+    processor = TimelineProcessor(juice_config, args.instruments)
+    stages = OrderedDict()
+
+    def record(name: str, function: Callable[[], int]) -> None:
+        seconds, items = time_stage(function, args.repeat)
+        stages[name] = OrderedDict([('seconds', seconds), ('items', items),
+                                    ('items_per_s', items / seconds if seconds > 0 else None)])
+        print("{:<28} {:>10.3f} s {:>12} items {:>14.0f} items/s".format(
+            name, seconds, items, stages[name]['items_per_s'] or 0))
+
+    reader = MappsReader()
+    record('read_attitude', lambda: reader.read(attitude_path) or len(reader.store))
+    quaternions = reader.store
+
+    m2k = JuiceMex2Ker(Mex2Ker.BACKEND_MEX2KER)
+    moc_path = os.path.join(work_dir, 'attitude.moc')
+
+    def export_moc():
+        exporter = MocExporter(quaternions, m2k.tls_path, m2k.tsc_path, m2k.object_name, m2k.object_id)
+        with open(moc_path, 'wb') as fd:
+            exporter.export_moc(fd)
+        return len(quaternions)
+    record('export_moc', export_moc)
+    os.remove(moc_path)
+
+    ck_path = os.path.join(work_dir, 'attitude.ck')
+
+    def write_ck():
+        if os.path.exists(ck_path):
+            os.remove(ck_path)
+        JuiceMex2Ker(args.ck_backend).convert(quaternions, ck_path)
+        return len(quaternions)
+    record('ck_backend_' + args.ck_backend, write_ck)
+
+    parsed = []
+
+    def parse_timeline():
+        parsed[:] = [TimelineParser(instruments=args.instruments).parse(timeline_path)]
+        return args.timeline_lines
+    record('parse_timeline', parse_timeline)
+    entries = parsed[0].entries
+
+    observations = processor._process_parsed_lines_into_observations(entries)
+    record('extract_observations', lambda: processor._process_parsed_lines_into_observations(entries) and len(entries))
+    observation_count = sum(len(times) for sensors in observations.values() for times in sensors.values())
+
+    output_path = os.path.join(work_dir, 'scenario')
+
+    def write_observations():
+        shutil.rmtree(output_path, ignore_errors=True)
+        os.makedirs(output_path)
+        require_json_path = os.path.join(output_path, 'LOAD_SCENARIO.json')
+        with open(require_json_path, 'w') as f:
+            json.dump({"require": []}, f)
+        processor._generate_observation_files(observations, 'Ganymede', require_json_path)
+        return observation_count
+    record('generate_observation_files', write_observations)
+    shutil.rmtree(output_path)
+
+    if args.metakernel:
+        spp = SolarPanelProcessor("JUICE", args.ck_backend, juice_config.get_solar_panel_ck_workers(),
+                                  juice_config.get_solar_panel_ck_tolerance_deg())
+        spy.furnsh(args.metakernel)
+        spy.furnsh(ck_path)
+        try:
+            et_start = spy.str2et(args.start.isoformat())
+            et_end = min(et_start + args.panel_hours * 3600.0,
+                         et_start + (args.attitude_rows - 1) * args.attitude_step_s)
+            step_s = juice_config.get_solar_panel_ck_sampling_seconds()
+            record('generate_panel_quaternions',
+                   lambda: len(spp._generate_panel_quaternions(et_start, et_end, step_s, [args.metakernel, ck_path])))
+        finally:
+            spy.unload(ck_path)
+            spy.unload(args.metakernel)
+
+    return OrderedDict([
+        ('results_version', RESULTS_VERSION),
+        ('version', juice_config.get_version()),
+        ('created', datetime.utcnow().isoformat()),
+        ('python', sys.version.split()[0]),
+        ('platform', platform.platform()),
+        ('parameters', OrderedDict([('attitude_rows', args.attitude_rows), ('attitude_step_s', args.attitude_step_s),
+                                    ('timeline_lines', args.timeline_lines),
+                                    ('timeline_step_s', args.timeline_step_s), ('instruments', args.instruments),
+                                    ('observations', observation_count), ('ck_backend', args.ck_backend),
+                                    ('repeat', args.repeat)])),
+        ('stages', stages),
+    ])
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """ Prints the time of each stage relative to the baseline results. """
+    if results['parameters'] != baseline['parameters']:
+        print("Warning: the baseline was measured with other parameters: {}".format(baseline['parameters']))
+    print("{:<28} {:>10} {:>10} {:>8}".format('stage', 'baseline s', 'now s', 'ratio'))
+    for name, stage in results['stages'].items():
+        if name in baseline['stages']:
+            before_s = baseline['stages'][name]['seconds']
+            print("{:<28} {:>10.3f} {:>10.3f} {:>8.2f}".format(name, before_s, stage['seconds'],
+                                                            stage['seconds'] / before_s if before_s else 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    instrument_names = [name for name, _ in INSTRUMENT_MODES]
+    parser.add_argument('--attitude-rows', type=int, default=100000, help='Rows of the attitude datapack.')
+    parser.add_argument('--attitude-step-s', type=int, default=60, help='Time between attitude rows.')
+    parser.add_argument('--timeline-lines', type=int, default=100000, help='Experiment mode lines of the timeline.')
+    parser.add_argument('--timeline-step-s', type=int, default=30,
+                        help='Time between mode switches. Smaller steps give denser timelines.')
+    parser.add_argument('--instruments', nargs='+', choices=instrument_names, default=instrument_names,
+                        help='Instruments in the timeline, which are also processed.')
+    parser.add_argument('--start', type=lambda text: datetime.strptime(text, "%Y-%m-%dT%H:%M:%S"),
+                        default=datetime(2031, 1, 1), help='Start time of the generated files, yyyy-mm-ddTHH:MM:SS.')
+    parser.add_argument('--ck-backend', choices=Mex2Ker.BACKENDS, default=Mex2Ker.DEFAULT_BACKEND)
+    parser.add_argument('--metakernel', help='Metakernel for the solar panel stage, which is skipped without it.')
+    parser.add_argument('--panel-hours', type=float, default=24.0, help='Time span of the solar panel stage.')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs of each stage. The fastest run is reported.')
+    parser.add_argument('--work-dir', help='Folder for generated input files, which are then kept for later runs. '
+                                           'Defaults to a temporary folder that is removed afterwards.')
+    parser.add_argument('--output', help='JSON file the results are written to.')
+    parser.add_argument('--compare', help='Results of an earlier run to compare with.')
+    args = parser.parse_args()
+
+    work_dir = args.work_dir if args.work_dir else tempfile.mkdtemp(prefix='pipeline_benchmark_')
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        results = run(args, work_dir)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import calendar
+import math
+import random
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+# Instruments and modes that appear in generated timelines. Modes are a mix of modes mapped to sensors
+# in config_static.ini, and modes that switch sensors off.
+INSTRUMENT_MODES = [
+    ("JANUS", ["SCI_F2_20pct", "SCI_ECA_20pct", "STANDBY", "OFF"]),
+    ("MAJIS", ["SCI_PB_NAD_20pct", "SCI_MC_MAX_20pct", "STANDBY"]),
+    ("UVS", ["SCIENCE_20pct", "HISTOGRAM_MID_C", "OFF"]),
+    ("SWI", ["MN_NAD_ST1_20pct", "STANDBY"]),
+    ("RIME", ["FLB_10_20pct", "FLYBY_CONS", "OFF"]),
+    ("GALA", ["SCIENCE_25_20pct", "STANDBY"]),
+    ("PEP", ["SCIENCE", "STANDBY"]),
+    ("RPWI", ["SCIENCE", "STANDBY"]),
+    ("JMAG", ["SCIENCE", "STANDBY"]),
+    ("3GM", ["SCIENCE", "STANDBY"]),
+]
+_MONTHS = [name for name in calendar.month_abbr if name]
+
+
+def timeline_entry_line(timestamp: datetime, instrument: str, mode: str) -> str:
+    """ :return: Experiment modes line of a MAPPS Timeline Dump, with the fixed columns the parser reads. """
+    time_str = "{:02d}-{}-{}_{:02d}:{:02d}:{:02d}".format(timestamp.day, _MONTHS[timestamp.month - 1], timestamp.year,
+                                                        timestamp.hour, timestamp.minute, timestamp.second)
+    return "{:<24}{:<12}{:<38}{:<18}ON\n".format(time_str, "EXP_MODE", instrument, mode)
+
+
+def write_synthetic_timeline(path: str, n_lines: int, instruments: List[str] = None, sections: int = 1,
+                             start: datetime = datetime(2031, 1, 1), step_s: int = 3, seed: int = 0) -> None:
+    """ Writes a synthetic MAPPS Timeline Dump .asc file.
+
+    :param path: Output file path.
+    :param n_lines: Number of experiment mode lines.
+    :param instruments: (optional) Instruments to cycle through, defaults to all of INSTRUMENT_MODES.
+    :param sections: Number of "Experiment modes:" sections the lines are split into.
+    :param start: Time of the first entry.
+    :param step_s: Time between consecutive entries in seconds.
+    :param seed: Seed of the random mode choice.
+    """
+    rng = random.Random(seed)
+    modes = dict(INSTRUMENT_MODES)
+    instruments = instruments if instruments else [name for name, _ in INSTRUMENT_MODES]
+    end = start + timedelta(seconds=n_lines * step_s)
+    section_size = -(-n_lines // sections) if n_lines else 0
+    with open(path, 'w', buffering=1 << 20) as f:
+        f.write("Synthetic MAPPS Timeline Dump\n\n")
+        f.write("Start time (UTC): {}\n".format(start.strftime("%d-%b-%Y_%H:%M:%S")))
+        f.write("End time (UTC): {}\n\n".format(end.strftime("%d-%b-%Y_%H:%M:%S")))
+        for i in range(n_lines):
+            if i % section_size == 0:
+                if i:
+                    f.write("\n")
+                f.write("Experiment modes:\nTime                    Type        Experiment"
+                        "                            Mode              State\n\n" + "-" * 100 + "\n")
+            instrument = instruments[i % len(instruments)]
+            f.write(timeline_entry_line(start + timedelta(seconds=i * step_s), instrument,
+                                        rng.choice(modes.get(instrument, ["SCIENCE"]))))
+        f.write("\n")
+
+
+_J2000 = datetime(2000, 1, 1, 12)
+
+
+def attitude_row_line(timestamp: datetime, quaternion: Tuple[float, float, float, float]) -> str:
+    """ :return: Data line of a MAPPS Quaternions+AttitudeMatrix datapack. """
+    julian_date = (timestamp - _J2000).total_seconds() / 86400.0
+    return "{:.6f},{}Z,{}Z,{:.7f},{:.7f},{:.7f},{:.7f}\n".format(
+        julian_date, timestamp.strftime("%y-%jT%H:%M:%S"), timestamp.strftime("%Y-%m-%dT%H:%M:%S"), *quaternion)
+
+
+def write_synthetic_attitude(path: str, n_rows: int, step_s: int = 60, start: datetime = datetime(2031, 1, 1),
+                             slew_period_s: int = 6 * 3600, seed: int = 0) -> None:
+    """ Writes a synthetic MAPPS attitude datapack .csv file, with the header lines MAPPS writes.
+
+    The attitude rotates slowly about an axis which changes at random every slew_period_s, so that
+    the quaternions are continuous, as in real datapacks.
+
+    :param path: Output file path.
+    :param n_rows: Number of quaternion rows, e.g. 7 days * 86400 s / step_s.
+    :param step_s: Time between consecutive rows in seconds.
+    :param start: Time of the first row.
+    :param slew_period_s: Time after which the rotation axis changes.
+    :param seed: Seed of the random rotation axes.
+    """
+    rng = random.Random(seed)
+    end = start + timedelta(seconds=(n_rows - 1) * step_s)
+    with open(path, 'w', buffering=1 << 20) as f:
+        f.write("# \n# MAPPS Datapack\n# \n# Datapack name  : Quaternions+AttitudeMatrix\n#\n")
+        f.write("# Start time         : {}\n".format(start.strftime("%d-%b-%Y_%H:%M:%S")))
+        f.write("# End time           : {}\n".format(end.strftime("%d-%b-%Y_%H:%M:%S")))
+        f.write("# Output step        : {:.2f} Seconds\n#\n".format(step_s))
+        f.write("Julian date (from 01-01-2000 12:00),Date (yy-doyThh:mm:ss),Date (yyyy-mm-ddThh:mm:ssZ),"
+                "Quaternion Value,Quaternion Axis 1,Quaternion Axis 2,Quaternion Axis 3\n(days),(UTC),(UTC),,,,\n")
+        q = (1.0, 0.0, 0.0, 0.0)
+        rate_rad_s = math.radians(0.01)
+        axis = None
+        for i in range(n_rows):
+            if i * step_s % slew_period_s < step_s:
+                axis = [rng.gauss(0.0, 1.0) for _ in range(3)]
+                norm = math.sqrt(sum(a * a for a in axis))
+                axis = [a / norm for a in axis]
+                half = 0.5 * rate_rad_s * step_s
+                dq = (math.cos(half),) + tuple(math.sin(half) * a for a in axis)
+            f.write(attitude_row_line(start + timedelta(seconds=i * step_s), q))
+            q = _quaternion_product(q, dq)
+            norm = math.sqrt(sum(c * c for c in q))
+            q = tuple(c / norm for c in q)
+
+
+def _quaternion_product(a: Tuple[float, float, float, float],
+                        b: Tuple[float, float, float, float]) -> Tuple[float, float, float, float]:
+    return (a[0] * b[0] - a[1] * b[1] - a[2] * b[2] - a[3] * b[3],
+            a[0] * b[1] + a[1] * b[0] + a[2] * b[3] - a[3] * b[2],
+            a[0] * b[2] - a[1] * b[3] + a[2] * b[0] + a[3] * b[1],
+            a[0] * b[3] + a[1] * b[2] - a[2] * b[1] + a[3] * b[0])
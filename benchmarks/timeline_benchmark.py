@@ -0,0 +1,77 @@
+""" Timeline parsing and observation extraction on synthetic MAPPS Timeline Dumps of growing size.
+
+Run from the repository root:
+
+    python -m benchmarks.timeline_benchmark --lines 1000000,10000000
+
+Time per line should stay flat as the number of lines grows. It depends on the share of lines that belong
+to processed instruments, since other lines are skipped while parsing, but not on the number of instruments
+as such.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.synthetic import INSTRUMENT_MODES, write_synthetic_timeline
+from config import Config
+from timeline_processor.observation_extractor import extract_observations
+from timeline_processor.timeline_parser import TimelineParser
+
+REPO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def run(n_lines: int, instruments: list, mode_sensors, work_dir: str) -> dict:
+    """ Generates a timeline with n_lines entries, then parses it and extracts observations.
+
+    :return: Dictionary of timings in seconds, and counts.
+    """
+    timeline_path = os.path.join(work_dir, 'timeline_{}.asc'.format(n_lines))
+    if not os.path.exists(timeline_path):
+        write_synthetic_timeline(timeline_path, n_lines, sections=max(1, n_lines // 1000000))
+
+    start = time.perf_counter()
+    parsed = TimelineParser(instruments=instruments).parse(timeline_path)
+    parse_s = time.perf_counter() - start
+    start = time.perf_counter()
+    observations = extract_observations(parsed.entries, instruments, mode_sensors)
+    extract_s = time.perf_counter() - start
+    return {
+        'lines': n_lines,
+        'instruments': len(instruments),
+        'entries': len(parsed.entries),
+        'observations': sum(len(o) for sensors in observations.values() for o in sensors.values()),
+        'parse_s': parse_s,
+        'extract_s': extract_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', default='1000000,2000000,5000000,10000000',
+                        help='Comma-separated timeline sizes in lines.')
+    parser.add_argument('--work-dir', help='Folder for generated timelines, which are then kept for later runs. '
+                                           'Defaults to a temporary folder that is removed afterwards.')
+    args = parser.parse_args()
+
+    mode_sensors = Config.StaticConfig(REPO_PATH).get_mode_sensors()
+    all_instruments = [name for name, _ in INSTRUMENT_MODES if name in mode_sensors]
+    work_dir = args.work_dir if args.work_dir else tempfile.mkdtemp(prefix='timeline_benchmark_')
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        print("{:>10} {:>5} {:>10} {:>12} {:>9} {:>11} {:>9}".format(
+            'lines', 'instr', 'entries', 'observations', 'parse s', 'extract s', 'ns/line'))
+        for n_lines in [int(n) for n in args.lines.split(',')]:
+            # a quarter of the instruments, and all of them: per line cost must not grow with the instrument count
+            for instruments in (all_instruments[0:max(1, len(all_instruments) // 4)], all_instruments):
+                result = run(n_lines, instruments, mode_sensors, work_dir)
+                print("{lines:>10} {instruments:>5} {entries:>10} {observations:>12} {parse_s:>9.2f} {extract_s:>11.2f}"
+                      .format(**result) + " {:>9.0f}".format(1e9 * (result['parse_s'] + result['extract_s']) / n_lines))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
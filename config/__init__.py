@@ -1,66 +1,153 @@
+import atexit
 import json
 import os
 import shutil
+import stat
 import datetime
-from collections import OrderedDict, defaultdict
+import tempfile
+import threading
+import time
+from collections import OrderedDict, defaultdict, namedtuple
+from contextlib import contextmanager
 
 from configparser import ConfigParser
-from typing import Any, List
+from typing import Any, Callable, ContextManager, Iterator, List
+
+from attitude_converter.ck_cache import default_file_mode
+from config.asset_store import AssetStore
+from config.file_lock import FileLock
+
+
+_CacheEntry = namedtuple('_CacheEntry', ['value', 'stamp', 'checked'])
+
+
+def _copy_json(value: Any) -> Any:
+    """ Deep copy of a parsed JSON document, keeping the dictionary types. Much faster than copy.deepcopy. """
+    if isinstance(value, dict):
+        copy = value.copy()
+        for key, item in copy.items():
+            if isinstance(item, (dict, list)):
+                copy[key] = _copy_json(item)
+        return copy
+    return [_copy_json(item) if isinstance(item, (dict, list)) else item for item in value]
 
 
 class Config:
     class StaticConfig(ConfigParser):
+        """ Static configuration from config_static.ini, and the JSON templates.
+
+        Parsed values and templates are cached, and reloaded when their file is modified. Files are
+        checked for modifications at most every CHECK_INTERVAL_S seconds.
+        """
+        CHECK_INTERVAL_S = 1.0
+
         def __init__(self, path: str):
             ConfigParser.__init__(self)
             self.file = os.path.join(path, 'config_static.ini')
+            self._cache = {}
+            self._derived = {}
+            self._generation = 0
+            self._refresh()
+
+        def _cached(self, key: str, file_path: str, load: Callable[[], Any]) -> Any:
+            """ :return: Value returned by load(), which is only called again once file_path is modified. """
+            now = time.monotonic()
+            entry = self._cache.get(key)
+            if entry is not None and now - entry.checked < self.CHECK_INTERVAL_S:
+                return entry.value
+            try:
+                stat = os.stat(file_path)
+                stamp = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                stamp = None
+            value = entry.value if entry is not None and entry.stamp == stamp else load()
+            self._cache[key] = _CacheEntry(value, stamp, now)
+            return value
+
+        def _refresh(self) -> int:
+            """ Re-reads the .ini file if it was modified.
+
+            :return: Generation of the .ini contents, incremented on each read.
+            """
+            return self._cached('ini', self.file, self._read_ini)
+
+        def _read_ini(self) -> int:
+            self.clear()
             self.read([self.file])
+            self._generation += 1
+            return self._generation
+
+        def _ini_cached(self, key: str, load: Callable[[], Any]) -> Any:
+            """ :return: Value computed by load() from the .ini contents, recomputed once the .ini file is modified. """
+            generation = self._refresh()
+            entry = self._derived.get(key)
+            if entry is None or entry[0] != generation:
+                entry = self._derived[key] = (generation, load())
+            return entry[1]
+
+        def _template(self, file_name: str) -> OrderedDict:
+            def load():
+                with open(template_path) as f:
+                    return json.load(f, object_pairs_hook=OrderedDict)
+
+            template_path = os.path.abspath(os.path.join(__file__, '..', file_name))
+            # every caller gets its own copy to fill in
+            return _copy_json(self._cached(file_name, template_path, load))
 
         def get_property(self, section: str, option: str) -> str:
+            self._refresh()
             if not self.has_option(section, option):
                 return ""
             return self.get(section, option)
 
         def get_object_property(self, section: str, option: str) -> str:
+            self._refresh()
             if not self.has_option(section, option):
                 return "{}"
             return self.get(section, option)
 
         def get_list_property(self, section: str, option: str) -> str:
+            self._refresh()
             if not self.has_option(section, option):
                 return "[]"
             return self.get(section, option)
 
-        @staticmethod
-        def get_template_sensor() -> OrderedDict:
-            template_path = os.path.abspath(os.path.join(__file__, '..', 'template_sensor.json'))
-            return json.load(open(template_path), object_pairs_hook=OrderedDict)
+        def get_template_sensor(self) -> OrderedDict:
+            return self._template('template_sensor.json')
 
-        @staticmethod
-        def get_template_observation() -> OrderedDict:
-            template_path = os.path.abspath(os.path.join(__file__, '..', 'template_observation.json'))
-            return json.load(open(template_path), object_pairs_hook=OrderedDict)
+        def get_template_observation(self) -> OrderedDict:
+            return self._template('template_observation.json')
+
+        def get_template_scenario(self) -> OrderedDict:
+            return self._template('template_scenario.json')
 
         @staticmethod
-        def get_template_scenario() -> OrderedDict:
-            template_path = os.path.abspath(os.path.join(__file__, '..', 'template_scenario.json'))
-            return json.load(open(template_path), object_pairs_hook=OrderedDict)
+        def create_spacecraft_folder_only(base_scenario_folder_path: str, asset_store: AssetStore = None) -> str:
+            return Config.StaticConfig._create_spacecraft_folder('spacecraft_only', base_scenario_folder_path,
+                                                                 asset_store)
 
         @staticmethod
-        def create_spacecraft_folder_only(base_scenario_folder_path: str) -> str:
-            template_folder_path = os.path.abspath(os.path.join(__file__, '..', 'template_folders',
-                                                                'spacecraft_only'))
-            output_folder_path = os.path.abspath(os.path.join(base_scenario_folder_path, 'spacecraft'))
-            return shutil.copytree(template_folder_path, output_folder_path)
+        def create_spacecraft_folder_with_solar_panels(base_scenario_folder_path: str,
+                                                       asset_store: AssetStore = None) -> str:
+            return Config.StaticConfig._create_spacecraft_folder('with_solar_panels', base_scenario_folder_path,
+                                                                 asset_store)
 
         @staticmethod
-        def create_spacecraft_folder_with_solar_panels(base_scenario_folder_path: str) -> str:
-            template_folder_path = os.path.abspath(os.path.join(__file__, '..', 'template_folders',
-                                                                'with_solar_panels'))
+        def _create_spacecraft_folder(template_name: str, base_scenario_folder_path: str,
+                                      asset_store: AssetStore = None) -> str:
+            template_folder_path = os.path.abspath(os.path.join(__file__, '..', 'template_folders', template_name))
             output_folder_path = os.path.abspath(os.path.join(base_scenario_folder_path, 'spacecraft'))
-            return shutil.copytree(template_folder_path, output_folder_path)
+            if asset_store is None:
+                return shutil.copytree(template_folder_path, output_folder_path)
+            report = asset_store.deploy(template_folder_path, output_folder_path)
+            print(" Linked {} spacecraft files ({:.1f} MB) from asset store, copied {} files ({:.1f} kB).".format(
+                report.linked_files, report.linked_bytes / 1024 ** 2, report.copied_files, report.copied_bytes / 1024))
+            return output_folder_path
 
         def get_mode_sensors(self) -> OrderedDict:
-            return json.loads(self.get_object_property('itl', 'mode_sensors'), object_pairs_hook=OrderedDict)
+            mode_sensors = self._ini_cached('mode_sensors', lambda: json.loads(
+                self.get_object_property('itl', 'mode_sensors'), object_pairs_hook=OrderedDict))
+            return _copy_json(mode_sensors)
 
         def get_sensor_colors(self):
             # If entry is missing, the defaultdict will return a gray value
@@ -68,7 +155,9 @@ class Config:
                 color = [0.5, 0.5, 0.5]
                 return color
 
-            return defaultdict(default_color, json.loads(self.get_object_property('itl', 'sensor_colors')))
+            sensor_colors = self._ini_cached('sensor_colors', lambda: json.loads(
+                self.get_object_property('itl', 'sensor_colors')))
+            return defaultdict(default_color, {name: list(color) for name, color in sensor_colors.items()})
 
         def get_instruments(self) -> List[str]:
             return list(self.get_mode_sensors().keys())
@@ -77,21 +166,110 @@ class Config:
             return json.loads(self.get_list_property('itl', 'targets'))
 
     class TempConfig(ConfigParser):
-        def __init__(self, path: str):
+        """ Runtime state in config_temp.ini, such as the last used folders and GUI values.
+
+        Changes are written when set, or once at the end of a transaction(). If flush_delay_s is set,
+        changes outside a transaction are written in the background after that delay instead, so
+        that bursts of changes are written once. Writes replace the file atomically while holding
+        a file lock, and only overwrite the options changed by this process.
+        """
+
+        def __init__(self, path: str, flush_delay_s: float = None):
+            """
+            :param path: Folder of config_temp.ini.
+            :param flush_delay_s: (optional) Delay of background writes. By default changes are written right away.
+            """
             ConfigParser.__init__(self)
             self.file = os.path.join(path, 'config_temp.ini')
+            self.flush_delay_s = flush_delay_s
+            # options changed since the last write, and their values
+            self._changes = OrderedDict()
+            self._transaction_depth = 0
+            self._lock = threading.RLock()
+            self._flush_timer = None
             self.read([self.file])
+            if flush_delay_s:
+                atexit.register(self.flush)
             self.set_property('runtime', 'last_use', str(datetime.datetime.utcnow()))
 
         def set_property(self, section: str, option: str, value: Any) -> None:
-            if not self.has_section(section):
-                self.add_section(section)
-            self.set(section, option, value)
-            self.save()
+            with self._lock:
+                if not self.has_section(section):
+                    self.add_section(section)
+                self.set(section, option, value)
+                self._changes[(section, option)] = self.get(section, option, raw=True)
+                if self._transaction_depth == 0:
+                    self._schedule_flush()
+
+        @contextmanager
+        def transaction(self) -> Iterator['Config.TempConfig']:
+            """ Groups changes, which are written once at the end. If an exception is raised inside the
+            transaction, its changes are undone and nothing is written. Transactions can be nested.
+            """
+            with self._lock:
+                snapshot = {section: dict(self.items(section, raw=True)) for section in self.sections()}
+                changes = OrderedDict(self._changes)
+                self._transaction_depth += 1
+                try:
+                    yield self
+                except BaseException:
+                    for section in self.sections():
+                        self.remove_section(section)
+                    self.read_dict(snapshot)
+                    self._changes = changes
+                    raise
+                finally:
+                    self._transaction_depth -= 1
+                if self._transaction_depth == 0:
+                    self._schedule_flush()
+
+        def flush(self) -> None:
+            """ Writes pending changes now. """
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if self._changes:
+                    self.save()
 
         def save(self) -> None:
-            with open(self.file, 'w') as cfg:
-                self.write(cfg)
+            """ Writes the changed options into the file, keeping options that other processes wrote meanwhile. """
+            with self._lock, FileLock(self.file):
+                on_disk = ConfigParser()
+                on_disk.read([self.file])
+                for (section, option), value in self._changes.items():
+                    if not on_disk.has_section(section):
+                        on_disk.add_section(section)
+                    on_disk.set(section, option, value)
+                # write next to the file and replace it, so that readers never see a partial file
+                temp_fd, temp_path = tempfile.mkstemp(prefix='.config_temp_', dir=os.path.dirname(self.file))
+                try:
+                    with os.fdopen(temp_fd, 'w') as cfg:
+                        on_disk.write(cfg)
+                    # mkstemp creates the file readable only by its owner, the replaced file keeps its permissions
+                    os.chmod(temp_path, stat.S_IMODE(os.stat(self.file).st_mode) if os.path.exists(self.file)
+                             else default_file_mode())
+                    os.replace(temp_path, self.file)
+                except BaseException:
+                    os.remove(temp_path)
+                    raise
+                self._changes.clear()
+                # pick up the options written by other processes
+                for section in on_disk.sections():
+                    for option, value in on_disk.items(section, raw=True):
+                        if not self.has_section(section):
+                            self.add_section(section)
+                        self.set(section, option, value)
+
+        def _schedule_flush(self) -> None:
+            if not self._changes:
+                return
+            if not self.flush_delay_s:
+                self.save()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_delay_s, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
 
         def get_property(self, section: str, option: str) -> str:
             if not self.has_option(section, option):
@@ -103,9 +281,17 @@ class Config:
                 return False
             return self.getboolean(section, option)
 
-    def __init__(self, path: str):
+    def __init__(self, path: str, temp_flush_delay_s: float = None):
+        """
+        :param path: Folder of config_static.ini and config_temp.ini.
+        :param temp_flush_delay_s: (optional) Delay of background writes of config_temp.ini, see TempConfig.
+        """
         self.static = Config.StaticConfig(path)
-        self.temp = Config.TempConfig(path)
+        self.temp = Config.TempConfig(path, temp_flush_delay_s)
+
+    def transaction(self) -> ContextManager['Config.TempConfig']:
+        """ Groups changes of runtime state, which are then written once. See TempConfig.transaction(). """
+        return self.temp.transaction()
 
     def get_last_scenario_folder(self) -> str:
         return self.temp.get_property('folders', 'scenario')
@@ -164,7 +350,7 @@ class Config:
     def set_is_custom_start_time_enabled(self, value: bool) -> None:
         if not isinstance(value, bool):
             raise ValueError()
-        self.temp.set('ui', 'is_custom_start_time_enabled', str(value))
+        self.temp.set_property('ui', 'is_custom_start_time_enabled', str(value))
 
     def get_is_solar_panel_rotation_enabled(self) -> bool:
         return self.temp.get_boolean('ui', 'is_solar_panel_rotation_enabled')
@@ -172,7 +358,15 @@ class Config:
     def set_is_solar_panel_rotation_enabled(self, value: bool) -> None:
         if not isinstance(value, bool):
             raise ValueError()
-        self.temp.set('ui', 'is_solar_panel_rotation_enabled', str(value))
+        self.temp.set_property('ui', 'is_solar_panel_rotation_enabled', str(value))
+
+    def get_is_incremental_update_enabled(self) -> bool:
+        return self.temp.get_boolean('ui', 'is_incremental_update_enabled')
+
+    def set_is_incremental_update_enabled(self, value: bool) -> None:
+        if not isinstance(value, bool):
+            raise ValueError()
+        self.temp.set_property('ui', 'is_incremental_update_enabled', str(value))
 
     def get_custom_start_time(self) -> str:
         return self.temp.get_property('ui', 'custom_start_time')
@@ -196,10 +390,18 @@ class Config:
         return self.static.get_template_observation()
 
     def create_spacecraft_folder_only(self, base_scenario_folder_path: str) -> str:
-        return self.static.create_spacecraft_folder_only(base_scenario_folder_path)
+        return self.static.create_spacecraft_folder_only(base_scenario_folder_path, self.get_asset_store())
 
     def create_spacecraft_folder_with_solar_panels(self, base_scenario_folder_path: str) -> str:
-        return self.static.create_spacecraft_folder_with_solar_panels(base_scenario_folder_path)
+        return self.static.create_spacecraft_folder_with_solar_panels(base_scenario_folder_path,
+                                                                      self.get_asset_store())
+
+    def get_asset_store(self) -> AssetStore:
+        """ :return: Store the spacecraft models are linked from, or None if they are copied. """
+        mode = self.static.get_property("assets", "deployment") or "copy"
+        if mode == "copy":
+            return None
+        return AssetStore(self.static.get_property("assets", "path"), mode)
 
     def get_mode_sensors(self) -> OrderedDict:
         return self.static.get_mode_sensors()
@@ -210,8 +412,44 @@ class Config:
     def get_instruments(self) -> List[str]:
         return self.static.get_instruments()
 
+    def get_ck_backend(self) -> str:
+        return self.static.get_property("attitude", "ck_backend")
+
+    def get_decimation_tolerance_deg(self) -> float:
+        return float(self.static.get_property("attitude", "decimation_tolerance_deg") or 0.0)
+
+    def get_is_ck_cache_enabled(self) -> bool:
+        return self.static.getboolean("ck_cache", "enabled", fallback=False)
+
+    def get_ck_cache_path(self) -> str:
+        return self.static.get_property("ck_cache", "path")
+
+    def get_ck_cache_max_size_mb(self) -> int:
+        return int(self.static.get_property("ck_cache", "max_size_mb") or 2048)
+
+    def get_is_memory_tracing_enabled(self) -> bool:
+        return self.static.getboolean("instrumentation", "trace_memory", fallback=False)
+
+    def get_is_stage_profiling_enabled(self) -> bool:
+        return self.static.getboolean("instrumentation", "profile", fallback=False)
+
+    def get_observation_layout(self) -> str:
+        return self.static.get_property("observations", "observation_layout") or "per_observation"
+
+    def get_observation_bucket_hours(self) -> float:
+        return float(self.static.get_property("observations", "observation_bucket_hours") or 0.0)
+
+    def get_output_writer_workers(self) -> int:
+        return int(self.static.get_property("observations", "output_writer_workers") or 8)
+
     def get_solar_panel_ck_sampling_seconds(self) -> int:
         return int(self.static.get_property("solar_panels", "panel_ck_sampling_seconds"))
 
     def get_solar_panel_ck_span_days(self) -> int:
         return int(self.static.get_property("solar_panels", "panel_ck_span_days"))
+
+    def get_solar_panel_ck_workers(self) -> int:
+        return int(self.static.get_property("solar_panels", "panel_ck_workers") or 1)
+
+    def get_solar_panel_ck_tolerance_deg(self) -> float:
+        return float(self.static.get_property("solar_panels", "panel_ck_tolerance_deg") or 0.0)
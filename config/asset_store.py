@@ -0,0 +1,148 @@
+import os
+import shutil
+import stat
+import sys
+import tempfile
+from collections import namedtuple
+
+from attitude_converter.ck_cache import CkCache, default_cache_path, default_file_mode
+
+DeploymentReport = namedtuple('DeploymentReport', ['linked_files', 'linked_bytes', 'copied_files', 'copied_bytes'])
+
+if sys.platform.startswith('linux'):
+    import fcntl
+    # ioctl request that makes a file share the extents of another file (btrfs, XFS, ...)
+    _FICLONE = 0x40049409
+else:
+    fcntl = None
+
+
+def default_asset_path() -> str:
+    """ Per-user asset directory, e.g. ~/.cache/mapps2cosmographia/assets or %LOCALAPPDATA%/mapps2cosmographia/assets """
+    return os.path.join(os.path.dirname(default_cache_path()), 'assets')
+
+
+class AssetStore:
+    """ Shared store of the large immutable files of the spacecraft template folders, i.e. models and textures.
+
+    Files are stored under the digest of their contents, so that every version of a file has its own
+    entry. Scenario folders get links to these entries instead of copies, while JSON files, which are
+    edited after deployment, and small files are always copied.
+
+    Modes:
+        - auto: reflink where the file system supports it, hard link otherwise, copy as a last resort.
+        - reflink: copy-on-write clone of the stored file, independent of the store afterwards.
+        - hardlink: another name of the stored file. Must not be modified in the scenario folder.
+        - symlink: link to the stored file. The scenario breaks if the store is deleted.
+        - copy: no sharing, as without a store.
+    Links that can't be created (e.g. across file systems) fall back to copies.
+    """
+
+    MODES = ('auto', 'reflink', 'hardlink', 'symlink', 'copy')
+    # smaller files are always copied
+    MIN_SHARED_BYTES = 64 * 1024
+    MATERIALIZED_EXTENSIONS = ('.json',)
+
+    def __init__(self, path: str = None, mode: str = 'auto'):
+        """
+        :param path: (optional) Store directory. Defaults to default_asset_path().
+        :param mode: How files are placed into scenario folders, one of MODES.
+        """
+        if mode not in AssetStore.MODES:
+            raise ValueError("Unknown asset deployment mode '{}'. Available modes: {}"
+                             .format(mode, ", ".join(AssetStore.MODES)))
+        self.path = os.path.abspath(path if path else default_asset_path())
+        self.mode = mode
+
+    def deploy(self, template_folder_path: str, output_folder_path: str) -> DeploymentReport:
+        """ Recreates a template folder at output_folder_path, with shared files linked from the store.
+
+        :param template_folder_path: Folder to deploy.
+        :param output_folder_path: Folder to create. Must not exist.
+        :return: Counts of linked and copied files.
+        """
+        linked_files, linked_bytes, copied_files, copied_bytes = 0, 0, 0, 0
+        for folder_path, _, file_names in os.walk(template_folder_path):
+            target_folder_path = os.path.join(output_folder_path, os.path.relpath(folder_path, template_folder_path))
+            os.makedirs(target_folder_path)
+            for file_name in file_names:
+                source_path = os.path.join(folder_path, file_name)
+                target_path = os.path.join(target_folder_path, file_name)
+                size = os.path.getsize(source_path)
+                if self._is_shared(source_path, size) and self._link(self.publish(source_path), target_path):
+                    linked_files += 1
+                    linked_bytes += size
+                else:
+                    shutil.copy2(source_path, target_path)
+                    copied_files += 1
+                    copied_bytes += size
+        return DeploymentReport(linked_files, linked_bytes, copied_files, copied_bytes)
+
+    def publish(self, file_path: str) -> str:
+        """ Adds a file to the store, unless the same contents are already stored.
+
+        :return: Path of the stored file.
+        """
+        extension = os.path.splitext(file_path)[1]
+        digest = CkCache.file_hash(file_path)
+        entry_path = os.path.join(self.path, digest[0:2], digest + extension)
+        if not os.path.exists(entry_path) or not self._repair_mode(entry_path):
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            # copy under a temporary name first, so that concurrent deployments never link a partial file
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix='.tmp')
+            os.close(fd)
+            try:
+                shutil.copyfile(file_path, temp_path)
+                # entries are linked into scenarios of every deployment mode, which other users must be able to read
+                os.chmod(temp_path, default_file_mode())
+                os.replace(temp_path, entry_path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        return entry_path
+
+    @staticmethod
+    def _repair_mode(entry_path: str) -> bool:
+        """ Gives an existing entry the default permissions, as entries stored before they were made readable
+        to everyone are only readable by their owner.
+
+        :return: False if the permissions can't be changed, e.g. for an entry of another user.
+        """
+        mode = default_file_mode()
+        try:
+            if stat.S_IMODE(os.stat(entry_path).st_mode) != mode:
+                os.chmod(entry_path, mode)
+        except OSError:
+            return False
+        return True
+
+    def _is_shared(self, file_path: str, size: int) -> bool:
+        return self.mode != 'copy' and size >= AssetStore.MIN_SHARED_BYTES and \
+            not file_path.lower().endswith(AssetStore.MATERIALIZED_EXTENSIONS)
+
+    def _link(self, entry_path: str, target_path: str) -> bool:
+        """ Places the stored file at target_path according to the mode.
+
+        :return: False if no link could be created.
+        """
+        modes = ('reflink', 'hardlink') if self.mode == 'auto' else (self.mode,)
+        for mode in modes:
+            try:
+                if mode == 'reflink':
+                    self._reflink(entry_path, target_path)
+                elif mode == 'hardlink':
+                    os.link(entry_path, target_path)
+                else:
+                    os.symlink(entry_path, target_path)
+                return True
+            except (OSError, NotImplementedError):
+                if os.path.exists(target_path):
+                    os.remove(target_path)
+        return False
+
+    @staticmethod
+    def _reflink(entry_path: str, target_path: str) -> None:
+        if fcntl is None:
+            raise NotImplementedError("Reflinks are only supported on Linux.")
+        with open(entry_path, 'rb') as source, open(target_path, 'wb') as target:
+            fcntl.ioctl(target.fileno(), _FICLONE, source.fileno())
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """ Exclusive inter-process lock on a lock file next to the protected file.
+
+    Used as a context manager. The lock is advisory, i.e. it only excludes other processes
+    that use FileLock on the same path.
+    """
+
+    POLL_INTERVAL_S = 0.05
+
+    def __init__(self, path: str, timeout_s: float = 10.0):
+        """
+        :param path: Path of the protected file. The lock file is this path with '.lock' appended.
+        :param timeout_s: How long to wait for another process to release the lock.
+        """
+        self.lock_path = path + '.lock'
+        self.timeout_s = timeout_s
+        self._fd = None
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
+
+    def acquire(self) -> None:
+        """ :raises TimeoutError: If the lock is still held by another process after timeout_s. """
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout_s
+        while True:
+            try:
+                if sys.platform == "win32":
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    os.close(fd)
+                    raise TimeoutError("Could not lock '{}' within {} s.".format(self.lock_path, self.timeout_s))
+                time.sleep(FileLock.POLL_INTERVAL_S)
+        self._fd = fd
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        if sys.platform == "win32":
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
@@ -0,0 +1,203 @@
+import unittest
+import os
+import shutil
+import stat
+import tempfile
+from configparser import ConfigParser
+
+from attitude_converter.ck_cache import default_file_mode
+from config import Config
+from config.asset_store import AssetStore
+from config.file_lock import FileLock
+
+REPO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+class StaticConfigTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        shutil.copy(os.path.join(REPO_PATH, 'config_static.ini'), self.tmp_dir)
+        self.config = Config.StaticConfig(self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_template_copies(self):
+        observation = self.config.get_template_observation()
+        observation["items"][0]["geometry"]["groups"].append({"startTime": "2030-01-01"})
+        observation["items"][0]["name"] = "changed"
+        fresh = self.config.get_template_observation()
+        self.assertEqual(fresh["items"][0]["geometry"]["groups"], [])
+        self.assertNotIn("name", fresh["items"][0])
+        self.assertEqual(list(fresh.keys()), ["version", "name", "items"])
+
+        self.config.get_mode_sensors()["JANUS"]["NEW_MODE"] = "JUICE_JANUS"
+        self.assertNotIn("NEW_MODE", self.config.get_mode_sensors()["JANUS"])
+
+    def test_reload_on_change(self):
+        self.assertEqual(self.config.get_sensor_colors()["GALA"], [0, 0, 1])
+        ini_path = os.path.join(self.tmp_dir, 'config_static.ini')
+        with open(ini_path) as f:
+            contents = f.read()
+        with open(ini_path, 'w') as f:
+            f.write(contents.replace('"GALA": [0, 0, 1]', '"GALA": [0, 1, 1]'))
+        # make sure the modification time differs on coarse file systems
+        stat = os.stat(ini_path)
+        os.utime(ini_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.config.get_sensor_colors()["GALA"], [0, 0, 1])
+        # with the check interval over, the file is read again
+        self.config.CHECK_INTERVAL_S = 0
+        self.assertEqual(self.config.get_sensor_colors()["GALA"], [0, 1, 1])
+        self.assertEqual(self.config.get_property('attitude', 'ck_backend'), 'spice')
+
+
+class TempConfigTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        shutil.copy(os.path.join(REPO_PATH, 'config_temp.ini'), self.tmp_dir)
+        self.file = os.path.join(self.tmp_dir, 'config_temp.ini')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _on_disk(self, section: str, option: str) -> str:
+        parser = ConfigParser()
+        parser.read([self.file])
+        return parser.get(section, option, fallback=None)
+
+    def _count_saves(self, temp: Config.TempConfig) -> list:
+        saves = []
+        save = temp.save
+
+        def counting_save():
+            saves.append(1)
+            save()
+
+        temp.save = counting_save
+        return saves
+
+    def test_transaction(self):
+        temp = Config.TempConfig(self.tmp_dir)
+        saves = self._count_saves(temp)
+        with temp.transaction():
+            temp.set_property('folders', 'attitude', 'a.csv')
+            with temp.transaction():
+                temp.set_property('folders', 'timeline', 't.asc')
+            temp.set_property('ui', 'selected_target', 'Callisto')
+            self.assertEqual(self._on_disk('folders', 'timeline'), '')
+        self.assertEqual(len(saves), 1)
+        self.assertEqual(self._on_disk('folders', 'timeline'), 't.asc')
+        self.assertEqual(self._on_disk('ui', 'selected_target'), 'Callisto')
+        # no temporary files are left behind
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['config_temp.ini', 'config_temp.ini.lock'])
+
+        with self.assertRaises(ValueError):
+            with temp.transaction():
+                temp.set_property('ui', 'selected_target', 'Europa')
+                raise ValueError()
+        self.assertEqual(temp.get_property('ui', 'selected_target'), 'Callisto')
+        self.assertEqual(self._on_disk('ui', 'selected_target'), 'Callisto')
+        self.assertEqual(len(saves), 1)
+
+    def test_file_mode(self):
+        # saving keeps the permissions of the file, and a new file gets the default ones
+        os.chmod(self.file, 0o640)
+        Config.TempConfig(self.tmp_dir).set_property('ui', 'selected_target', 'Callisto')
+        self.assertEqual(stat.S_IMODE(os.stat(self.file).st_mode), 0o640)
+        os.remove(self.file)
+        Config.TempConfig(self.tmp_dir)
+        self.assertEqual(stat.S_IMODE(os.stat(self.file).st_mode), default_file_mode())
+
+    def test_concurrent_writers(self):
+        first = Config.TempConfig(self.tmp_dir)
+        second = Config.TempConfig(self.tmp_dir)
+        first.set_property('folders', 'attitude', 'first.csv')
+        second.set_property('folders', 'timeline', 'second.asc')
+        self.assertEqual(self._on_disk('folders', 'attitude'), 'first.csv')
+        self.assertEqual(self._on_disk('folders', 'timeline'), 'second.asc')
+        self.assertEqual(second.get_property('folders', 'attitude'), 'first.csv')
+
+        with FileLock(self.file):
+            with self.assertRaises(TimeoutError):
+                FileLock(self.file, timeout_s=0.1).acquire()
+
+    def test_debounced_flush(self):
+        temp = Config.TempConfig(self.tmp_dir, flush_delay_s=60)
+        saves = self._count_saves(temp)
+        for i in range(10):
+            temp.set_property('ui', 'observation_lifetime_min', str(i))
+        self.assertEqual(self._on_disk('ui', 'observation_lifetime_min'), '10')
+        temp.flush()
+        self.assertEqual(len(saves), 1)
+        self.assertEqual(self._on_disk('ui', 'observation_lifetime_min'), '9')
+
+
+class AssetStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.tmp_dir, 'store')
+        self.template_path = os.path.join(REPO_PATH, 'config', 'template_folders', 'spacecraft_only')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _deploy(self, mode: str, output_name: str) -> str:
+        output_path = os.path.join(self.tmp_dir, output_name)
+        AssetStore(self.store_path, mode).deploy(self.template_path, output_path)
+        for file_name in os.listdir(self.template_path):
+            with open(os.path.join(self.template_path, file_name), 'rb') as template, \
+                    open(os.path.join(output_path, file_name), 'rb') as deployed:
+                self.assertEqual(template.read(), deployed.read())
+        return output_path
+
+    def test_hardlink(self):
+        first = self._deploy('hardlink', 'first')
+        second = self._deploy('hardlink', 'second')
+        self.assertTrue(os.path.samefile(os.path.join(first, 'juice.3ds'), os.path.join(second, 'juice.3ds')))
+        self.assertGreaterEqual(os.stat(os.path.join(first, 'juice.3ds')).st_nlink, 3)
+        # linked assets are as readable as copied ones
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.join(first, 'juice.3ds')).st_mode), default_file_mode())
+        # entries stored only readable by their owner are repaired by the next deployment
+        os.chmod(os.path.join(first, 'juice.3ds'), 0o600)
+        third = self._deploy('hardlink', 'third')
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.join(third, 'juice.3ds')).st_mode), default_file_mode())
+        # JSON files are edited after deployment, so they are never shared
+        self.assertFalse(os.path.samefile(os.path.join(first, 'spacecraft_JUICE_arcs.json'), os.path.join(second, 'spacecraft_JUICE_arcs.json')))
+        self.assertEqual(os.stat(os.path.join(first, 'spacecraft_JUICE_arcs.json')).st_nlink, 1)
+
+    def test_symlink(self):
+        output_path = self._deploy('symlink', 'scenario')
+        link_path = os.path.join(output_path, 'juice.3ds')
+        self.assertTrue(os.path.islink(link_path))
+        self.assertTrue(os.readlink(link_path).startswith(self.store_path))
+        self.assertEqual(stat.S_IMODE(os.stat(link_path).st_mode), default_file_mode())
+
+    def test_copy(self):
+        output_path = self._deploy('copy', 'scenario')
+        self.assertEqual(os.stat(os.path.join(output_path, 'juice.3ds')).st_nlink, 1)
+        self.assertFalse(os.path.exists(self.store_path))
+
+    def test_auto(self):
+        self._deploy('auto', 'scenario')
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            AssetStore(self.store_path, 'move')
+
+
+def suite():
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(StaticConfigTests),
+                               loader.loadTestsFromTestCase(TempConfigTests),
+                               loader.loadTestsFromTestCase(AssetStoreTests)])
+
+
+def main():
+    unittest.TextTestRunner(verbosity=1).run(suite())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+""" Generates many Cosmographia scenarios from a manifest, in a pool of processes.
+
+Run from the folder of this script:
+
+    python generation_batch.py jobs.json --workers 4
+
+The manifest lists the jobs, each with the options of generation_pipeline.py, and defaults shared by all jobs.
+Relative paths are relative to the manifest file. YAML manifests (.yml, .yaml) require PyYAML.
+
+    {
+        "defaults": {"metakernel": "juice.tm", "attitude": "attitude.csv", "timeline": "timeline.asc",
+                     "lifetime_min": 10, "solar_panels": false},
+        "jobs": [
+            {"name": "ganymede_all", "output": "scenarios/ganymede_all", "target": "Ganymede"},
+            {"name": "ganymede_janus", "output": "scenarios/ganymede_janus", "target": "Ganymede",
+             "instruments": ["JANUS"]}
+        ]
+    }
+
+Every attitude file is converted into a CK kernel once, and every timeline file is parsed once. The jobs then
+get the kernel from a CK cache, and the parsed timeline from the batch.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import simplejson as json
+
+from attitude_converter import convert
+from attitude_converter.ck_cache import CkCache
+from config import Config
+from generation_pipeline import ScenarioJob, create_ck_cache, parse_start_time, run_job, validate_job
+from timeline_processor.timeline_parser import ParsedTimeline, TimelineParser
+
+script_path = os.path.abspath(os.path.join(os.path.abspath(__file__), '..'))
+
+# Manifest keys of a job, and their defaults. None marks keys without a default.
+JOB_KEYS = OrderedDict([('attitude', None), ('timeline', ''), ('metakernel', None), ('output', None),
+                        ('target', None), ('instruments', None), ('lifetime_min', 10), ('solar_panels', False),
+                        ('start_time', None), ('update', False)])
+
+# Outcome of one job. scenario_file_path is None if the job failed, and error holds the traceback.
+JobResult = namedtuple('JobResult', ['name', 'scenario_file_path', 'error', 'wall_time_s'])
+
+
+class BatchReport:
+    """ Outcome of all jobs of a batch. """
+
+    def __init__(self, results: List[JobResult], wall_time_s: float):
+        self.results = results
+        self.wall_time_s = wall_time_s
+
+    @property
+    def failed(self) -> List[JobResult]:
+        return [result for result in self.results if result.error is not None]
+
+    def format(self) -> str:
+        width = max([len(result.name) for result in self.results] + [3])
+        lines = ["{:<{}}  {:<6} {:>9}  {}".format('Job', width, 'Result', 'Time [s]', 'Scenario / error')]
+        for result in self.results:
+            if result.error is None:
+                outcome, detail = 'OK', result.scenario_file_path
+            else:
+                outcome, detail = 'FAILED', result.error.strip().splitlines()[-1]
+            lines.append("{:<{}}  {:<6} {:>9.1f}  {}".format(result.name, width, outcome, result.wall_time_s,
+                                                             detail))
+        lines.append("{} of {} jobs succeeded in {:.1f} s.".format(len(self.results) - len(self.failed),
+                                                                   len(self.results), self.wall_time_s))
+        return "\n".join(lines)
+
+
+def load_manifest(juice_config: Config, manifest_path: str) -> 'OrderedDict[str, ScenarioJob]':
+    """ Reads the jobs of a JSON or YAML manifest.
+
+    :param juice_config: Config, for the default instruments.
+    :param manifest_path: Path to the manifest.
+    :return: Jobs by name, in the order of the manifest.
+    :raises ValueError: If the manifest is invalid.
+    """
+    with open(manifest_path) as f:
+        if manifest_path.lower().endswith(('.yml', '.yaml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("YAML manifests require PyYAML. Install it, or use a JSON manifest.")
+            manifest = yaml.safe_load(f)
+        else:
+            manifest = json.load(f)
+    base_path = os.path.dirname(os.path.abspath(manifest_path))
+    defaults = manifest.get('defaults', {})
+    jobs = OrderedDict()
+    for index, entry in enumerate(manifest.get('jobs', [])):
+        values = dict(defaults, **entry)
+        name = str(values.pop('name', 'job_{:03d}'.format(index)))
+        if name in jobs:
+            raise ValueError("Duplicate job name '{}' in manifest.".format(name))
+        jobs[name] = _job_from_values(juice_config, name, values, base_path)
+    if not jobs:
+        raise ValueError("Manifest '{}' contains no jobs.".format(manifest_path))
+    return jobs
+
+
+def _job_from_values(juice_config: Config, name: str, values: dict, base_path: str) -> ScenarioJob:
+    unknown = set(values) - set(JOB_KEYS)
+    if unknown:
+        raise ValueError("Unknown keys in job '{}': {}".format(name, ", ".join(sorted(unknown))))
+    values = dict(JOB_KEYS, **values)
+    missing = [key for key in ('attitude', 'metakernel', 'output', 'target') if values[key] is None]
+    if missing:
+        raise ValueError("Job '{}' is missing: {}".format(name, ", ".join(missing)))
+
+    def path(key):
+        return os.path.join(base_path, values[key]) if values[key] else values[key]
+
+    instruments = values['instruments'] if values['instruments'] is not None else juice_config.get_instruments()
+    start_time = parse_start_time(values['start_time']) if values['start_time'] else None
+    return ScenarioJob(path('attitude'), path('timeline'), path('metakernel'), path('output'), values['target'],
+                       tuple(instruments), int(values['lifetime_min']), bool(values['solar_panels']), start_time,
+                       bool(values['update']))
+
+
+def run_batch(juice_config: Config, jobs: 'OrderedDict[str, ScenarioJob]', max_workers: int = None) -> BatchReport:
+    """ Runs jobs in a pool of processes.
+
+    First, every distinct attitude file is converted into a CK kernel, and every distinct timeline file is
+    parsed, in parallel. The kernels go to the CK cache of the config, or to a cache of the batch if the CK
+    cache is disabled, so each job only links its kernel. Then the jobs run in parallel.
+
+    :param juice_config: Config of all jobs.
+    :param jobs: Jobs by name.
+    :param max_workers: (optional) Number of processes. Defaults to the number of CPU cores.
+    :return: Report of all jobs, in the order of jobs.
+    """
+    start_time = time.monotonic()
+    config_path = os.path.dirname(juice_config.static.file)
+    ck_cache = create_ck_cache(juice_config)
+    batch_cache_path = None
+    if ck_cache is None:
+        batch_cache_path = tempfile.mkdtemp(prefix='m2c_batch_ck_')
+        ck_cache = CkCache(batch_cache_path)
+
+    valid_jobs = OrderedDict()
+    results = {}
+    for name, job in jobs.items():
+        try:
+            validate_job(job)
+        except ValueError:
+            results[name] = JobResult(name, None, traceback.format_exc(), 0.0)
+        else:
+            valid_jobs[name] = job
+
+    # each timeline is parsed with the entries of all instruments of the jobs using it
+    timeline_instruments = OrderedDict()
+    for job in valid_jobs.values():
+        if job.timeline_file:
+            key = os.path.abspath(job.timeline_file)
+            timeline_instruments.setdefault(key, set()).update(job.instruments)
+    attitude_files = sorted(set(os.path.abspath(job.attitude_file) for job in valid_jobs.values()))
+
+    try:
+        with ProcessPoolExecutor(max_workers, initializer=_init_batch_worker, initargs=(config_path,)) as executor:
+            ck_futures = [executor.submit(_prepare_ck, attitude_file, ck_cache)
+                          for attitude_file in attitude_files]
+            timeline_futures = OrderedDict((timeline_file, executor.submit(_parse_timeline, timeline_file,
+                                                                           sorted(instruments)))
+                                           for timeline_file, instruments in timeline_instruments.items())
+            # a failed conversion or parse is reported by the jobs, which then try again
+            parsed_timelines = {}  # type: Dict[str, ParsedTimeline]
+            for timeline_file, future in timeline_futures.items():
+                if future.exception() is None:
+                    parsed_timelines[timeline_file] = future.result()
+            for future in ck_futures:
+                future.exception()
+
+            job_futures = OrderedDict(
+                (name, executor.submit(_run_job, name, job, ck_cache,
+                                       parsed_timelines.get(os.path.abspath(job.timeline_file))))
+                for name, job in valid_jobs.items())
+            for name, future in job_futures.items():
+                results[name] = future.result()
+    finally:
+        if batch_cache_path is not None:
+            shutil.rmtree(batch_cache_path, ignore_errors=True)
+    return BatchReport([results[name] for name in jobs], time.monotonic() - start_time)
+
+
+# Config of a worker process, see _init_batch_worker()
+_worker_config = None
+
+
+def _init_batch_worker(config_path: str) -> None:
+    global _worker_config
+    _worker_config = Config(config_path)
+
+
+def _prepare_ck(attitude_file: str, ck_cache: CkCache) -> None:
+    """ Converts an attitude file into the CK cache, unless it is cached already. """
+    work_path = tempfile.mkdtemp(prefix='m2c_batch_')
+    try:
+        convert(attitude_file, os.path.join(work_path, 'attitude.ck'), _worker_config.get_ck_backend(), ck_cache,
+                _worker_config.get_decimation_tolerance_deg())
+    finally:
+        shutil.rmtree(work_path, ignore_errors=True)
+
+
+def _parse_timeline(timeline_file: str, instruments: List[str]) -> ParsedTimeline:
+    return TimelineParser(instruments=instruments).parse(timeline_file)
+
+
+def _run_job(name: str, job: ScenarioJob, ck_cache: CkCache, parsed_timeline: ParsedTimeline) -> JobResult:
+    start_time = time.monotonic()
+
+    def display_status(message):
+        print("[{}] {}".format(name, message))
+
+    try:
+        scenario_file_path = run_job(_worker_config, job, display_status, ck_cache, parsed_timeline)
+    except Exception:
+        traceback.print_exc()
+        return JobResult(name, None, traceback.format_exc(), time.monotonic() - start_time)
+    return JobResult(name, scenario_file_path, None, time.monotonic() - start_time)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifest', help='JSON or YAML manifest of the jobs.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of processes. Default is the number of CPU cores.')
+    args = parser.parse_args(argv)
+
+    juice_config = Config(script_path)
+    report = run_batch(juice_config, load_manifest(juice_config, args.manifest), args.workers)
+    print(report.format())
+    return 1 if report.failed else 0
+
+
+# the guard keeps worker processes from running the batch again
+if __name__ == '__main__':
+    sys.exit(main())
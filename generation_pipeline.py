@@ -0,0 +1,239 @@
+""" Generates a Cosmographia scenario from MAPPS files without the GUI.
+
+Example, from the folder of this script:
+
+    python generation_pipeline.py --attitude attitude.csv --timeline timeline.asc --metakernel juice.tm
+        --output scenarios/ganymede_flyby --target Ganymede --instruments JANUS MAJIS --solar-panels
+
+This module imports no PyQt5, so it also runs on machines without a display.
+"""
+import argparse
+import os
+import shutil
+import signal
+import sys
+import traceback
+from collections import namedtuple
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from attitude_converter.ck_cache import CkCache
+from config import Config
+from instrumentation import RunRecorder
+from instrumentation.cancellation import CancellationToken, GenerationCancelled, activate
+from instrumentation.progress import ProgressEvent, format_event, listen
+from scenario_processor import ScenarioProcessor
+from scenario_processor.scenario_build import build_scenario
+from timeline_processor import TimelineProcessor
+from timeline_processor.timeline_parser import ParsedTimeline
+
+script_path = os.path.abspath(os.path.join(os.path.abspath(__file__), '..'))
+
+START_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+RUN_REPORT_FILE_NAME = 'run_report.json'
+PROFILE_FOLDER_NAME = 'profiles'
+PROGRESS_INTERVAL_S = 1.0
+# exit code of the command line when the generation was cancelled, as for processes ended by SIGINT
+CANCELLED_EXIT_CODE = 130
+
+ScenarioJob = namedtuple('ScenarioJob', ['attitude_file', 'timeline_file', 'metakernel_file', 'output_folder_path',
+                                         'target_name', 'instruments', 'observation_lifetime_min',
+                                         'apply_solar_panels', 'custom_start_time', 'update_existing'])
+ScenarioJob.__doc__ = """ Inputs and options of one scenario generation.
+
+:param attitude_file: Path to MAPPS attitude .csv file.
+:param timeline_file: Path to MAPPS Timeline Dump .asc file. Can be an empty string.
+:param metakernel_file: Path to SPICE metakernel.
+:param output_folder_path: Scenario folder. If it exists and update_existing is False, a new
+    folder with a '_NNN' suffix is created next to it.
+:param target_name: Name of target body (e.g. "Callisto")
+:param instruments: Tuple of instruments whose observations are shown, i.e. ("JANUS", "MAJIS")
+:param observation_lifetime_min: Time after observation end for which the ground track is still shown. [minutes]
+:param apply_solar_panels: Whether to generate the solar panel rotation kernel.
+:param custom_start_time: (optional) Custom start time of scenario, as datetime.
+:param update_existing: Whether to update the scenario in output_folder_path in place, rebuilding only
+    the files whose inputs changed.
+"""
+ScenarioJob.__new__.__defaults__ = (10, False, None, False)
+
+
+def parse_start_time(start_time_string: str) -> datetime:
+    """
+    :param start_time_string: Time in format 'yyyy-mm-ddTHH:MM:SS'
+    :raises ValueError: If the time is not in this format.
+    """
+    try:
+        return datetime.strptime(start_time_string, START_TIME_FORMAT)
+    except ValueError:
+        raise ValueError("Error while parsing custom start time. "
+                         "Entry should have format '%YYYY-%MM-%DDT%hh:%mm:%ss'.")
+
+
+def validate_job(job: ScenarioJob) -> None:
+    """ Checks that the input files of a job exist.
+
+    :raises ValueError: If a file is missing, or the options are inconsistent.
+    """
+    for path in [job.attitude_file, job.metakernel_file]:
+        if not os.path.exists(path):
+            raise ValueError("File: '{}' not found!".format(path))
+    if not os.path.exists(job.timeline_file) and len(job.timeline_file) > 0:
+        raise ValueError("MAPPS Timeline Dump must point to a valid file or be empty.")
+    if len(job.timeline_file) == 0 and job.apply_solar_panels and job.custom_start_time is None:
+        raise ValueError("Start time override is mandatory when MAPPS Timeline Dump is missing "
+                         "and solar panels are computed.")
+    parent_folder_path = os.path.dirname(os.path.abspath(job.output_folder_path))
+    if not os.path.isdir(parent_folder_path):
+        raise ValueError("Output folder path '{}' must point to a folder".format(parent_folder_path))
+    if job.observation_lifetime_min < 0:
+        raise ValueError("Observation decay time can't be negative.")
+
+
+def run_job(juice_config: Config, job: ScenarioJob, display_status: Callable[[str], None] = print,
+            ck_cache: CkCache = None, parsed_timeline: ParsedTimeline = None, profile: bool = None,
+            progress_function: Callable[[ProgressEvent], None] = None,
+            cancel_token: CancellationToken = None) -> str:
+    """ Generates the scenario of a job.
+    First, the MAPPS attitude is converted into a CK kernel. Then a scenario is generated using
+    the MAPPS timeline, and all necessary include files are put into the folder.
+
+    The duration, CPU time, memory and item counts of each stage are printed at the end, and written
+    to run_report.json in the scenario folder, also when the generation fails.
+
+    :param juice_config: Config, for the converter, observation and solar panel settings.
+    :param job: Inputs and options of the scenario.
+    :param display_status: (optional) Function that displays status messages.
+    :param ck_cache: (optional) Cache of CK kernels. Defaults to the cache of the config, if it is enabled.
+    :param parsed_timeline: (optional) The timeline file of the job, already parsed.
+    :param profile: (optional) Whether to write a cProfile profile of each stage into the profiles folder
+        of the scenario. Defaults to the profile setting of the config.
+    :param progress_function: (optional) Function that receives the progress events of long stages,
+        at most every PROGRESS_INTERVAL_S per stage.
+    :param cancel_token: (optional) Token to cancel the generation from another thread. A cancelled new
+        scenario folder is removed, while an updated folder keeps its finished artifacts, and the cancelled
+        one is rebuilt by the next update.
+    :return: Path to the scenario JSON file.
+    :raises GenerationCancelled: If the generation was cancelled.
+    """
+    validate_job(job)
+    timeline_processor = TimelineProcessor(juice_config, list(job.instruments), 60 * job.observation_lifetime_min)
+    if job.update_existing:
+        # only the artifacts whose inputs changed since the last generation are rebuilt
+        real_folder_path = job.output_folder_path
+        print("Updating scenario directory: {}".format(real_folder_path))
+    else:
+        real_folder_path = create_output_folder(job.output_folder_path)
+        print("Created scenario directory: {}".format(real_folder_path))
+
+    if ck_cache is None:
+        ck_cache = create_ck_cache(juice_config)
+    if profile is None:
+        profile = juice_config.get_is_stage_profiling_enabled()
+    recorder = RunRecorder(juice_config.get_is_memory_tracing_enabled(),
+                           os.path.join(real_folder_path, PROFILE_FOLDER_NAME) if profile else None)
+    try:
+        with recorder.activate(), listen(progress_function, PROGRESS_INTERVAL_S), activate(cancel_token):
+            return build_scenario(juice_config, ScenarioProcessor(juice_config), timeline_processor,
+                                  real_folder_path, job.attitude_file, job.metakernel_file, job.timeline_file,
+                                  job.target_name, job.custom_start_time, job.apply_solar_panels, ck_cache,
+                                  display_status, parsed_timeline)
+    except GenerationCancelled:
+        if not job.update_existing:
+            shutil.rmtree(real_folder_path, ignore_errors=True)
+            print("Removed incomplete scenario directory: {}".format(real_folder_path))
+        raise
+    finally:
+        print(recorder.format_table())
+        if os.path.isdir(real_folder_path):
+            recorder.write_json(os.path.join(real_folder_path, RUN_REPORT_FILE_NAME))
+
+
+def create_ck_cache(juice_config: Config) -> CkCache:
+    """ :return: CK cache of the config, or None if it is disabled. """
+    if not juice_config.get_is_ck_cache_enabled():
+        return None
+    return CkCache(juice_config.get_ck_cache_path(), juice_config.get_ck_cache_max_size_mb() * 1024 ** 2)
+
+
+def create_output_folder(output_folder_path: str) -> str:
+    """ Creates the scenario folder, or the first free numbered folder next to it, e.g. "scenario_000".
+    Folders are claimed by creating them, so that concurrent jobs never get the same one.
+
+    :return: Path of the created folder.
+    """
+    for i in range(-1, 1000):
+        new_path = output_folder_path if i < 0 else os.path.join(
+            os.path.dirname(output_folder_path), os.path.basename(output_folder_path) + f"_{i:03d}")
+        try:
+            os.makedirs(new_path)
+        except FileExistsError:
+            continue
+        return new_path
+    raise RuntimeError(f"Could not create folder {output_folder_path}")
+
+
+def parse_arguments(juice_config: Config, argv: List[str] = None) -> Tuple[ScenarioJob, bool]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attitude', required=True, help='MAPPS attitude .csv file.')
+    parser.add_argument('--timeline', default='', help='MAPPS Timeline Dump .asc file.')
+    parser.add_argument('--metakernel', required=True, help='SPICE metakernel.')
+    parser.add_argument('--output', required=True, help='Scenario folder to create.')
+    parser.add_argument('--target', required=True, choices=juice_config.get_targets(),
+                        help='Body on which ground tracks are shown.')
+    parser.add_argument('--instruments', nargs='+', choices=juice_config.get_instruments(),
+                        default=juice_config.get_instruments(), help='Instruments to show. Default is all.')
+    parser.add_argument('--lifetime-min', type=int, default=10,
+                        help='Time after observation end for which the ground track is still shown.')
+    parser.add_argument('--solar-panels', action='store_true', help='Compute the solar panel rotation.')
+    parser.add_argument('--start-time', type=parse_start_time, help='Custom start time, yyyy-mm-ddTHH:MM:SS.')
+    parser.add_argument('--update', action='store_true',
+                        help='Update the scenario in the output folder instead of creating a new folder.')
+    parser.add_argument('--profile', action='store_true', default=None,
+                        help='Write a cProfile profile of each stage into the profiles folder of the scenario.')
+    args = parser.parse_args(argv)
+    return ScenarioJob(args.attitude, args.timeline, args.metakernel, args.output, args.target,
+                       tuple(args.instruments), args.lifetime_min, args.solar_panels, args.start_time,
+                       args.update), args.profile
+
+
+def print_progress(event: ProgressEvent) -> None:
+    print(" " + format_event(event), flush=True)
+
+
+def cancel_on_interrupt(cancel_token: CancellationToken) -> Callable:
+    """ Makes the first Ctrl+C cancel the token, so that the generation stops and cleans up. A second
+    Ctrl+C interrupts immediately.
+
+    :return: The previous SIGINT handler.
+    """
+    def handle_interrupt(signum, frame):
+        print("Cancelling generation, press Ctrl+C again to abort immediately.", flush=True)
+        cancel_token.cancel()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    return signal.signal(signal.SIGINT, handle_interrupt)
+
+
+def main(argv: List[str] = None) -> int:
+    juice_config = Config(script_path)
+    job, profile = parse_arguments(juice_config, argv)
+    cancel_token = CancellationToken()
+    previous_handler = cancel_on_interrupt(cancel_token)
+    try:
+        scenario_file_path = run_job(juice_config, job, profile=profile, progress_function=print_progress,
+                                     cancel_token=cancel_token)
+    except GenerationCancelled:
+        print("Generation cancelled.")
+        return CANCELLED_EXIT_CODE
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+    print("Scenario file generated at: {}".format(scenario_file_path))
+    return 0
+
+
+# the guard keeps worker processes (e.g. of the solar panel computation) from running the job again
+if __name__ == '__main__':
+    sys.exit(main())
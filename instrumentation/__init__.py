@@ -0,0 +1,180 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from typing import ContextManager, Iterator, List
+
+import simplejson as json
+
+if sys.platform != "win32":
+    import resource
+else:
+    resource = None
+
+# Measurements of one finished span. Memory values are None where they are not available.
+#  - depth: 0 for pipeline stages, 1 for spans within them, and so on.
+#  - peak_rss_mb: Peak resident memory of the process up to the end of the span.
+#  - peak_traced_mb: Peak memory allocated by Python during the span, only with trace_memory.
+#  - counts: Number of processed items, e.g. {"quaternions": 100000}.
+SpanRecord = namedtuple('SpanRecord', ['name', 'depth', 'wall_s', 'cpu_s', 'peak_rss_mb', 'peak_traced_mb', 'counts'])
+
+# recorder of the spans of each thread, see RunRecorder.activate()
+_local = threading.local()
+
+
+class RunRecorder:
+    """ Records named spans of a generation run, with wall time, CPU time, memory and item counts.
+
+    While the recorder is active in a thread, span() and add_count() of this module report to it,
+    so that the pipeline stages don't need a reference to the recorder. Without an active recorder
+    they do nothing.
+
+    CPU time includes the time of finished child processes, e.g. of the solar panel workers.
+    """
+
+    PROFILE_EXTENSION = '.prof'
+
+    def __init__(self, trace_memory: bool = False, profile_folder_path: str = None):
+        """
+        :param trace_memory: Whether to measure the peak Python memory of each span with tracemalloc,
+            which slows down allocation-heavy stages.
+        :param profile_folder_path: (optional) If set, each outermost span is run under cProfile, and its
+            profile is written to <profile_folder_path>/<span name>.prof.
+        """
+        self.trace_memory = trace_memory
+        self.profile_folder_path = profile_folder_path
+        self.records = []  # type: List[SpanRecord]
+        self._open_counts = []
+        self._started_tracing = False
+        self._start_wall = time.perf_counter()
+        self.wall_s = 0.0
+
+    @contextmanager
+    def activate(self) -> Iterator['RunRecorder']:
+        """ Makes this the recorder of span() and add_count() in the current thread. """
+        previous = getattr(_local, 'recorder', None)
+        _local.recorder = self
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        try:
+            yield self
+        finally:
+            _local.recorder = previous
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+            self.wall_s = time.perf_counter() - self._start_wall
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[dict]:
+        """ Measures the enclosed code.
+
+        :param name: Name of the stage, e.g. "attitude_ck".
+        :return: Dictionary of item counts, to which the stage can add.
+        """
+        depth = len(self._open_counts)
+        counts = OrderedDict()
+        self._open_counts.append(counts)
+        index = len(self.records)
+        # the record is reserved, so that spans are listed in the order they started
+        self.records.append(None)
+        profile = None
+        if self.profile_folder_path and depth == 0:
+            # only one profiler can be active, so nested spans are part of the profile of their stage
+            profile = cProfile.Profile()
+        if self.trace_memory and tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        start_wall, start_cpu = time.perf_counter(), _cpu_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield counts
+        finally:
+            if profile is not None:
+                profile.disable()
+            wall_s, cpu_s = time.perf_counter() - start_wall, _cpu_time() - start_cpu
+            self._open_counts.pop()
+            peak_traced_mb = None
+            if self.trace_memory and tracemalloc.is_tracing():
+                peak_traced_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            self.records[index] = SpanRecord(name, depth, wall_s, cpu_s, _peak_rss_mb(), peak_traced_mb,
+                                             dict(counts))
+            if profile is not None:
+                os.makedirs(self.profile_folder_path, exist_ok=True)
+                profile.dump_stats(os.path.join(self.profile_folder_path, name + RunRecorder.PROFILE_EXTENSION))
+
+    def add_count(self, name: str, count: int) -> None:
+        """ Adds to an item count of the innermost open span. """
+        if self._open_counts:
+            counts = self._open_counts[-1]
+            counts[name] = counts.get(name, 0) + count
+
+    def format_table(self) -> str:
+        """ :return: Table of all finished spans, nested spans indented below their stage. """
+        def memory(value):
+            return "{:.1f}".format(value) if value is not None else "-"
+
+        lines = ["{:<30} {:>9} {:>9} {:>12} {:>10}  {}".format('Stage', 'Wall [s]', 'CPU [s]', 'Peak RSS MB',
+                                                                 'Traced MB', 'Items')]
+        for record in self.records:
+            if record is None:
+                continue
+            lines.append("{:<30} {:>9.2f} {:>9.2f} {:>12} {:>10}  {}".format(
+                "  " * record.depth + record.name, record.wall_s, record.cpu_s, memory(record.peak_rss_mb),
+                memory(record.peak_traced_mb), ", ".join("{} {}".format(count, name)
+                                                         for name, count in record.counts.items())))
+        lines.append("{:<30} {:>9.2f}".format('Total', self.wall_s or time.perf_counter() - self._start_wall))
+        return "\n".join(lines)
+
+    def to_dict(self) -> OrderedDict:
+        return OrderedDict([
+            ('wall_s', self.wall_s),
+            ('spans', [OrderedDict(record._asdict()) for record in self.records if record is not None]),
+        ])
+
+    def write_json(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def current_recorder() -> RunRecorder:
+    """ :return: The active recorder of this thread, or None. """
+    return getattr(_local, 'recorder', None)
+
+
+def span(name: str) -> ContextManager[dict]:
+    """ Measures the enclosed code as a span of the active recorder, if there is one. See RunRecorder.span(). """
+    recorder = current_recorder()
+    if recorder is None:
+        return _null_span()
+    return recorder.span(name)
+
+
+def add_count(name: str, count: int) -> None:
+    """ Adds to an item count of the innermost span of the active recorder, if there is one. """
+    recorder = current_recorder()
+    if recorder is not None:
+        recorder.add_count(name, count)
+
+
+@contextmanager
+def _null_span() -> Iterator[dict]:
+    yield {}
+
+
+def _cpu_time() -> float:
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
@@ -0,0 +1,67 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class GenerationCancelled(Exception):
+    """ Raised by check_cancelled() in the stage that noticed the cancellation. """
+
+
+class CancellationToken:
+    """ Lets one thread ask a generation running in another thread to stop.
+
+    Long stages call check_cancelled() once per chunk of work, so that the generation stops
+    within a fraction of a second after cancel().
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout_s: float) -> bool:
+        """ Waits until the token is cancelled, or the timeout passes.
+
+        :return: True if the token is cancelled.
+        """
+        return self._event.wait(timeout_s)
+
+    def raise_if_cancelled(self) -> None:
+        """ :raises GenerationCancelled: If the token is cancelled. """
+        if self._event.is_set():
+            raise GenerationCancelled("Generation cancelled.")
+
+
+# token of the generation running in each thread, see activate()
+_local = threading.local()
+
+
+@contextmanager
+def activate(token: CancellationToken) -> Iterator[None]:
+    """ Makes token the one checked by check_cancelled() in the current thread.
+
+    :param token: Token of the generation, or None if it can't be cancelled.
+    """
+    previous = getattr(_local, 'token', None)
+    _local.token = token
+    try:
+        yield
+    finally:
+        _local.token = previous
+
+
+def current_token() -> CancellationToken:
+    """ :return: The active token of this thread, or None. """
+    return getattr(_local, 'token', None)
+
+
+def check_cancelled() -> None:
+    """ :raises GenerationCancelled: If the active token of this thread is cancelled. """
+    token = getattr(_local, 'token', None)
+    if token is not None and token.is_cancelled:
+        raise GenerationCancelled("Generation cancelled.")
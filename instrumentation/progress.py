@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+# State of a long-running stage.
+#  - done, total: Processed and expected number of units. total is 0 if unknown.
+#  - unit: What is counted, e.g. "bytes" or "observations".
+#  - rate_per_s: Units per second since the stage started.
+#  - eta_s: Estimated time until the stage is finished, None if unknown.
+ProgressEvent = namedtuple('ProgressEvent', ['stage', 'done', 'total', 'unit', 'rate_per_s', 'eta_s'])
+
+# listener of the progress events of each thread, see listen()
+_local = threading.local()
+
+
+class ProgressReporter:
+    """ Reports the progress of one stage to a listener, at most once per interval.
+
+    Loops call update() or advance(), ideally once per chunk of work. Calls between two events only
+    compare the time, so that reporting costs nothing measurable even in tight loops.
+    """
+
+    def __init__(self, listener: Callable[[ProgressEvent], None], stage: str, total: int, unit: str = 'items',
+                 interval_s: float = 0.5):
+        """
+        :param listener: Function that receives the events.
+        :param stage: Human readable name of the stage, e.g. "Reading attitude".
+        :param total: Expected number of units, 0 if unknown.
+        :param unit: What is counted.
+        :param interval_s: Minimum time between two events.
+        """
+        self.listener = listener
+        self.stage = stage
+        self.total = total
+        self.unit = unit
+        self.interval_s = interval_s
+        self.done = 0
+        self._start = time.monotonic()
+        # the first event is only sent after one interval, so that short stages send just the final one
+        self._next_event = self._start + interval_s
+
+    def __enter__(self) -> 'ProgressReporter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.finish()
+
+    def update(self, done: int) -> None:
+        """ :param done: Number of units processed so far. """
+        self.done = done
+        now = time.monotonic()
+        if now >= self._next_event:
+            self._next_event = now + self.interval_s
+            self.listener(self._event(now))
+
+    def advance(self, count: int = 1) -> None:
+        """ :param count: Number of units processed since the last call. """
+        self.update(self.done + count)
+
+    def finish(self) -> None:
+        """ Sends the final event, with all units done. """
+        self.done = max(self.done, self.total)
+        self.listener(self._event(time.monotonic()))
+
+    def _event(self, now: float) -> ProgressEvent:
+        elapsed_s = now - self._start
+        rate_per_s = self.done / elapsed_s if elapsed_s > 0 else 0.0
+        eta_s = None
+        if self.total and rate_per_s > 0:
+            eta_s = max(0.0, (self.total - self.done) / rate_per_s)
+        return ProgressEvent(self.stage, self.done, self.total, self.unit, rate_per_s, eta_s)
+
+
+class _NullReporter:
+    """ Reporter used without listener, which ignores all calls. """
+
+    done = 0
+
+    def __enter__(self) -> '_NullReporter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+    def update(self, done: int) -> None:
+        pass
+
+    def advance(self, count: int = 1) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+_NULL_REPORTER = _NullReporter()
+
+
+@contextmanager
+def listen(listener: Callable[[ProgressEvent], None], interval_s: float = 0.5) -> Iterator[None]:
+    """ Sends the progress events of all stages run in the current thread to listener.
+
+    :param listener: Function that receives the events, or None to ignore them.
+    :param interval_s: Minimum time between two events of a stage.
+    """
+    previous = getattr(_local, 'listener', None)
+    _local.listener = (listener, interval_s) if listener is not None else None
+    try:
+        yield
+    finally:
+        _local.listener = previous
+
+
+def progress(stage: str, total: int, unit: str = 'items') -> ProgressReporter:
+    """ Starts reporting the progress of a stage to the listener of the current thread, see listen().
+    Without listener, the returned reporter does nothing.
+
+    :param stage: Human readable name of the stage, e.g. "Reading attitude".
+    :param total: Expected number of units, 0 if unknown.
+    :param unit: What is counted.
+    """
+    listener = getattr(_local, 'listener', None)
+    if listener is None:
+        return _NULL_REPORTER
+    return ProgressReporter(listener[0], stage, total, unit, listener[1])
+
+
+def format_event(event: ProgressEvent) -> str:
+    """ :return: One line description, e.g. "Reading attitude: 45 % (120.0 of 266.7 MB), 52.3 MB/s, 0:03 left".
+        Bytes are shown in kB while the stage is below one megabyte.
+    """
+    unit = event.unit
+    scale = 1
+    if event.unit == 'bytes':
+        unit, scale = ('MB', 1024 ** 2) if max(event.total, event.done) >= 1024 ** 2 else ('kB', 1024)
+
+    def amount(value):
+        if event.unit == 'bytes':
+            return "{:.1f}".format(value / scale)
+        return "{:.0f}".format(value)
+
+    if event.total:
+        text = "{}: {:.0f} % ({} of {} {})".format(event.stage, 100.0 * min(event.done, event.total) / event.total,
+                                                  amount(event.done), amount(event.total), unit)
+    else:
+        text = "{}: {} {}".format(event.stage, amount(event.done), unit)
+    text += ", {} {}/s".format(amount(event.rate_per_s), unit)
+    if event.eta_s is not None and event.done < event.total:
+        minutes, seconds = divmod(int(round(event.eta_s)), 60)
+        text += ", {}:{:02d} left".format(minutes, seconds)
+    return text
@@ -0,0 +1,171 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from configparser import ConfigParser
+from datetime import datetime
+
+import numpy as np
+import spiceypy as spy
+
+from attitude_converter import convert_many
+from attitude_converter.attitude_provider import JuiceMex2Ker, MappsReader, Mex2Ker, QuaternionStore
+from attitude_converter.decimation import AttitudeDecimator
+from config import Config
+from generation_pipeline import ScenarioJob, run_job
+from instrumentation.cancellation import CancellationToken, GenerationCancelled, activate, check_cancelled
+from scenario_processor.scenario_build import CK_FILE_NAME
+from timeline_processor import TimelineProcessor
+
+REPO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+ATTITUDE_PATH = os.path.join(REPO_PATH, 'attitude_converter', 'test', 'data', 'europa_fb_attitude.csv')
+TIMELINE_PATH = os.path.join(REPO_PATH, 'timeline_processor', 'test', 'data', 'timeline.asc')
+CK_PATH = os.path.join(REPO_PATH, 'attitude_converter', 'test', 'data', 'test.ck')
+
+
+class SleepingMex2Ker(JuiceMex2Ker):
+    """ Runs sleep instead of Mex2Ker. """
+
+    @staticmethod
+    def executable_path() -> str:
+        return shutil.which('sleep')
+
+
+class CancellationTests(unittest.TestCase):
+
+    def setUp(self):
+        # Config saves the temporary config on creation, so it works on a copy
+        self.tmp_dir = tempfile.mkdtemp()
+        for file_name in ('config_static.ini', 'config_temp.ini'):
+            shutil.copy(os.path.join(REPO_PATH, file_name), self.tmp_dir)
+        # the CK cache and the asset store default to per-user folders, which tests must not touch
+        static = ConfigParser()
+        static.read(os.path.join(self.tmp_dir, 'config_static.ini'))
+        static.set('ck_cache', 'path', os.path.join(self.tmp_dir, 'ck_cache'))
+        static.set('assets', 'path', os.path.join(self.tmp_dir, 'assets'))
+        with open(os.path.join(self.tmp_dir, 'config_static.ini'), 'w') as f:
+            static.write(f)
+        self.config = Config(self.tmp_dir)
+        self.metakernel_path = os.path.join(self.tmp_dir, 'metakernel.tm')
+        with open(self.metakernel_path, 'w') as f:
+            f.write("KPL/MK\n")
+        self.output_path = os.path.join(self.tmp_dir, 'scenario')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_token(self):
+        # without active token, nothing is cancelled
+        check_cancelled()
+        token = CancellationToken()
+        with activate(token):
+            check_cancelled()
+            token.cancel()
+            self.assertTrue(token.is_cancelled)
+            self.assertTrue(token.wait(0))
+            with activate(None):
+                check_cancelled()
+            with self.assertRaises(GenerationCancelled):
+                check_cancelled()
+        check_cancelled()
+
+    def test_attitude_reading(self):
+        token = CancellationToken()
+        token.cancel()
+        reader = MappsReader()
+        with activate(token), self.assertRaises(GenerationCancelled):
+            reader.read(ATTITUDE_PATH)
+        self.assertEqual(len(reader.store), 0)
+
+    def test_decimation(self):
+        reader = MappsReader()
+        reader.read(ATTITUDE_PATH)
+        token = CancellationToken()
+        token.cancel()
+        with activate(token), self.assertRaises(GenerationCancelled):
+            AttitudeDecimator(0.01).decimate(reader.store)
+
+    def test_ck_writer(self):
+        # long enough to take several seconds without cancellation
+        count = 2000000
+        store = QuaternionStore(1.9e9 + np.arange(count, dtype=np.float64), np.tile([1.0, 0.0, 0.0, 0.0], (count, 1)))
+        ck_path = os.path.join(self.tmp_dir, 'attitude.ck')
+        token = CancellationToken()
+        threading.Timer(0.2, token.cancel).start()
+        start = time.monotonic()
+        with activate(token), self.assertRaises(GenerationCancelled):
+            JuiceMex2Ker(Mex2Ker.BACKEND_SPICE).convert(store, ck_path)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertFalse(os.path.exists(ck_path))
+
+    def test_concurrent_conversions(self):
+        token = CancellationToken()
+        token.cancel()
+        conversions = [(ATTITUDE_PATH, os.path.join(self.tmp_dir, '{}.ck'.format(i))) for i in range(2)]
+        with activate(token), self.assertRaises(GenerationCancelled):
+            convert_many(conversions, Mex2Ker.BACKEND_SPICE)
+        for _, ck_path in conversions:
+            self.assertFalse(os.path.exists(ck_path))
+
+    @unittest.skipIf(sys.platform == "win32" or not shutil.which('sleep'), "needs the sleep command")
+    def test_terminate_mex2ker(self):
+        token = CancellationToken()
+        threading.Timer(0.2, token.cancel).start()
+        start = time.monotonic()
+        with activate(token), self.assertRaises(GenerationCancelled):
+            SleepingMex2Ker()._run_mex2ker(['10'], self.tmp_dir)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_panel_kernels_unloaded(self):
+        loaded_kernels = spy.ktotal('ALL')
+        observations = OrderedDict([('JANUS', OrderedDict([('JUICE_JANUS', [(datetime(2031, 1, 1),
+                                                                             datetime(2031, 1, 2))])]))])
+        token = CancellationToken()
+        token.cancel()
+        # the metakernel lacks the kernels for the computation, which fails like a cancellation would
+        with activate(token), self.assertRaises(Exception):
+            TimelineProcessor(self.config).generate_solar_panel_kernel(observations, self.metakernel_path, CK_PATH,
+                                                                       self.tmp_dir)
+        self.assertEqual(spy.ktotal('ALL'), loaded_kernels)
+
+    def test_run_job(self):
+        job = ScenarioJob(ATTITUDE_PATH, TIMELINE_PATH, self.metakernel_path, self.output_path, 'Ganymede',
+                          ('JANUS', 'MAJIS', 'UVS'))
+        token = CancellationToken()
+
+        def cancel_after_attitude(message):
+            if message == "Generating scenario file.":
+                token.cancel()
+
+        # the new folder of a cancelled generation is removed
+        with self.assertRaises(GenerationCancelled):
+            run_job(self.config, job, cancel_after_attitude, cancel_token=token)
+        self.assertFalse(os.path.exists(self.output_path))
+
+        # an updated folder keeps the finished artifacts, and the next update builds the rest
+        token = CancellationToken()
+        os.makedirs(self.output_path)
+        job = job._replace(update_existing=True)
+        with self.assertRaises(GenerationCancelled):
+            run_job(self.config, job, cancel_after_attitude, cancel_token=token)
+        self.assertTrue(os.path.exists(os.path.join(self.output_path, CK_FILE_NAME)))
+        self.assertFalse(os.path.exists(os.path.join(self.output_path, 'observations')))
+        run_job(self.config, job, lambda _: None)
+        self.assertTrue(os.path.exists(os.path.join(self.output_path, 'observations')))
+
+
+def suite():
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(CancellationTests)])
+
+
+def main():
+    unittest.TextTestRunner(verbosity=1).run(suite())
+
+
+if __name__ == '__main__':
+    main()
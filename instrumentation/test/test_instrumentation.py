@@ -0,0 +1,81 @@
+import unittest
+import os
+import shutil
+import tempfile
+import pstats
+
+from instrumentation import RunRecorder, add_count, current_recorder, span
+
+
+class RunRecorderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_spans(self):
+        # without an active recorder, spans and counts are ignored
+        with span('ignored') as counts:
+            counts['items'] = 1
+            add_count('items', 1)
+        self.assertIsNone(current_recorder())
+
+        recorder = RunRecorder(trace_memory=True)
+        with recorder.activate():
+            with span('stage'):
+                with span('parse') as counts:
+                    counts['entries'] = 10
+                    data = [str(i) for i in range(100000)]
+                add_count('files', 2)
+                add_count('files', 3)
+            with span('other'):
+                pass
+        self.assertIsNone(current_recorder())
+        del data
+
+        self.assertEqual([(r.name, r.depth, r.counts) for r in recorder.records],
+                         [('stage', 0, {'files': 5}), ('parse', 1, {'entries': 10}), ('other', 0, {})])
+        stage, parse, _ = recorder.records
+        self.assertGreaterEqual(stage.wall_s, parse.wall_s)
+        self.assertGreater(parse.peak_traced_mb, 1.0)
+        self.assertGreaterEqual(recorder.wall_s, stage.wall_s)
+        table = recorder.format_table()
+        self.assertIn("  parse", table)
+        self.assertIn("5 files", table)
+
+        report_path = os.path.join(self.tmp_dir, 'run_report.json')
+        recorder.write_json(report_path)
+        self.assertTrue(os.path.exists(report_path))
+
+    def test_failed_span(self):
+        recorder = RunRecorder()
+        with self.assertRaises(ValueError):
+            with recorder.activate(), span('failing'):
+                raise ValueError()
+        self.assertEqual([r.name for r in recorder.records], ['failing'])
+
+    def test_profile(self):
+        profile_path = os.path.join(self.tmp_dir, 'profiles')
+        recorder = RunRecorder(profile_folder_path=profile_path)
+        with recorder.activate():
+            with span('stage'):
+                with span('nested'):
+                    sorted(range(1000), key=lambda i: -i)
+        # nested spans are part of the profile of their stage
+        self.assertEqual(os.listdir(profile_path), ['stage.prof'])
+        self.assertGreater(pstats.Stats(os.path.join(profile_path, 'stage.prof')).total_calls, 1000)
+
+
+def suite():
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(RunRecorderTests)])
+
+
+def main():
+    unittest.TextTestRunner(verbosity=1).run(suite())
+
+
+if __name__ == '__main__':
+    main()
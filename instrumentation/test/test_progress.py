@@ -0,0 +1,96 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+
+from attitude_converter.attitude_provider import MappsReader
+from instrumentation.progress import ProgressEvent, ProgressReporter, format_event, listen, progress
+
+REPO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+ATTITUDE_PATH = os.path.join(REPO_PATH, 'attitude_converter', 'test', 'data', 'europa_fb_attitude.csv')
+
+
+class ProgressTests(unittest.TestCase):
+
+    def test_throttling(self):
+        events = []
+        reporter = ProgressReporter(events.append, "Stage", 100, interval_s=3600)
+        for _ in range(100):
+            reporter.advance()
+        self.assertEqual(events, [])
+        reporter.finish()
+        self.assertEqual([(e.done, e.total, e.eta_s) for e in events], [(100, 100, 0.0)])
+
+        events = []
+        with ProgressReporter(events.append, "Stage", 10, interval_s=0) as reporter:
+            for done in range(1, 6):
+                reporter.update(done)
+        self.assertEqual([e.done for e in events], [1, 2, 3, 4, 5, 10])
+        self.assertGreater(events[0].rate_per_s, 0)
+        self.assertGreater(events[0].eta_s, 0)
+
+    def test_listen(self):
+        # without listener, reporters do nothing
+        with progress("Stage", 10) as reporter:
+            reporter.advance(5)
+
+        events = []
+        with listen(events.append, interval_s=3600):
+            with listen(None):
+                progress("Ignored", 10).finish()
+            with progress("Stage", 10, 'files') as reporter:
+                reporter.advance(5)
+        progress("Ignored", 10).finish()
+        self.assertEqual([(e.stage, e.done, e.unit) for e in events], [("Stage", 10, 'files')])
+
+    def test_attitude_reading(self):
+        events = []
+        with listen(events.append):
+            MappsReader().read(ATTITUDE_PATH)
+        self.assertEqual([(e.stage, e.done, e.total, e.unit) for e in events],
+                         [("Reading attitude", os.path.getsize(ATTITUDE_PATH), os.path.getsize(ATTITUDE_PATH), 'bytes')])
+
+    @unittest.skipUnless(hasattr(os, 'mkfifo'), "needs named pipes")
+    def test_attitude_reading_from_pipe(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            pipe_path = os.path.join(tmp_dir, 'attitude.csv')
+            os.mkfifo(pipe_path)
+
+            def write_pipe():
+                with open(ATTITUDE_PATH, 'rb') as source, open(pipe_path, 'wb') as pipe:
+                    shutil.copyfileobj(source, pipe)
+            writer = threading.Thread(target=write_pipe)
+            writer.start()
+            events = []
+            reader = MappsReader()
+            with listen(events.append, interval_s=0):
+                reader.read(pipe_path)
+            writer.join()
+            # the size of a pipe is unknown, so no byte counts are reported
+            self.assertEqual(events, [])
+            self.assertGreater(len(reader.store), 0)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_format(self):
+        self.assertEqual(format_event(ProgressEvent("Writing", 450, 1000, 'files', 90.0, 6.1)),
+                         "Writing: 45 % (450 of 1000 files), 90 files/s, 0:06 left")
+        self.assertEqual(format_event(ProgressEvent("Reading", 3 * 1024 ** 2, 0, 'bytes', 1024 ** 2, None)),
+                         "Reading: 3.0 MB, 1.0 MB/s")
+        self.assertEqual(format_event(ProgressEvent("Reading", 5120, 10240, 'bytes', 1024, 5.0)),
+                         "Reading: 50 % (5.0 of 10.0 kB), 1.0 kB/s, 0:05 left")
+
+
+def suite():
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(ProgressTests)])
+
+
+def main():
+    unittest.TextTestRunner(verbosity=1).run(suite())
+
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,17 @@ class ScenarioProcessor:
         :param ck_file_name: Name of generated CK file.
         :return: Path to generated scenario JSON path.
         """
+        self.create_spacecraft_folder(output_folder_path, apply_solar_panels)
+        return self.write_scenario_files(metakernel_file_path, output_folder_path, ck_file_name)
+
+    def write_scenario_files(self, metakernel_file_path: str, output_folder_path: str, ck_file_name: str) -> str:
+        """ Writes the kernel JSON file and the scenario JSON file, which requires the kernels and the spacecraft.
+
+        :param metakernel_file_path: Path to SPICE metakernel.
+        :param output_folder_path: Path to created output folder of this script.
+        :param ck_file_name: Name of generated CK file.
+        :return: Path to generated scenario JSON path.
+        """
         KERNEL_JSON_NAME = "spice_kernels.json"
 
         kernel_json = OrderedDict()
@@ -38,12 +49,6 @@ class ScenarioProcessor:
         scenario_json["require"] = [KERNEL_JSON_NAME,
                                     "spacecraft/load_spacecraft.json"]
 
-        if apply_solar_panels:
-            self._apply_spacecraft_with_solar_panels(output_folder_path)
-        else:
-            self._apply_spacecraft_only(output_folder_path)
-
-
         new_scenario_name = "LOAD_SCENARIO.json"
 
         new_scenario_file_path = os.path.abspath(os.path.join(output_folder_path, new_scenario_name))
@@ -52,6 +57,17 @@ class ScenarioProcessor:
             json.dump(scenario_json, outfile, indent=2)
         return new_scenario_file_path
 
+    def create_spacecraft_folder(self, output_folder_path: str, apply_solar_panels: bool) -> None:
+        """ Copies the spacecraft models into the output folder.
+
+        :param output_folder_path: Path to created output folder of this script.
+        :param apply_solar_panels: Whether to use the spacecraft with rotating solar panels.
+        """
+        if apply_solar_panels:
+            self._apply_spacecraft_with_solar_panels(output_folder_path)
+        else:
+            self._apply_spacecraft_only(output_folder_path)
+
     def _apply_spacecraft_only(self, output_folder_path):
         self.juice_config.create_spacecraft_folder_only(output_folder_path)
 
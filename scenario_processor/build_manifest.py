@@ -0,0 +1,101 @@
+import os
+import shutil
+from typing import List
+
+import simplejson as json
+
+from attitude_converter.ck_cache import CkCache
+
+
+class BuildManifest:
+    """ Records which inputs each generated artifact of a scenario folder was built from.
+
+    An artifact is a group of output files (e.g. the attitude CK, or all observation files) that
+    are generated together. Its inputs are a JSON-serializable dictionary of file digests and
+    settings. When a scenario folder is regenerated, only artifacts whose inputs changed, or
+    whose outputs are missing, need to be rebuilt.
+    """
+
+    FILE_NAME = "build_manifest.json"
+    VERSION = 1
+
+    def __init__(self, folder_path: str):
+        """ Loads the manifest of a scenario folder. A missing or outdated manifest is treated as empty.
+
+        :param folder_path: Scenario folder.
+        """
+        self.folder_path = os.path.abspath(folder_path)
+        self.path = os.path.join(self.folder_path, BuildManifest.FILE_NAME)
+        self._artifacts = {}
+        # digests of input files, reused while their size and modification time are unchanged
+        self._files = {}
+        try:
+            with open(self.path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        if manifest.get("version") == BuildManifest.VERSION:
+            self._artifacts = manifest["artifacts"]
+            self._files = manifest["files"]
+
+    def file_digest(self, file_path: str) -> str:
+        """
+        :param file_path: Path to an input file, or an empty string.
+        :return: SHA-256 hex digest of the file contents, or None for an empty path.
+        """
+        if not file_path:
+            return None
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        known = self._files.get(file_path)
+        if known is not None and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+        digest = CkCache.file_hash(file_path)
+        self._files[file_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def is_current(self, artifact: str, inputs: dict) -> bool:
+        """
+        :param artifact: Name of the artifact.
+        :param inputs: Inputs the artifact would be built from now.
+        :return: True if the artifact was built from the same inputs, and all its outputs still exist.
+        """
+        record = self._artifacts.get(artifact)
+        if record is None or record["inputs"] != self._normalize(inputs):
+            return False
+        return all(os.path.exists(os.path.join(self.folder_path, output)) for output in record["outputs"])
+
+    def invalidate(self, artifact: str) -> None:
+        """ Forgets an artifact, e.g. before it is rebuilt or when something it depends on was rebuilt. """
+        self._artifacts.pop(artifact, None)
+
+    def remove_outputs(self, outputs: List[str]) -> None:
+        """ Deletes output files and folders, relative to the scenario folder, that exist. """
+        for output in outputs:
+            path = os.path.join(self.folder_path, output)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+
+    def record(self, artifact: str, inputs: dict, outputs: List[str]) -> None:
+        """ Records that an artifact was built.
+
+        :param artifact: Name of the artifact.
+        :param inputs: Inputs the artifact was built from.
+        :param outputs: Files and folders of the artifact, relative to the scenario folder.
+        """
+        self._artifacts[artifact] = {"inputs": self._normalize(inputs), "outputs": list(outputs)}
+
+    def save(self) -> None:
+        """ Writes the manifest. The file is replaced atomically, so it is never left half-written. """
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({"version": BuildManifest.VERSION, "artifacts": self._artifacts, "files": self._files},
+                      f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _normalize(inputs: dict) -> dict:
+        # compare inputs the way they are stored, i.e. with tuples turned into lists
+        return json.loads(json.dumps(inputs, sort_keys=True))
@@ -0,0 +1,125 @@
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any
+
+import simplejson as json
+
+WriteStats = namedtuple('WriteStats', ['files', 'bytes'])
+
+
+class OutputWriter:
+    """ Writes the JSON files of a scenario concurrently.
+
+    Documents are serialized by the caller, and the resulting text is written by a bounded
+    thread pool, so that the open/close latency of many small files (e.g. on network drives)
+    overlaps. At most max_pending files wait to be written, further writes block until one of
+    them is done. Use as a context manager, which waits for all writes on exit.
+    """
+    DEFAULT_WORKERS = 8
+
+    def __init__(self, max_workers: int = None, max_pending: int = None):
+        """
+        :param max_workers: (optional) Number of writer threads. Default is DEFAULT_WORKERS.
+        :param max_pending: (optional) Maximum number of serialized files held in memory. Default is
+                            4 times the number of writer threads.
+        """
+        self.max_workers = max_workers if max_workers else OutputWriter.DEFAULT_WORKERS
+        self.max_pending = max_pending if max_pending else 4 * self.max_workers
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._errors = []
+        self._stats = OrderedDict()
+
+    def __enter__(self) -> 'OutputWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            # don't mask an exception raised while queueing the files
+            if exc_type is None:
+                self.wait()
+        finally:
+            self.close()
+
+    def write_json(self, path: str, document: Any, stage: str) -> None:
+        """ Serializes the document as indented JSON, and queues it for writing.
+
+        :param path: Path of the file to (over)write.
+        :param document: JSON-serializable document.
+        :param stage: Name of the generation stage the file belongs to, used in the statistics.
+        :raises RuntimeError: If an earlier write has already failed.
+        """
+        self.write_text(path, json.dumps(document, indent=2), stage)
+
+    def write_text(self, path: str, text: str, stage: str) -> None:
+        """ Queues text for writing. Blocks while max_pending files are waiting to be written.
+
+        :param path: Path of the file to (over)write.
+        :param text: File contents.
+        :param stage: Name of the generation stage the file belongs to, used in the statistics.
+        :raises RuntimeError: If an earlier write has already failed.
+        """
+        if self._errors:
+            self._raise_errors()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write, path, text, stage)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending.append(future)
+
+    def wait(self) -> None:
+        """ Waits until all queued files are written.
+
+        :raises RuntimeError: If any of the writes failed, chained to the first failure.
+        """
+        wait(self._pending)
+        self._pending = []
+        if self._errors:
+            self._raise_errors()
+
+    def close(self) -> None:
+        """ Stops the writer threads, after the queued files are written. """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @property
+    def stats(self) -> OrderedDict:
+        """ :return: OrderedDict[stage, WriteStats] of the files written so far, in order of the first file of each stage. """
+        with self._lock:
+            return OrderedDict((stage, WriteStats(*counts)) for stage, counts in self._stats.items())
+
+    def report(self) -> str:
+        """ :return: Human readable summary of the files written per stage. """
+        return "\n".join("Wrote {} {} files ({:.1f} kB).".format(stats.files, stage, stats.bytes / 1024)
+                         for stage, stats in self.stats.items())
+
+    def _write(self, path: str, text: str, stage: str) -> None:
+        try:
+            data = text.encode()
+            with open(path, 'wb') as f:
+                f.write(data)
+        except Exception as e:
+            with self._lock:
+                self._errors.append((path, e))
+            return
+        with self._lock:
+            counts = self._stats.setdefault(stage, [0, 0])
+            counts[0] += 1
+            counts[1] += len(data)
+
+    def _raise_errors(self) -> None:
+        with self._lock:
+            errors = list(self._errors)
+        raise RuntimeError("Writing {} scenario files failed:\n{}".format(
+            len(errors), "\n".join("{}: {}".format(os.path.basename(path), error) for path, error in errors))) \
+            from errors[0][1]
@@ -0,0 +1,163 @@
+import os
+from datetime import datetime
+from typing import Callable
+
+from attitude_converter import convert
+from attitude_converter.attitude_provider import JuiceMex2Ker
+from attitude_converter.ck_cache import CkCache
+from attitude_converter.decimation import AttitudeDecimator
+from config import Config
+from instrumentation import span
+from instrumentation.cancellation import GenerationCancelled, check_cancelled
+from scenario_processor import ScenarioProcessor
+from scenario_processor.build_manifest import BuildManifest
+from timeline_processor import TimelineProcessor
+from timeline_processor.timeline_parser import ParsedTimeline
+
+CK_FILE_NAME = 'mapps_attitude_kernel.ck'
+
+# Artifacts of a scenario folder, and the files and folders each of them consists of
+ATTITUDE_CK = 'attitude_ck'
+SPACECRAFT = 'spacecraft'
+OBSERVATIONS = 'observations'
+SOLAR_PANELS = 'solar_panels'
+ARTIFACT_OUTPUTS = {
+    ATTITUDE_CK: [CK_FILE_NAME],
+    SPACECRAFT: ['spacecraft'],
+    OBSERVATIONS: ['spice_kernels.json', 'LOAD_SCENARIO.json', 'sensors', 'observations',
+                   'run_scenario.bat', 'run_scenario.sh'],
+    SOLAR_PANELS: [os.path.join('spacecraft', 'solar_panel_kernel.ck')],
+}
+
+
+def build_scenario(juice_config: Config, scenario_processor: ScenarioProcessor,
+                   timeline_processor: TimelineProcessor, output_folder_path: str,
+                   attitude_file: str, metakernel_file: str, timeline_file: str, target_name: str,
+                   custom_start_time: datetime = None, apply_solar_panels: bool = False,
+                   ck_cache: CkCache = None, display_status: Callable[[str], None] = print,
+                   parsed_timeline: ParsedTimeline = None) -> str:
+    """ Generates a scenario into a folder, or updates a scenario that was generated there before.
+
+    The inputs behind each artifact are recorded in the BuildManifest of the folder, and only
+    artifacts whose inputs changed are rebuilt. E.g. a new observation lifetime only rewrites
+    the sensor and observation files, while the attitude and solar panel CKs are kept.
+
+    :param juice_config: Config, for the converter, observation and solar panel settings.
+    :param scenario_processor: Processor of the scenario and spacecraft files.
+    :param timeline_processor: Processor of the timeline, with instruments and observation lifetime already set.
+    :param output_folder_path: Scenario folder. It is created if it does not exist.
+    :param attitude_file: Path to MAPPS attitude .csv file.
+    :param metakernel_file: Path to SPICE metakernel.
+    :param timeline_file: Path to MAPPS Timeline Dump .asc file. Can be an empty string
+    :param target_name: Name of target body (e.g. "Callisto")
+    :param custom_start_time: (optional) Custom start time of scenario.
+    :param apply_solar_panels: Whether to generate the solar panel rotation kernel.
+    :param ck_cache: (optional) Cache of previously generated CK kernels.
+    :param display_status: (optional) Function that displays status messages.
+    :param parsed_timeline: (optional) The timeline file, already parsed. See TimelineProcessor.load_observations().
+    :return: Path to the scenario JSON file.
+    """
+    output_folder_path = os.path.abspath(output_folder_path)
+    os.makedirs(output_folder_path, exist_ok=True)
+    manifest = BuildManifest(output_folder_path)
+    ck_file_path = os.path.join(output_folder_path, CK_FILE_NAME)
+    scenario_file_path = os.path.join(output_folder_path, 'LOAD_SCENARIO.json')
+    decimation_tolerance_deg = juice_config.get_decimation_tolerance_deg()
+    custom_start = custom_start_time.isoformat() if custom_start_time is not None else None
+
+    attitude_inputs = {
+        'attitude_file': manifest.file_digest(attitude_file),
+        'converter': JuiceMex2Ker(juice_config.get_ck_backend()).cache_settings(),
+        'decimation': AttitudeDecimator(decimation_tolerance_deg).settings() if decimation_tolerance_deg else None,
+    }
+    observation_inputs = {
+        'version': juice_config.get_version(),
+        'timeline_file': manifest.file_digest(timeline_file),
+        'metakernel_file': os.path.abspath(metakernel_file),
+        'target': target_name,
+        'instruments': timeline_processor.instruments,
+        'mode_sensors': juice_config.get_mode_sensors(),
+        'sensor_colors': dict(juice_config.get_sensor_colors()),
+        'observation_lifetime_s': timeline_processor.observation_lifetime_seconds,
+        'observation_layout': juice_config.get_observation_layout(),
+        'observation_bucket_hours': juice_config.get_observation_bucket_hours(),
+        'custom_start_time': custom_start,
+    }
+    panel_inputs = {
+        'attitude': attitude_inputs,
+        'metakernel_file': manifest.file_digest(metakernel_file),
+        'timeline_file': observation_inputs['timeline_file'],
+        'instruments': timeline_processor.instruments,
+        'mode_sensors': observation_inputs['mode_sensors'],
+        'custom_start_time': custom_start,
+        'ck_backend': juice_config.get_ck_backend(),
+        'sampling_seconds': juice_config.get_solar_panel_ck_sampling_seconds(),
+        'span_days': juice_config.get_solar_panel_ck_span_days(),
+        'tolerance_deg': juice_config.get_solar_panel_ck_tolerance_deg(),
+    }
+
+    # the timeline is parsed at most once, and only if an artifact that needs it is rebuilt
+    observations = []
+
+    def load_observations():
+        if not observations:
+            observations.append(timeline_processor.load_observations(timeline_file, custom_start_time,
+                                                                       parsed_timeline))
+        return observations[0]
+
+    def build_attitude_ck():
+        print("Generating CK kernel: {}".format(ck_file_path))
+        convert(attitude_file, ck_file_path, juice_config.get_ck_backend(), ck_cache, decimation_tolerance_deg)
+
+    def build_observations():
+        scenario_processor.write_scenario_files(metakernel_file, output_folder_path, CK_FILE_NAME)
+        print("Generating scenario file: {}".format(scenario_file_path))
+        timeline_processor.write_observation_files(load_observations(), target_name, scenario_file_path,
+                                                   custom_start_time)
+
+    def build_solar_panels():
+        timeline_processor.generate_solar_panel_kernel(load_observations(), metakernel_file, ck_file_path,
+                                                       output_folder_path)
+
+    display_status("Generating CK kernel.")
+    if _build_artifact(manifest, ATTITUDE_CK, attitude_inputs, build_attitude_ck, display_status):
+        manifest.invalidate(SOLAR_PANELS)
+    display_status("Generating scenario file.")
+    if _build_artifact(manifest, SPACECRAFT, {'solar_panels': apply_solar_panels},
+                       lambda: scenario_processor.create_spacecraft_folder(output_folder_path, apply_solar_panels),
+                       display_status):
+        # the panel kernel and its time span are stored in the spacecraft folder
+        manifest.invalidate(SOLAR_PANELS)
+    _build_artifact(manifest, OBSERVATIONS, observation_inputs, build_observations, display_status)
+    if apply_solar_panels:
+        display_status("Generating solar panel kernel.")
+        _build_artifact(manifest, SOLAR_PANELS, panel_inputs, build_solar_panels, display_status)
+    return scenario_file_path
+
+
+def _build_artifact(manifest: BuildManifest, artifact: str, inputs: dict, build: Callable[[], None],
+                    display_status: Callable[[str], None]) -> bool:
+    """ Rebuilds an artifact unless it is up to date.
+
+    :return: True if the artifact was rebuilt.
+    """
+    outputs = ARTIFACT_OUTPUTS[artifact]
+    if manifest.is_current(artifact, inputs):
+        display_status("Keeping unchanged {}.".format(artifact.replace('_', ' ')))
+        return False
+    check_cancelled()
+    # forget the artifact first, so that it is rebuilt next time if building it fails
+    manifest.invalidate(artifact)
+    manifest.save()
+    manifest.remove_outputs(outputs)
+    try:
+        with span(artifact):
+            build()
+    except GenerationCancelled:
+        # the manifest already lacks the artifact, its partial files are removed as well
+        manifest.remove_outputs(outputs)
+        raise
+    manifest.record(artifact, inputs, outputs)
+    manifest.save()
+    return True
+
@@ -0,0 +1,93 @@
+import unittest
+import os
+import shutil
+import tempfile
+from configparser import ConfigParser
+
+import simplejson as json
+
+from attitude_converter.ck_cache import CkCache
+from config import Config
+from generation_batch import load_manifest, run_batch
+
+REPO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+ATTITUDE_PATH = os.path.join(REPO_PATH, 'attitude_converter', 'test', 'data', 'europa_fb_attitude.csv')
+TIMELINE_PATH = os.path.join(REPO_PATH, 'timeline_processor', 'test', 'data', 'timeline.asc')
+
+
+class GenerationBatchTests(unittest.TestCase):
+
+    def setUp(self):
+        # Config saves the temporary config on creation, so it works on a copy
+        self.tmp_dir = tempfile.mkdtemp()
+        for file_name in ('config_static.ini', 'config_temp.ini'):
+            shutil.copy(os.path.join(REPO_PATH, file_name), self.tmp_dir)
+        self.cache_path = os.path.join(self.tmp_dir, 'ck_cache')
+        static = ConfigParser()
+        static.read(os.path.join(self.tmp_dir, 'config_static.ini'))
+        static.set('ck_cache', 'enabled', 'True')
+        static.set('ck_cache', 'path', self.cache_path)
+        # the asset store defaults to a per-user folder, which tests must not touch
+        static.set('assets', 'path', os.path.join(self.tmp_dir, 'assets'))
+        with open(os.path.join(self.tmp_dir, 'config_static.ini'), 'w') as f:
+            static.write(f)
+        self.config = Config(self.tmp_dir)
+        with open(os.path.join(self.tmp_dir, 'metakernel.tm'), 'w') as f:
+            f.write("KPL/MK\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write_manifest(self, jobs: list) -> str:
+        manifest_path = os.path.join(self.tmp_dir, 'jobs.json')
+        with open(manifest_path, 'w') as f:
+            json.dump({"defaults": {"attitude": ATTITUDE_PATH, "timeline": TIMELINE_PATH,
+                                    "metakernel": "metakernel.tm", "target": "Ganymede"},
+                       "jobs": jobs}, f)
+        return manifest_path
+
+    def test_manifest(self):
+        jobs = load_manifest(self.config, self._write_manifest([
+            {"name": "all", "output": "all"},
+            {"output": "janus", "instruments": ["JANUS"], "lifetime_min": 20, "start_time": "2030-10-03T00:00:00"}]))
+        self.assertEqual(list(jobs.keys()), ["all", "job_001"])
+        self.assertEqual(jobs["all"].instruments, tuple(self.config.get_instruments()))
+        self.assertEqual(jobs["all"].metakernel_file, os.path.join(self.tmp_dir, 'metakernel.tm'))
+        self.assertEqual(jobs["all"].attitude_file, ATTITUDE_PATH)
+        self.assertEqual(jobs["job_001"].output_folder_path, os.path.join(self.tmp_dir, 'janus'))
+        self.assertEqual((jobs["job_001"].instruments, jobs["job_001"].observation_lifetime_min), (("JANUS",), 20))
+
+        with self.assertRaises(ValueError):
+            load_manifest(self.config, self._write_manifest([{"output": "all", "colour": "red"}]))
+        with self.assertRaises(ValueError):
+            load_manifest(self.config, self._write_manifest([{"name": "a", "output": "a"},
+                                                             {"name": "a", "output": "b"}]))
+
+    def test_run_batch(self):
+        jobs = load_manifest(self.config, self._write_manifest([
+            {"name": "all", "output": "all"},
+            {"name": "uvs", "output": "uvs", "instruments": ["UVS"]},
+            {"name": "missing", "output": "missing", "attitude": "missing.csv"}]))
+        report = run_batch(self.config, jobs, max_workers=2)
+        self.assertEqual([result.name for result in report.results], ["all", "uvs", "missing"])
+        self.assertEqual([result.name for result in report.failed], ["missing"])
+        for name in ("all", "uvs"):
+            self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, name, 'mapps_attitude_kernel.ck')))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, 'uvs', 'observations',
+                                                    'JUICE_GEN_OBS_JUICE_UVS_AP_0.json')))
+        # both jobs got the kernel of the single conversion
+        self.assertEqual(len(CkCache(self.cache_path).entries()), 1)
+        self.assertIn("2 of 3 jobs succeeded", report.format())
+
+
+def suite():
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(GenerationBatchTests)])
+
+
+def main():
+    unittest.TextTestRunner(verbosity=1).run(suite())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import unittest
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+from configparser import ConfigParser
+from datetime import datetime
+
+import simplejson as json
+
+from config import Config
+from generation_pipeline import RUN_REPORT_FILE_NAME, ScenarioJob, create_output_folder, parse_arguments, run_job
+
+REPO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+ATTITUDE_PATH = os.path.join(REPO_PATH, 'attitude_converter', 'test', 'data', 'europa_fb_attitude.csv')
+TIMELINE_PATH = os.path.join(REPO_PATH, 'timeline_processor', 'test', 'data', 'timeline.asc')
+
+
+class GenerationPipelineTests(unittest.TestCase):
+
+    def setUp(self):
+        # Config saves the temporary config on creation, so it works on a copy
+        self.tmp_dir = tempfile.mkdtemp()
+        for file_name in ('config_static.ini', 'config_temp.ini'):
+            shutil.copy(os.path.join(REPO_PATH, file_name), self.tmp_dir)
+        # the CK cache and the asset store default to per-user folders, which tests must not touch
+        static = ConfigParser()
+        static.read(os.path.join(self.tmp_dir, 'config_static.ini'))
+        static.set('ck_cache', 'path', os.path.join(self.tmp_dir, 'ck_cache'))
+        static.set('assets', 'path', os.path.join(self.tmp_dir, 'assets'))
+        with open(os.path.join(self.tmp_dir, 'config_static.ini'), 'w') as f:
+            static.write(f)
+        self.config = Config(self.tmp_dir)
+        self.metakernel_path = os.path.join(self.tmp_dir, 'metakernel.tm')
+        with open(self.metakernel_path, 'w') as f:
+            f.write("KPL/MK\n")
+        self.output_path = os.path.join(self.tmp_dir, 'scenario')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_arguments(self):
+        job, profile = parse_arguments(self.config, ['--attitude', ATTITUDE_PATH, '--metakernel', self.metakernel_path,
+                                            '--output', self.output_path, '--target', 'Ganymede',
+                                            '--instruments', 'JANUS', 'MAJIS', '--start-time', '2030-10-03T00:00:00'])
+        self.assertEqual(job, ScenarioJob(ATTITUDE_PATH, '', self.metakernel_path, self.output_path, 'Ganymede',
+                                          ('JANUS', 'MAJIS'), 10, False, datetime(2030, 10, 3), False))
+        self.assertIsNone(profile)
+
+    def test_run_job(self):
+        job = ScenarioJob(ATTITUDE_PATH, TIMELINE_PATH, self.metakernel_path, self.output_path, 'Ganymede',
+                          ('JANUS', 'MAJIS', 'UVS'))
+        self.assertEqual(run_job(self.config, job, lambda _: None),
+                         os.path.join(self.output_path, 'LOAD_SCENARIO.json'))
+        self.assertTrue(os.path.exists(os.path.join(self.output_path, 'observations',
+                                                    'JUICE_GEN_OBS_JUICE_UVS_AP_0.json')))
+        with open(os.path.join(self.output_path, RUN_REPORT_FILE_NAME)) as f:
+            spans = {span["name"]: span for span in json.load(f)["spans"]}
+        self.assertEqual(spans["attitude_ck"]["depth"], 0)
+        # the CK cache of the test starts empty, so the attitude is read
+        self.assertEqual(spans["read_attitude"]["depth"], 1)
+        self.assertEqual(spans["parse_timeline"]["depth"], 1)
+        self.assertGreater(spans["write_observation_files"]["counts"]["files"], 0)
+        # the folder exists now, so the next scenario goes into a new one
+        self.assertEqual(run_job(self.config, job, lambda _: None),
+                         os.path.join(self.output_path + '_000', 'LOAD_SCENARIO.json'))
+
+        with self.assertRaises(ValueError):
+            run_job(self.config, job._replace(attitude_file=ATTITUDE_PATH + '.missing'))
+
+    def test_concurrent_output_folders(self):
+        makedirs = os.makedirs
+
+        def makedirs_after_other_job(path, *args, **kwargs):
+            # another job claims the first two folders right before this one
+            if path in (self.output_path, self.output_path + '_000'):
+                makedirs(path)
+            return makedirs(path, *args, **kwargs)
+
+        with mock.patch('os.makedirs', makedirs_after_other_job):
+            self.assertEqual(create_output_folder(self.output_path), self.output_path + '_001')
+
+    def test_no_gui_imports(self):
+        code = "import sys, generation_pipeline; sys.exit('PyQt5' in sys.modules)"
+        self.assertEqual(subprocess.call([sys.executable, '-c', code], cwd=REPO_PATH), 0)
+
+
+def suite():
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(GenerationPipelineTests)])
+
+
+def main():
+    unittest.TextTestRunner(verbosity=1).run(suite())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import unittest
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
+import simplejson as json
+
+from scenario_processor.output_writer import OutputWriter, WriteStats
+
+
+class OutputWriterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_concurrent_writes(self):
+        documents = [OrderedDict([("name", "obs_{}".format(i)), ("groups", [i] * i)]) for i in range(50)]
+        # a single pending slot forces every write to wait for the previous one
+        with OutputWriter(max_workers=4, max_pending=1) as writer:
+            for i, document in enumerate(documents):
+                writer.write_json(os.path.join(self.tmp_dir, "{}.json".format(i)), document, "observation")
+            writer.write_text(os.path.join(self.tmp_dir, "run.sh"), "#!/bin/bash\n", "script")
+
+        total_bytes = 0
+        for i, document in enumerate(documents):
+            with open(os.path.join(self.tmp_dir, "{}.json".format(i))) as f:
+                text = f.read()
+            self.assertEqual(text, json.dumps(document, indent=2))
+            total_bytes += len(text)
+        self.assertEqual(writer.stats, OrderedDict([("observation", WriteStats(50, total_bytes)),
+                                                    ("script", WriteStats(1, 12))]))
+        self.assertIn("Wrote 50 observation files", writer.report())
+
+    def test_write_error(self):
+        writer = OutputWriter(max_workers=2)
+        writer.write_json(os.path.join(self.tmp_dir, "ok.json"), {}, "sensor")
+        writer.write_json(os.path.join(self.tmp_dir, "missing", "fail.json"), {}, "sensor")
+        with self.assertRaises(RuntimeError) as context:
+            writer.wait()
+        self.assertIn("fail.json", str(context.exception))
+        self.assertIsInstance(context.exception.__cause__, OSError)
+        # later writes fail right away
+        with self.assertRaises(RuntimeError):
+            writer.write_json(os.path.join(self.tmp_dir, "late.json"), {}, "sensor")
+        writer.close()
+        self.assertEqual(writer.stats["sensor"].files, 1)
+
+        with self.assertRaises(RuntimeError):
+            with OutputWriter() as writer:
+                writer.write_json(os.path.join(self.tmp_dir, "missing", "fail.json"), {}, "sensor")
+
+
+def suite():
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(OutputWriterTests)])
+
+
+def main():
+    unittest.TextTestRunner(verbosity=1).run(suite())
+
+
+if __name__ == '__main__':
+    main()
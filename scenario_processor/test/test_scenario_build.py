@@ -0,0 +1,91 @@
+import unittest
+import os
+import shutil
+import tempfile
+from configparser import ConfigParser
+
+import simplejson as json
+
+from config import Config
+from scenario_processor import ScenarioProcessor
+from scenario_processor.build_manifest import BuildManifest
+from scenario_processor.scenario_build import build_scenario, CK_FILE_NAME
+from timeline_processor import TimelineProcessor
+
+REPO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+ATTITUDE_PATH = os.path.join(REPO_PATH, 'attitude_converter', 'test', 'data', 'europa_fb_attitude.csv')
+TIMELINE_PATH = os.path.join(REPO_PATH, 'timeline_processor', 'test', 'data', 'timeline.asc')
+
+
+class ScenarioBuildTests(unittest.TestCase):
+
+    def setUp(self):
+        # Config saves the temporary config on creation, so it works on a copy
+        self.tmp_dir = tempfile.mkdtemp()
+        for file_name in ('config_static.ini', 'config_temp.ini'):
+            shutil.copy(os.path.join(REPO_PATH, file_name), self.tmp_dir)
+        # the CK cache and the asset store default to per-user folders, which tests must not touch
+        static = ConfigParser()
+        static.read(os.path.join(self.tmp_dir, 'config_static.ini'))
+        static.set('ck_cache', 'path', os.path.join(self.tmp_dir, 'ck_cache'))
+        static.set('assets', 'path', os.path.join(self.tmp_dir, 'assets'))
+        with open(os.path.join(self.tmp_dir, 'config_static.ini'), 'w') as f:
+            static.write(f)
+        self.config = Config(self.tmp_dir)
+        # the metakernel is only referenced by the scenario, its contents are not used without solar panels
+        self.metakernel_path = os.path.join(self.tmp_dir, 'metakernel.tm')
+        with open(self.metakernel_path, 'w') as f:
+            f.write("KPL/MK\n")
+        self.output_path = os.path.join(self.tmp_dir, 'scenario')
+        self.timeline_processor = TimelineProcessor(self.config, ['JANUS', 'MAJIS', 'UVS'])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _build(self) -> list:
+        messages = []
+        build_scenario(self.config, ScenarioProcessor(self.config), self.timeline_processor, self.output_path,
+                       ATTITUDE_PATH, self.metakernel_path, TIMELINE_PATH, 'Ganymede',
+                       display_status=messages.append)
+        return [message for message in messages if message.startswith("Keeping")]
+
+    def _observation_end_time(self) -> str:
+        with open(os.path.join(self.output_path, 'observations', 'JUICE_GEN_OBS_JUICE_UVS_AP_0.json')) as f:
+            return json.load(f)["items"][0]["endTime"]
+
+    def test_incremental_update(self):
+        self.assertEqual(self._build(), [])
+        ck_path = os.path.join(self.output_path, CK_FILE_NAME)
+        ck_mtime = os.stat(ck_path).st_mtime_ns
+        self.assertTrue(os.path.exists(os.path.join(self.output_path, BuildManifest.FILE_NAME)))
+        self.assertEqual(self._observation_end_time(), "2030-10-03 01:40:00.000 UTC")
+
+        self.assertEqual(self._build(), ["Keeping unchanged attitude ck.", "Keeping unchanged spacecraft.",
+                                         "Keeping unchanged observations."])
+
+        # a new observation lifetime only rewrites the observations
+        self.timeline_processor.set_observation_lifetime_seconds(1200)
+        self.assertEqual(self._build(), ["Keeping unchanged attitude ck.", "Keeping unchanged spacecraft."])
+        self.assertEqual(self._observation_end_time(), "2030-10-03 01:50:00.000 UTC")
+        self.assertEqual(os.stat(ck_path).st_mtime_ns, ck_mtime)
+        with open(os.path.join(self.output_path, 'LOAD_SCENARIO.json')) as f:
+            required = json.load(f)["require"]
+        self.assertEqual(len(required), len(set(required)))
+
+        # missing outputs are rebuilt
+        os.remove(ck_path)
+        self.assertEqual(self._build(), ["Keeping unchanged spacecraft.", "Keeping unchanged observations."])
+        self.assertTrue(os.path.exists(ck_path))
+
+
+def suite():
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(ScenarioBuildTests)])
+
+
+def main():
+    unittest.TextTestRunner(verbosity=1).run(suite())
+
+
+if __name__ == '__main__':
+    main()
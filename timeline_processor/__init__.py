@@ -1,8 +1,8 @@
 import calendar
 import traceback
-from collections import namedtuple, OrderedDict
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import List, Tuple
+from typing import List, Union
 
 from attitude_converter.solar_panel_processor import SolarPanelProcessor
 import spiceypy as spy
@@ -10,17 +10,22 @@ import spiceypy as spy
 import sys
 
 from config import Config
+from instrumentation import span
+from instrumentation.cancellation import check_cancelled
+from instrumentation.progress import progress
+from scenario_processor.output_writer import OutputWriter
 import simplejson as json
 import os
 import jdcal
-import io
 
 from timeline_processor.sensor_generator import SensorGenerator
-
-Entry = namedtuple('Entry', ['utc_timestamp', 'instrument_name', 'mode'])
+from timeline_processor.observation_extractor import extract_observations
+from timeline_processor.timeline_parser import Entry, ParsedTimeline, TimelineEntries, TimelineParser
 
 
 class TimelineProcessor:
+    OBSERVATION_LAYOUTS = ("per_observation", "per_sensor")
+
     def __init__(self, juice_config: Config, instruments: list = None, observation_lifetime_s: int = 600):
         """
 
@@ -33,6 +38,8 @@ class TimelineProcessor:
         self.instruments = instruments if instruments else \
             self.juice_config.get_instruments()
         self.set_observation_lifetime_seconds(observation_lifetime_s)
+        self.observation_layout = self.juice_config.get_observation_layout()
+        self.observation_bucket_hours = self.juice_config.get_observation_bucket_hours()
         self.sensor_generator = SensorGenerator(juice_config)
         self.timeline_fallback_bounds = None
 
@@ -48,26 +55,64 @@ class TimelineProcessor:
         :param custom_start_time: (optional) Custom start time of scenario.
         """
         output_folder_path = os.path.abspath(os.path.dirname(new_require_json_path))
+        observations = self.load_observations(timeline_file_path, custom_start_time)
+        self.write_observation_files(observations, target_name, new_require_json_path, custom_start_time)
+        if generate_solar_panels:
+            if metakernel_file_path is None or ck_file_path is None:
+                raise ValueError("Specify both metakernel and ck file path!")
+            self.generate_solar_panel_kernel(observations, metakernel_file_path, ck_file_path,
+                                             output_folder_path)
+
+    def load_observations(self, timeline_file_path: str, custom_start_time: datetime = None,
+                          parsed_timeline: ParsedTimeline = None) -> OrderedDict:
+        """ Parses the MAPPS timeline .asc file into observations of the processed instruments.
+
+        :param timeline_file_path: Path to MAPPS Timeline Dump .asc file. Can be an empty string
+        :param custom_start_time: (optional) Custom start time of scenario, required without timeline file.
+        :param parsed_timeline: (optional) The timeline file, already parsed with entries of at least the
+            processed instruments, e.g. when several scenarios are generated from one timeline.
+        :return: OrderedDict[instrument_name, OrderedDict[sensor_name, list[(start_time, end_time)]]]
+        """
         if timeline_file_path:
-            with open(timeline_file_path) as f:
-                parsed_lines = self._parse_experiment_modes(f)
-            with open(timeline_file_path) as f:
-                self.timeline_fallback_bounds = self._parse_timeline_fallback_times(f)
+            if parsed_timeline is None:
+                with span('parse_timeline') as counts:
+                    # entries of instruments that are not processed are skipped while parsing
+                    parsed_timeline = TimelineParser(instruments=self.instruments).parse(timeline_file_path)
+                    counts['entries'] = len(parsed_timeline.entries)
+            self.parsed_timeline = parsed_timeline
+            parsed_lines = self.parsed_timeline.entries
+            self.timeline_fallback_bounds = self.parsed_timeline.bounds
         else:
             parsed_lines = []
             if custom_start_time is None:
                 raise ValueError("No observations found - custom start time required!")
             self.timeline_fallback_bounds = (custom_start_time, custom_start_time)
-        observations = self._process_parsed_lines_into_observations(parsed_lines)
-        self.sensor_generator.generate_sensors(observations, target_name, output_folder_path)
-        self._generate_observation_files(observations, target_name, new_require_json_path)
+        with span('extract_observations') as counts:
+            observations = self._process_parsed_lines_into_observations(parsed_lines)
+            counts['observations'] = sum(len(times) for sensors in observations.values()
+                                         for times in sensors.values())
+        return observations
+
+    def write_observation_files(self, observations: OrderedDict, target_name: str, new_require_json_path: str,
+                                custom_start_time: datetime = None) -> None:
+        """ Writes sensor and observation files, adds them to the scenario JSON file, and writes the
+        launch scripts.
+
+        :param observations: Observations returned by load_observations().
+        :param target_name: Name of target body (e.g. "Callisto")
+        :param new_require_json_path: Path to scenario JSON file in output folder.
+        :param custom_start_time: (optional) Custom start time of scenario.
+        """
+        output_folder_path = os.path.abspath(os.path.dirname(new_require_json_path))
+        with span('write_observation_files') as counts:
+            # sensor and observation files are written in the background while the next ones are generated
+            with OutputWriter(self.juice_config.get_output_writer_workers()) as writer:
+                self.sensor_generator.generate_sensors(observations, target_name, output_folder_path, writer)
+                self._generate_observation_files(observations, target_name, new_require_json_path, writer)
+            counts['files'] = sum(stats.files for stats in writer.stats.values())
+        print(writer.report())
         self._generate_bat_file(observations, new_require_json_path, target_name, custom_start_time)
         self._generate_bash_file(observations, new_require_json_path, target_name, custom_start_time)
-        if generate_solar_panels:
-            if metakernel_file_path is None or ck_file_path is None:
-                raise ValueError("Specify both metakernel and ck file path!")
-            self._generate_solar_panel_kernel(observations, metakernel_file_path, ck_file_path,
-                                              output_folder_path)
 
     def set_instruments(self, instrument_list: List[str]) -> None:
         """
@@ -84,114 +129,46 @@ class TimelineProcessor:
             raise ValueError("Negative observation lifetime.")
         self.observation_lifetime_seconds = lifetime
 
-    @staticmethod
-    def _parse_experiment_modes(f: io.TextIOBase):
-        """
-
-        :param f: File handle of MAPPS Timeline Dump .asc file
-        :return: List of parsed lines. Each entry is a namedtuple of format
-            (utc_timestamp, instrument_name, mode).
-        """
-        parsed_lines = []
-        # Find line that starts with "Experiment modes:", then skip 3 lines,
-        # while checking that the third line is filled with ------
-        for line in f:
-            if line.startswith("Experiment modes:"):
-                f.readline(), f.readline()
-                if not f.readline().startswith("-----"):
-                    raise ValueError("Error in parsing file. Could not find start of Experiment modes section.")
-                # We are at beginning of our section
-                for line in f:
-                    # break at line that only has newline character
-                    if len(line) < 3:
-                        break
-                    # parse the required entries on the line
-                    utc_timestamp = datetime.strptime(line[0:20], "%d-%b-%Y_%H:%M:%S")
-                    instrument_name = line[36:46].rstrip()
-                    mode = line[74:91].rstrip()
-                    parsed_lines.append(Entry(utc_timestamp, instrument_name, mode))
-        return parsed_lines
-
-    def _parse_timeline_fallback_times(self, f) -> Tuple[datetime, datetime]:
-        """
-
-        :param f: File handle of MAPPS Timeline Dump .asc file
-        :return: 2-tuple of start and end time of mapps timeline dump file.
-        """
-        start_time, end_time = None, None
-        for line in f:
-            if line.startswith("Start time (UTC):"):
-                time_string = line[18:38]
-                start_time = datetime.strptime(time_string, "%d-%b-%Y_%H:%M:%S")
-                break
-        for line in f:
-            if line.startswith("End time (UTC):"):
-                time_string = line[16:36]
-                end_time = datetime.strptime(time_string, "%d-%b-%Y_%H:%M:%S")
-                continue
-        if start_time is None or end_time is None:
-            raise ValueError("Error in parsing MAPPS Timeline Dump .asc file. Start and end of timeline could not be identified.")
-        return (start_time, end_time)
-
-    def _process_parsed_lines_into_observations(self, parsed_lines: List[Entry]) -> OrderedDict:
+    def _process_parsed_lines_into_observations(self, parsed_lines: Union[TimelineEntries, List[Entry]]) -> OrderedDict:
         """ Processes parsed lines into a nested dictionary, which for each instrument and
         each sensor contains a list of (start, end) times for individial observations.
 
-        :param parsed_lines:  List of parsed lines. Each entry is a namedtuple of format
+        :param parsed_lines: Parsed entries, either columnar or a list of namedtuples of format
             (utc_timestamp, instrument_name, mode).
         :return: OrderedDict[instrument_name, OrderedDict[sensor_name, list[(start_time, end_time)]]]
         """
-        mode_sensors = self.juice_config.get_mode_sensors()
-        observations = OrderedDict()
-        for instrument in self.instruments:
-            observations[instrument] = OrderedDict()
-            instrument_sensors = mode_sensors[instrument]
-            relevant_entries = [e for e in parsed_lines if e.instrument_name == instrument]
-            # Initially all sensors are assumed to be off
-            current_sensor = None
-            start_time = None
-            for e in relevant_entries:
-                if current_sensor is None:
-                    # If the mode is in config_file, we turn it on
-                    if e.mode in instrument_sensors:
-                        start_time = e.utc_timestamp
-                        current_sensor = instrument_sensors[e.mode]
-                    else:
-                        continue
-                else:
-                    # End current observation
-                    end_time = e.utc_timestamp
-                    # Check if current_sensor is already in dict, if not, create empty entry
-                    if current_sensor not in observations[instrument]:
-                        observations[instrument][current_sensor] = []
-                    # Append observation to list for this sensor
-                    observations[instrument][current_sensor].append((start_time, end_time))
-                    # If next mode is in config file, we immediately start new observation
-                    if e.mode in instrument_sensors:
-                        current_sensor = instrument_sensors[e.mode]
-                        start_time = e.utc_timestamp
-                    # Otherwise, turn sensor off
-                    else:
-                        current_sensor = None
-            # if no sensor got entered for an instrument, delete the entry
-            if not observations[instrument]:
-                del observations[instrument]
-        return observations
+        return extract_observations(parsed_lines, self.instruments, self.juice_config.get_mode_sensors())
 
     def _generate_observation_files(self, observations: OrderedDict, target_name: str,
-                                    require_json_path: str) -> None:
+                                    require_json_path: str, writer: OutputWriter = None) -> None:
         """ Generates and saves observation .json files from parsed observations.
 
+        With the "per_observation" layout every observation gets its own file. With the "per_sensor" layout
+        all observations of a sensor are groups of a single file, or of one file per time bucket if
+        observation_bucket_hours is set.
+
         :param observations: OrderedDict[instrument_name, OrderedDict[sensor_name, list[(start_time, end_time)]]]
         :param target_name: Name of target body (e.g. "Callisto")
         :param require_json_path: Path to scenario file in output folder
+        :param writer: (optional) Writer the files are queued to. By default they are written before returning.
         :return:
         """
+        if writer is None:
+            with OutputWriter() as writer:
+                return self._generate_observation_files(observations, target_name, require_json_path, writer)
+        if self.observation_layout not in TimelineProcessor.OBSERVATION_LAYOUTS:
+            raise ValueError("Unknown observation layout '{}', expected one of {}."
+                             .format(self.observation_layout, ", ".join(TimelineProcessor.OBSERVATION_LAYOUTS)))
         output_folder_path = os.path.abspath(os.path.dirname(require_json_path))
         with open(require_json_path) as json_file:
             require_json = json.load(json_file)
 
         os.makedirs(os.path.abspath(os.path.join(output_folder_path, 'observations')))
+        sensor_colors = self.juice_config.get_sensor_colors()
+        reporter = progress("Writing observation files", sum(len(observation_list) for sensor_dict in
+                                                             observations.values()
+                                                             for observation_list in sensor_dict.values()),
+                            'observations')
 
         # Iterate over each sensor
         for instrument_name, sensor_dict in observations.items():
@@ -200,53 +177,106 @@ class TimelineProcessor:
                 sensor_json_path = "sensors/sensor_{}_{}.json".format(sensor_name, target_name)
                 if sensor_json_path not in require_json["require"]:
                     require_json["require"].append(sensor_json_path)
-                # afterwards, we generate and add all individual observation .json files
-                for idx, times in enumerate(observation_list):
-                    file_name = "JUICE_GEN_OBS_{}_{}.json".format(sensor_name, idx)
-                    observation = self.juice_config.get_template_observation()
-                    edit_entry = observation["items"][0]
-                    edit_entry["name"] = file_name[:-5]
-                    edit_entry["startTime"] = self._ftime(times[0])
-                    edit_entry["endTime"] = self._ftime(self._delay_observation_end_time(times[1]))
-                    edit_entry["center"] = target_name
-                    edit_entry["trajectoryFrame"]["body"] = target_name
-                    edit_entry["bodyFrame"]["body"] = target_name
-                    d = OrderedDict()
-                    d["startTime"] = self._ftime(times[0])
-                    d["endTime"] = self._ftime(times[1])
-                    d["obsRate"] = 0
-                    edit_entry["geometry"]["groups"].append(d)
-                    edit_entry["geometry"]["footprintColor"] = self.juice_config.get_sensor_colors()[instrument_name]
-                    edit_entry["geometry"]["sensor"] = sensor_name
-                    with open(os.path.abspath(os.path.join(output_folder_path, 'observations',
-                                                           file_name)), 'w+') as outfile:
-                        json.dump(observation, outfile, indent=2)
+                # afterwards, we generate and add all observation .json files of the sensor
+                if self.observation_layout == "per_observation":
+                    file_groups = [("JUICE_GEN_OBS_{}_{}.json".format(sensor_name, idx), [times])
+                                   for idx, times in enumerate(observation_list)]
+                else:
+                    buckets = self._bucket_observations(observation_list)
+                    if len(buckets) == 1:
+                        file_groups = [("JUICE_GEN_OBS_{}.json".format(sensor_name), buckets[0])]
+                    else:
+                        file_groups = [("JUICE_GEN_OBS_{}_{}.json".format(sensor_name, idx), bucket)
+                                       for idx, bucket in enumerate(buckets)]
+                for file_name, observation_times in file_groups:
+                    check_cancelled()
+                    observation = self._create_observation_json(file_name[:-5], sensor_colors[instrument_name],
+                                                                sensor_name, target_name, observation_times)
+                    writer.write_json(os.path.abspath(os.path.join(output_folder_path, 'observations', file_name)),
+                                      observation, "observation")
                     # add corresponding entry to require_json
                     require_json["require"].append("observations/{}".format(file_name))
+                    reporter.advance(len(observation_times))
+        reporter.finish()
         # save updated require_json
-        with open(require_json_path, 'w') as json_file:
-            json.dump(require_json, json_file, indent=2)
+        writer.write_json(require_json_path, require_json, "scenario")
         return
 
-    def _generate_solar_panel_kernel(self, observations, metakernel_file_path, ck_file_path,
-                                     output_folder_path,
-                                     extra_time_hours: float = None, step_size_s: float = None):
+    def _create_observation_json(self, name: str, color: List[float], sensor_name: str, target_name: str,
+                                 observation_times: List[tuple]) -> OrderedDict:
+        """ Fills the observation template with one group per observation.
+
+        :param name: Name of the observation item.
+        :param color: RGB footprint color of the instrument.
+        :param sensor_name: Name of the sensor.
+        :param target_name: Name of target body (e.g. "Callisto")
+        :param observation_times: List of (start_time, end_time) of observations, sorted by start time.
+        :return: Observation JSON.
+        """
+        observation = self.juice_config.get_template_observation()
+        edit_entry = observation["items"][0]
+        edit_entry["name"] = name
+        edit_entry["startTime"] = self._ftime(observation_times[0][0])
+        edit_entry["endTime"] = self._ftime(self._delay_observation_end_time(
+            max(times[1] for times in observation_times)))
+        edit_entry["center"] = target_name
+        edit_entry["trajectoryFrame"]["body"] = target_name
+        edit_entry["bodyFrame"]["body"] = target_name
+        for times in observation_times:
+            d = OrderedDict()
+            d["startTime"] = self._ftime(times[0])
+            d["endTime"] = self._ftime(times[1])
+            d["obsRate"] = 0
+            edit_entry["geometry"]["groups"].append(d)
+        edit_entry["geometry"]["footprintColor"] = color
+        edit_entry["geometry"]["sensor"] = sensor_name
+        return observation
+
+    def _bucket_observations(self, observation_list: List[tuple]) -> List[List[tuple]]:
+        """ Splits observations of a sensor into buckets of observation_bucket_hours, by start time.
+
+        Buckets are aligned to multiples of the bucket length since 1970, so that an observation ends up in the same
+        bucket regardless of the rest of the timeline. Empty buckets are left out.
+
+        :param observation_list: List of (start_time, end_time), sorted by start time.
+        :return: List of non-empty buckets, each a list of (start_time, end_time).
+        """
+        if self.observation_bucket_hours <= 0:
+            return [observation_list]
+        bucket_seconds = self.observation_bucket_hours * 3600
+        buckets = OrderedDict()
+        for times in observation_list:
+            bucket = int(calendar.timegm(times[0].utctimetuple()) // bucket_seconds)
+            buckets.setdefault(bucket, []).append(times)
+        return list(buckets.values())
+
+    def generate_solar_panel_kernel(self, observations, metakernel_file_path, ck_file_path,
+                                    output_folder_path,
+                                    extra_time_hours: float = None, step_size_s: float = None):
         if extra_time_hours is None:
             extra_time_hours = self.juice_config.get_solar_panel_ck_span_days() * 24.0 / 2
         if step_size_s is None:
             step_size_s = self.juice_config.get_solar_panel_ck_sampling_seconds()
-        spp = SolarPanelProcessor("JUICE")
-        spy.furnsh(metakernel_file_path)
-        spy.furnsh(ck_file_path)
-
+        spp = SolarPanelProcessor("JUICE", self.juice_config.get_ck_backend(),
+                                  self.juice_config.get_solar_panel_ck_workers(),
+                                  self.juice_config.get_solar_panel_ck_tolerance_deg())
         td = timedelta(hours=extra_time_hours)
         start_time = self._find_first_start_time(observations) - td
         end_time = self._find_last_end_time(observations) + td
 
-        spp.create_panel_ck(start_time, end_time, step_size_s,
-                            os.path.abspath(os.path.join(output_folder_path, 'spacecraft', 'solar_panel_kernel.ck')))
-        spy.unload(ck_file_path)
-        spy.unload(metakernel_file_path)
+        # the kernels are unloaded also after errors and cancellation, so that they don't affect later runs
+        spy.furnsh(metakernel_file_path)
+        try:
+            spy.furnsh(ck_file_path)
+            try:
+                spp.create_panel_ck(start_time, end_time, step_size_s,
+                                    os.path.abspath(os.path.join(output_folder_path, 'spacecraft',
+                                                                 'solar_panel_kernel.ck')),
+                                    [metakernel_file_path, ck_file_path])
+            finally:
+                spy.unload(ck_file_path)
+        finally:
+            spy.unload(metakernel_file_path)
 
         spacecraft_json_path = os.path.join(output_folder_path, "spacecraft", "spacecraft", "JUICE_panel_def.json")
         with open(spacecraft_json_path) as f:
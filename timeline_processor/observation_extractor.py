@@ -0,0 +1,62 @@
+from collections import OrderedDict
+from typing import Iterable, List, Union
+
+from timeline_processor.timeline_parser import Entry, TimelineEntries
+
+
+def extract_observations(entries: Union[TimelineEntries, Iterable[Entry]], instruments: List[str],
+                         mode_sensors: OrderedDict) -> OrderedDict:
+    """ Turns experiment mode entries into observations, in a single pass over all instruments.
+
+    Every instrument has its own state machine: a mode listed in mode_sensors switches the
+    instrument's sensor on, and the next entry of that instrument ends the observation. If the
+    next mode is listed as well, a new observation starts right away.
+
+    :param entries: Parsed entries, either columnar or as Entry namedtuples.
+    :param instruments: Instruments to extract observations for, i.e. ["JANUS", "MAJIS"]
+    :param mode_sensors: For each instrument, a dictionary of mode name to sensor name.
+    :return: OrderedDict[instrument_name, OrderedDict[sensor_name, list[(start_time, end_time)]]]
+    """
+    if isinstance(entries, TimelineEntries):
+        # work on IDs, timestamps are only turned into datetimes for the observations
+        rows = zip(entries.epochs, entries.instrument_ids, entries.mode_ids)
+        instrument_keys = [entries.instruments.get(instrument) for instrument in instruments]
+        sensor_tables = [{entries.modes.get(mode): sensor for mode, sensor in mode_sensors[instrument].items()}
+                         for instrument in instruments]
+        to_time = TimelineEntries.epoch_to_datetime
+    else:
+        rows = ((e.utc_timestamp, e.instrument_name, e.mode) for e in entries)
+        instrument_keys = list(instruments)
+        sensor_tables = [mode_sensors[instrument] for instrument in instruments]
+
+        def to_time(time):
+            return time
+
+    # state of each instrument: the sensor currently on (None if all are off), and since when
+    slots = {key: slot for slot, key in enumerate(instrument_keys) if key is not None}
+    current_sensors = [None] * len(instruments)
+    start_times = [None] * len(instruments)
+    sensor_observations = [OrderedDict() for _ in instruments]
+    for time, instrument, mode in rows:
+        slot = slots.get(instrument)
+        if slot is None:
+            continue
+        current_sensor = current_sensors[slot]
+        if current_sensor is not None:
+            # End current observation
+            observation_list = sensor_observations[slot].get(current_sensor)
+            if observation_list is None:
+                observation_list = sensor_observations[slot][current_sensor] = []
+            observation_list.append((to_time(start_times[slot]), to_time(time)))
+        # If the mode is in config file, we (re)start an observation, otherwise the sensor is off
+        sensor = sensor_tables[slot].get(mode)
+        current_sensors[slot] = sensor
+        if sensor is not None:
+            start_times[slot] = time
+
+    observations = OrderedDict()
+    for instrument, instrument_observations in zip(instruments, sensor_observations):
+        # instruments without any observation get no entry
+        if instrument_observations:
+            observations[instrument] = instrument_observations
+    return observations
@@ -1,8 +1,8 @@
 import os
 from collections import OrderedDict
-import simplejson as json
 
 from config import Config
+from scenario_processor.output_writer import OutputWriter
 
 
 class SensorGenerator:
@@ -26,13 +26,18 @@ class SensorGenerator:
             self.juice_config.get_sensor_colors()[instrument_name]
         return sensor_json
 
-    def generate_sensors(self, observation_dict: OrderedDict, target_name: str, output_folder_path: str) -> None:
+    def generate_sensors(self, observation_dict: OrderedDict, target_name: str, output_folder_path: str,
+                         writer: OutputWriter = None) -> None:
         """ Generates and saves all necessary sensor JSON files for given observation.
 
         :param observation_dict: Dictionary generated by TimelineProcessor
         :param target_name: Name of target body (e.g. "Callisto)
         :param output_folder_path: Path to already created output folder.
+        :param writer: (optional) Writer the files are queued to. By default they are written before returning.
         """
+        if writer is None:
+            with OutputWriter() as writer:
+                return self.generate_sensors(observation_dict, target_name, output_folder_path, writer)
         # If you change the filenames, you need to change the TimelineProcessor as well
         sensor_folder_path = os.path.abspath(os.path.join(output_folder_path, "sensors"))
         os.makedirs(sensor_folder_path)
@@ -41,5 +46,4 @@ class SensorGenerator:
                 sensor_json = self._generate_sensor_json(instrument_name,
                                                          sensor_name, target_name)
                 sensor_json_name = "sensor_{}_{}.json".format(sensor_name, target_name)
-                with open(os.path.join(sensor_folder_path, sensor_json_name), 'w+') as outfile:
-                    json.dump(sensor_json, outfile, indent=2)
+                writer.write_json(os.path.join(sensor_folder_path, sensor_json_name), sensor_json, "sensor")
@@ -0,0 +1,154 @@
+import unittest
+import calendar
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from config import Config
+from timeline_processor import TimelineProcessor
+from timeline_processor.observation_extractor import extract_observations
+from timeline_processor.timeline_parser import TimelineParser, TimelineSection
+
+DATA_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data')
+REPO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+class TimelineParserTests(unittest.TestCase):
+
+    def test_single_pass_parse(self):
+        timeline_path = os.path.join(DATA_PATH, 'timeline.asc')
+        parsed = TimelineParser(use_mmap=False).parse(timeline_path)
+        self.assertEqual(len(parsed.entries), 11)
+        self.assertEqual(parsed.entries[0], (datetime(2030, 10, 3, 0, 10), 'JANUS', 'SCI_F2_20pct'))
+        self.assertEqual(parsed.entries[-1], (datetime(2030, 10, 4, 4, 0), 'MAJIS', 'SCI_MC_MAX_20pct'))
+        self.assertEqual(parsed.sections, [TimelineSection(6, 0, 8), TimelineSection(22, 8, 11)])
+        # first start time, and last end time of the file
+        self.assertEqual(parsed.bounds, (datetime(2030, 10, 3), datetime(2030, 10, 4, 12)))
+
+        mapped = TimelineParser(use_mmap=True).parse(timeline_path)
+        self.assertEqual(list(mapped.entries), list(parsed.entries))
+        self.assertEqual(mapped.sections, parsed.sections)
+        self.assertEqual(mapped.bounds, parsed.bounds)
+
+    def test_columnar_entries(self):
+        entries = TimelineParser().parse(os.path.join(DATA_PATH, 'timeline.asc')).entries
+        self.assertEqual(entries.instruments.names, ['JANUS', 'MAJIS', 'UVS', 'GALA'])
+        self.assertEqual(list(entries.instrument_ids), [0, 1, 0, 0, 1, 2, 2, 3, 0, 0, 1])
+        self.assertEqual(entries.epochs[0], calendar.timegm((2030, 10, 3, 0, 10, 0)))
+        self.assertEqual(entries.modes.names[entries.mode_ids[3]], 'STANDBY')
+        self.assertEqual(entries.mode_ids[3], entries.mode_ids[4])
+
+    def test_instrument_filter(self):
+        parsed = TimelineParser(instruments=['MAJIS', 'GALA']).parse(os.path.join(DATA_PATH, 'timeline.asc'))
+        self.assertEqual(parsed.entries.instruments.names, ['MAJIS', 'GALA'])
+        self.assertEqual([entry.instrument_name for entry in parsed.entries], ['MAJIS', 'MAJIS', 'GALA', 'MAJIS'])
+        # sections keep their position, only with fewer entries
+        self.assertEqual(parsed.sections, [TimelineSection(6, 0, 3), TimelineSection(22, 3, 4)])
+
+    def test_timestamp_decoding(self):
+        header = [b'Start time (UTC): 01-jan-2030_00:00:00\n', b'End time (UTC): 31-DEC-2030_23:59:59\n']
+        parsed = TimelineParser.parse_lines(header)
+        self.assertEqual(parsed.bounds, (datetime(2030, 1, 1), datetime(2030, 12, 31, 23, 59, 59)))
+        for invalid in (b'30-Feb-2030_00:00:00', b'01-Foo-2030_00:00:00', b'01-Jan-2030_24:00:00',
+                        b'01-Jan-2030T00:00:00'):
+            with self.assertRaises(ValueError):
+                TimelineParser.parse_lines([b'Start time (UTC): ' + invalid + b'\n'] + header[1:])
+
+    def test_missing_bounds(self):
+        with self.assertRaises(ValueError):
+            TimelineParser.parse_lines([b'Experiment modes:\n', b'\n', b'\n', b'-----\n', b'\n'])
+        with self.assertRaises(ValueError):
+            TimelineParser.parse_lines([b'Experiment modes:\n', b'\n', b'\n', b'no separator\n'])
+
+
+class ObservationTests(unittest.TestCase):
+
+    def setUp(self):
+        # Config saves the temporary config on creation, so it works on a copy
+        self.tmp_dir = tempfile.mkdtemp()
+        for file_name in ('config_static.ini', 'config_temp.ini'):
+            shutil.copy(os.path.join(REPO_PATH, file_name), self.tmp_dir)
+        self.config = Config(self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_observations_per_sensor(self):
+        processor = TimelineProcessor(self.config, ['JANUS', 'MAJIS', 'UVS', 'GALA'])
+        parsed = TimelineParser().parse(os.path.join(DATA_PATH, 'timeline.asc'))
+        observations = processor._process_parsed_lines_into_observations(parsed.entries)
+        self.assertEqual(list(observations.keys()), ['JANUS', 'MAJIS', 'UVS'])
+        self.assertEqual(observations['JANUS']['JUICE_JANUS'], [
+            (datetime(2030, 10, 3, 0, 10), datetime(2030, 10, 3, 0, 20)),
+            (datetime(2030, 10, 3, 0, 20), datetime(2030, 10, 3, 0, 30)),
+            (datetime(2030, 10, 4, 3, 0), datetime(2030, 10, 4, 3, 40)),
+        ])
+        # an observation still running at the end of the timeline is dropped
+        self.assertEqual(observations['MAJIS'], {
+            'JUICE_MAJIS_VISNIR': [(datetime(2030, 10, 3, 0, 12), datetime(2030, 10, 3, 0, 31))]})
+        self.assertEqual(observations['UVS'], {
+            'JUICE_UVS_AP': [(datetime(2030, 10, 3, 1, 0), datetime(2030, 10, 3, 1, 30))]})
+
+        # namedtuple entries give the same observations as the columnar ones
+        self.assertEqual(extract_observations(list(parsed.entries), processor.instruments,
+                                              self.config.get_mode_sensors()), observations)
+
+    def _write_observation_files(self, processor: TimelineProcessor, output_name: str) -> dict:
+        output_path = os.path.join(self.tmp_dir, output_name)
+        os.makedirs(output_path)
+        require_json_path = os.path.join(output_path, 'LOAD_SCENARIO.json')
+        with open(require_json_path, 'w') as f:
+            json.dump({"require": []}, f)
+        parsed = TimelineParser().parse(os.path.join(DATA_PATH, 'timeline.asc'))
+        observations = processor._process_parsed_lines_into_observations(parsed.entries)
+        processor._generate_observation_files(observations, 'Ganymede', require_json_path)
+        with open(require_json_path) as f:
+            required = json.load(f)["require"]
+        groups = {}
+        for path in required:
+            if path.startswith('observations/'):
+                with open(os.path.join(output_path, path)) as f:
+                    groups[path] = json.load(f)["items"][0]["geometry"]["groups"]
+        return groups
+
+    def test_observation_layouts(self):
+        processor = TimelineProcessor(self.config, ['JANUS', 'MAJIS', 'UVS'])
+        self.assertEqual(processor.observation_layout, 'per_observation')
+        per_observation = self._write_observation_files(processor, 'per_observation')
+        self.assertEqual(len(per_observation), 5)
+        self.assertTrue(all(len(groups) == 1 for groups in per_observation.values()))
+
+        processor.observation_layout = 'per_sensor'
+        per_sensor = self._write_observation_files(processor, 'per_sensor')
+        self.assertEqual(sorted(per_sensor.keys()), ['observations/JUICE_GEN_OBS_JUICE_JANUS.json',
+                                                     'observations/JUICE_GEN_OBS_JUICE_MAJIS_VISNIR.json',
+                                                     'observations/JUICE_GEN_OBS_JUICE_UVS_AP.json'])
+        # same groups, only in fewer files
+        self.assertEqual(sorted(g['startTime'] for groups in per_sensor.values() for g in groups),
+                         sorted(g['startTime'] for groups in per_observation.values() for g in groups))
+
+        # JANUS observations are on two days
+        processor.observation_bucket_hours = 24
+        bucketed = self._write_observation_files(processor, 'buckets')
+        self.assertEqual([len(bucketed['observations/JUICE_GEN_OBS_JUICE_JANUS_{}.json'.format(i)]) for i in (0, 1)],
+                         [2, 1])
+
+        processor.observation_layout = 'per_file'
+        with self.assertRaises(ValueError):
+            self._write_observation_files(processor, 'unknown')
+
+
+def suite():
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(TimelineParserTests),
+                               loader.loadTestsFromTestCase(ObservationTests)])
+
+
+def main():
+    unittest.TextTestRunner(verbosity=1).run(suite())
+
+
+if __name__ == '__main__':
+    main()
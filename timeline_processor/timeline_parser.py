@@ -0,0 +1,250 @@
+import calendar
+import mmap
+import os
+from array import array
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Tuple
+
+from instrumentation.cancellation import check_cancelled
+
+Entry = namedtuple('Entry', ['utc_timestamp', 'instrument_name', 'mode'])
+
+# One "Experiment modes:" section of the dump: line number of its title line (0-based),
+# and the range of its entries in ParsedTimeline.entries
+TimelineSection = namedtuple('TimelineSection', ['line_number', 'first_entry', 'end_entry'])
+
+TIMELINE_TIME_FORMAT = "%d-%b-%Y_%H:%M:%S"
+_POSIX_EPOCH = datetime(1970, 1, 1)
+# Month abbreviations as in the TIMELINE_TIME_FORMAT timestamps
+_MONTHS = {name.encode(): number for number, name in enumerate(calendar.month_abbr) if name}
+# cancellation is checked once per 2 ** 16 lines
+_CANCEL_CHECK_MASK = (1 << 16) - 1
+
+
+class SymbolTable:
+    """ Interns strings, each distinct string gets a small integer ID. """
+
+    def __init__(self):
+        self.names = []
+        self._ids = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def intern(self, name: str) -> int:
+        symbol_id = self._ids.get(name)
+        if symbol_id is None:
+            symbol_id = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol_id
+
+    def get(self, name: str, default: int = None) -> int:
+        """ :return: ID of the name, or default if it was never interned. """
+        return self._ids.get(name, default)
+
+
+class TimelineEntries:
+    """ Compact columnar storage of experiment mode entries.
+
+    Timestamps are kept as POSIX seconds, and instrument and mode names as IDs into symbol
+    tables. Entry namedtuples are only created when entries are accessed one by one.
+    """
+
+    def __init__(self):
+        self.epochs = array('q')
+        self.instrument_ids = array('I')
+        self.mode_ids = array('I')
+        self.instruments = SymbolTable()
+        self.modes = SymbolTable()
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def __getitem__(self, index: int) -> Entry:
+        return Entry(self.epoch_to_datetime(self.epochs[index]),
+                     self.instruments.names[self.instrument_ids[index]],
+                     self.modes.names[self.mode_ids[index]])
+
+    def __iter__(self) -> Iterator[Entry]:
+        return (self[i] for i in range(len(self)))
+
+    @staticmethod
+    def epoch_to_datetime(epoch: int) -> datetime:
+        """ :return: Naive UTC datetime of POSIX seconds, as the timestamps of Entry. """
+        return _POSIX_EPOCH + timedelta(seconds=epoch)
+
+    def append(self, epoch: int, instrument_id: int, mode_id: int) -> None:
+        """ Appends an entry, with instrument and mode IDs from the symbol tables of this object. """
+        self.epochs.append(epoch)
+        self.instrument_ids.append(instrument_id)
+        self.mode_ids.append(mode_id)
+
+
+class ParsedTimeline:
+    """ Everything the scenario generation needs from a MAPPS Timeline Dump, collected in one pass. """
+
+    def __init__(self, entries: TimelineEntries, sections: List[TimelineSection],
+                 start_time: datetime, end_time: datetime):
+        """
+        :param entries: Experiment mode entries of all sections, in file order.
+        :param sections: Experiment modes sections of the file.
+        :param start_time: First "Start time (UTC):" of the file.
+        :param end_time: Last "End time (UTC):" following the start time.
+        """
+        self.entries = entries
+        self.sections = sections
+        self.start_time = start_time
+        self.end_time = end_time
+
+    @property
+    def bounds(self) -> Tuple[datetime, datetime]:
+        """ :return: 2-tuple of start and end time of the timeline, used when there are no observations. """
+        return self.start_time, self.end_time
+
+
+class TimelineParser:
+    """ Streaming parser of MAPPS Timeline Dump .asc files.
+
+    The file is read once, line by line. Large files are memory-mapped, which avoids
+    copying them through Python's file buffers.
+    """
+
+    EXPERIMENT_MODES_TITLE = b"Experiment modes:"
+    START_TIME_TITLE = b"Start time (UTC):"
+    END_TIME_TITLE = b"End time (UTC):"
+    # Files of at least this size are memory-mapped by default
+    MMAP_THRESHOLD_BYTES = 64 * 1024 ** 2
+    SKIPPED = -1
+
+    def __init__(self, use_mmap: bool = None, instruments: Iterable[str] = None):
+        """
+        :param use_mmap: (optional) Whether to memory-map the file. By default only large files are mapped.
+        :param instruments: (optional) If given, only entries of these instruments are kept, others are
+                            skipped without decoding them.
+        """
+        self.use_mmap = use_mmap
+        self.instruments = frozenset(instruments) if instruments is not None else None
+
+    def parse(self, timeline_file_path: str) -> ParsedTimeline:
+        """
+        :param timeline_file_path: Path to MAPPS Timeline Dump .asc file.
+        :return: Parsed timeline.
+        """
+        size = os.path.getsize(timeline_file_path)
+        use_mmap = size >= TimelineParser.MMAP_THRESHOLD_BYTES if self.use_mmap is None else self.use_mmap
+        with open(timeline_file_path, 'rb') as f:
+            # empty files can't be mapped
+            if use_mmap and size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return self.parse_lines(iter(mapped.readline, b''), self.instruments)
+            return self.parse_lines(f, self.instruments)
+
+    @staticmethod
+    def parse_lines(lines: Iterable[bytes], instruments: Iterable[str] = None) -> ParsedTimeline:
+        """ Parses the lines of a MAPPS Timeline Dump.
+
+        :param lines: Iterable of lines as bytes, including line endings.
+        :param instruments: (optional) If given, only entries of these instruments are kept.
+        :return: Parsed timeline.
+        """
+        entries = TimelineEntries()
+        sections = []
+        start_time, end_time = None, None
+        decoder = _TimestampDecoder()
+        # raw instrument and mode columns, mapped straight to their IDs without decoding each line.
+        # Instruments that are filtered out map to SKIPPED.
+        instrument_ids = {}
+        mode_ids = {}
+        lines = iter(lines)
+        line_number = -1
+        for line in lines:
+            line_number += 1
+            if not line_number & _CANCEL_CHECK_MASK:
+                check_cancelled()
+            if start_time is None:
+                if line.startswith(TimelineParser.START_TIME_TITLE):
+                    start_time = decoder.datetime(line[18:38], line_number)
+            elif line.startswith(TimelineParser.END_TIME_TITLE):
+                end_time = decoder.datetime(line[16:36], line_number)
+            if not line.startswith(TimelineParser.EXPERIMENT_MODES_TITLE):
+                continue
+
+            # Skip 3 lines, while checking that the third line is filled with ------
+            title_line_number = line_number
+            header = [next(lines, b'') for _ in range(3)]
+            line_number += 3
+            if not header[2].startswith(b"-----"):
+                raise ValueError("Error in parsing file. Could not find start of Experiment modes section.")
+            first_entry = len(entries)
+            for line in lines:
+                line_number += 1
+                if not line_number & _CANCEL_CHECK_MASK:
+                    check_cancelled()
+                # the section ends at a line that only has a newline character
+                if len(line) < 3:
+                    break
+                instrument_field = line[36:46]
+                instrument_id = instrument_ids.get(instrument_field)
+                if instrument_id is None:
+                    instrument_name = instrument_field.decode().rstrip()
+                    if instruments is not None and instrument_name not in instruments:
+                        instrument_id = TimelineParser.SKIPPED
+                    else:
+                        instrument_id = entries.instruments.intern(instrument_name)
+                    instrument_ids[instrument_field] = instrument_id
+                if instrument_id == TimelineParser.SKIPPED:
+                    continue
+                mode_field = line[74:91]
+                mode_id = mode_ids.get(mode_field)
+                if mode_id is None:
+                    mode_id = mode_ids[mode_field] = entries.modes.intern(mode_field.decode().rstrip())
+                entries.append(decoder.epoch(line, line_number), instrument_id, mode_id)
+            sections.append(TimelineSection(title_line_number, first_entry, len(entries)))
+
+        if start_time is None or end_time is None:
+            raise ValueError("Error in parsing MAPPS Timeline Dump .asc file. "
+                             "Start and end of timeline could not be identified.")
+        return ParsedTimeline(entries, sections, start_time, end_time)
+
+
+class _TimestampDecoder:
+    """ Decodes fixed-column 'DD-Mon-YYYY_hh:mm:ss' timestamps into POSIX seconds.
+
+    The date part is looked up in a month table, and each distinct date is converted only once.
+    """
+
+    def __init__(self):
+        self._days = {}
+
+    def epoch(self, field: bytes, line_number: int) -> int:
+        """
+        :param field: Bytes starting with the timestamp.
+        :param line_number: Line number for error messages (0-based).
+        :return: POSIX seconds of the timestamp.
+        """
+        day_start = self._days.get(field[0:11])
+        try:
+            if day_start is None:
+                day_start = self._days[field[0:11]] = self._day_start(field)
+            if field[11:12] != b'_' or field[14:15] != b':' or field[17:18] != b':':
+                raise ValueError
+            hour, minute, second = int(field[12:14]), int(field[15:17]), int(field[18:20])
+            if hour > 23 or minute > 59 or second > 59:
+                raise ValueError
+        except (ValueError, KeyError):
+            raise ValueError("Invalid time '{}' on line {} of MAPPS Timeline Dump, expected format {}."
+                             .format(field[0:20].decode(errors='replace'), line_number + 1,
+                                     TIMELINE_TIME_FORMAT)) from None
+        return day_start + hour * 3600 + minute * 60 + second
+
+    def datetime(self, field: bytes, line_number: int) -> datetime:
+        return _POSIX_EPOCH + timedelta(seconds=self.epoch(field, line_number))
+
+    @staticmethod
+    def _day_start(field: bytes) -> int:
+        if field[2:3] != b'-' or field[6:7] != b'-':
+            raise ValueError
+        # datetime validates the day of the month
+        date = datetime(int(field[7:11]), _MONTHS[field[3:6].capitalize()], int(field[0:2]))
+        return calendar.timegm(date.timetuple())
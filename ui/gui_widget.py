@@ -9,7 +9,8 @@ from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 
 from config import Config
-from worker_thread import TaskRunner, WorkingMessage
+from generation_pipeline import parse_start_time, START_TIME_FORMAT
+from worker_thread import CANCELLED_EXIT_CODE, TaskRunner, WorkingMessage
 from ui.juice_win_converter import Ui_Form
 from scenario_processor import ScenarioProcessor
 from timeline_processor import TimelineProcessor
@@ -42,6 +43,7 @@ class MappsConverter(QWidget):
         self.form.le_ObsDecayTimeMin.setText(str(self.juice_config.get_observation_lifetime()))
 
         self.form.cb_solarPanels.setChecked(self.juice_config.get_is_solar_panel_rotation_enabled())
+        self.form.cb_updateExisting.setChecked(self.juice_config.get_is_incremental_update_enabled())
 
         # populate target combobox
         self.form.comboBox_targetList.clear()
@@ -157,6 +159,8 @@ class MappsConverter(QWidget):
         self.task_runner = TaskRunner(self)
         self.busy_widget = WorkingMessage("Working")
         self.task_runner.set_message_function(self.busy_widget.set_message)
+        self.task_runner.set_progress_function(self.busy_widget.set_progress)
+        self.busy_widget.set_cancel_function(self.task_runner.cancel)
         self.task_runner.finished.connect(self.loading_stop)
         self.task_runner.start()
         self.busy_widget.show()
@@ -164,12 +168,8 @@ class MappsConverter(QWidget):
     def parse_custom_start_time(self) -> Union[datetime, None]:
         if not self.form.cb_startTime.isChecked():
             return None
-        start_time_string = self.form.le_StartTime.text()
-        try:
-            dt = datetime.strptime(start_time_string, "%Y-%m-%dT%H:%M:%S")
-        except ValueError:
-            raise ValueError("Error while parsing custom start time. Entry should have format '%YYYY-%MM-%DDT%hh:%mm:%ss'.")
-        self.juice_config.set_custom_start_time(dt.strftime("%Y-%m-%dT%H:%M:%S"))
+        dt = parse_start_time(self.form.le_StartTime.text())
+        self.juice_config.set_custom_start_time(dt.strftime(START_TIME_FORMAT))
         return dt
 
     def _verify_file_existence(self) -> None:
@@ -201,6 +201,9 @@ class MappsConverter(QWidget):
         """
         self.busy_widget.loading_stop()
         self.task_runner.quit()
+        if self.exit_message[0] == CANCELLED_EXIT_CODE:
+            QMessageBox.information(self, "Cancelled", self.exit_message[1], QMessageBox.Ok, QMessageBox.Ok)
+            return
         # if we had an error, display it
         if self.exit_message[0] != 0:
             response = QMessageBox.warning(self, "Error", self.exit_message[1],
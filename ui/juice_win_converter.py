@@ -108,6 +108,9 @@ class Ui_Form(object):
         self.cb_solarPanels = QtWidgets.QCheckBox(Form)
         self.cb_solarPanels.setGeometry(QtCore.QRect(200, 440, 151, 31))
         self.cb_solarPanels.setObjectName("cb_solarPanels")
+        self.cb_updateExisting = QtWidgets.QCheckBox(Form)
+        self.cb_updateExisting.setGeometry(QtCore.QRect(630, 190, 221, 31))
+        self.cb_updateExisting.setObjectName("cb_updateExisting")
 
         self.retranslateUi(Form)
         self.pb_MappsAttitude.clicked.connect(Form.browse_attitude)
@@ -139,4 +142,6 @@ class Ui_Form(object):
         self.pb_OutputFolderPath.setText(_translate("Form", "Browse"))
         self.label_8.setText(_translate("Form", "Output folder name:"))
         self.cb_solarPanels.setText(_translate("Form", "Solar panel rotation"))
+        self.cb_updateExisting.setToolTip(_translate("Form", "Update the scenario in this folder, and only regenerate the files whose inputs changed"))
+        self.cb_updateExisting.setText(_translate("Form", "Update existing folder"))
 
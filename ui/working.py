@@ -12,7 +12,7 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 class Ui_Dialog(object):
     def setupUi(self, Dialog):
         Dialog.setObjectName("Dialog")
-        Dialog.resize(262, 104)
+        Dialog.resize(262, 180)
         Dialog.setModal(True)
         self.info_label = QtWidgets.QLabel(Dialog)
         self.info_label.setGeometry(QtCore.QRect(20, 20, 221, 21))
@@ -24,6 +24,16 @@ class Ui_Dialog(object):
         self.progressBar.setProperty("value", -1)
         self.progressBar.setTextVisible(False)
         self.progressBar.setObjectName("progressBar")
+        self.progress_label = QtWidgets.QLabel(Dialog)
+        self.progress_label.setGeometry(QtCore.QRect(20, 90, 221, 41))
+        self.progress_label.setText("")
+        self.progress_label.setAlignment(QtCore.Qt.AlignHCenter|QtCore.Qt.AlignTop)
+        self.progress_label.setWordWrap(True)
+        self.progress_label.setObjectName("progress_label")
+        self.cancel_button = QtWidgets.QPushButton(Dialog)
+        self.cancel_button.setGeometry(QtCore.QRect(90, 140, 81, 23))
+        self.cancel_button.setAutoDefault(False)
+        self.cancel_button.setObjectName("cancel_button")
 
         self.retranslateUi(Dialog)
         QtCore.QMetaObject.connectSlotsByName(Dialog)
@@ -32,4 +42,5 @@ class Ui_Dialog(object):
         _translate = QtCore.QCoreApplication.translate
         Dialog.setWindowTitle(_translate("Dialog", "Dialog"))
         self.info_label.setText(_translate("Dialog", "Working..."))
+        self.cancel_button.setText(_translate("Dialog", "Cancel"))
 
@@ -6,21 +6,31 @@ from PyQt5 import QtCore, QtWidgets
 from PyQt5.QtCore import QThread
 
 from ui.working import Ui_Dialog
-from attitude_converter import convert
+from generation_pipeline import ScenarioJob, run_job
+from instrumentation.cancellation import CancellationToken, GenerationCancelled
+from instrumentation.progress import ProgressEvent, format_event
 
-from typing import Tuple, TYPE_CHECKING
+from typing import Callable, Tuple, TYPE_CHECKING
 # workaround to make type checking work with circular imports
 if TYPE_CHECKING:
     from ui.gui_widget import MappsConverter
 
 
-def generation_task(gui: 'MappsConverter', display_function = None) -> Tuple[int, str, str]:
+# exit code of generation_task when the user cancelled the generation
+CANCELLED_EXIT_CODE = 2
+
+
+def generation_task(gui: 'MappsConverter', display_function = None,
+                    progress_function: Callable[[ProgressEvent], None] = None,
+                    cancel_token: CancellationToken = None) -> Tuple[int, str, str]:
     """ Generates the scenario from inputs.
-    First, parse all file names. Then, use MEX2KER to convert MAPPS attitude into
-    a CK kernel. Generate a scenario using the MAPPS timeline, and put all necessary
-    include files into the folder.
+    First, parse all GUI values into a ScenarioJob. Then run the job, as generation_pipeline
+    does without the GUI.
 
     :param gui: Instance of main GUI
+    :param display_function: (optional) Function that displays status messages.
+    :param progress_function: (optional) Function that displays progress events of long stages.
+    :param cancel_token: (optional) Token to cancel the generation, e.g. from the working dialog.
     :return: Return 3-tuple in format (exit_code, message, scenario_file_path)
     """
     def display_status(message):
@@ -30,48 +40,42 @@ def generation_task(gui: 'MappsConverter', display_function = None) -> Tuple[int
         except Exception:
             pass
 
+    def display_progress(event):
+        print(format_event(event))
+        if progress_function is not None:
+            progress_function(event)
+
     try:
         display_status("Parsing GUI values.")
-        gui.parse_instrument_checkboxes()
-        target_name = gui.form.comboBox_targetList.currentText()
-        gui.juice_config.set_selected_target(target_name)
-
-        apply_solar_panels = gui.form.cb_solarPanels.isChecked()
-        gui.juice_config.set_is_solar_panel_rotation_enabled(apply_solar_panels)
-
-        obs_lifetime_min = int(gui.form.le_ObsDecayTimeMin.text())
-        if obs_lifetime_min < 0:
-            raise ValueError("Observation decay time can't be negative.")
-        gui.timeline_processor.set_observation_lifetime_seconds(60 * obs_lifetime_min)
-        gui.juice_config.set_observation_lifetime_min(obs_lifetime_min)
-
-        ck_file_name = 'mapps_attitude_kernel.ck'
-        attitude_file = gui.form.le_MappsAttitude.text()
-        metakernel_file = gui.form.le_Metakernel.text()
-        timeline_file = gui.form.le_MappsTimeline.text()
-        output_folder_path = gui.form.le_OutputFolderPath.text()
-        output_folder_name = gui.form.le_OutputFolderName.text()
-        gui.juice_config.set_last_output_folder(output_folder_name)
-
-        real_folder_path = create_output_folder(os.path.join(output_folder_path, output_folder_name))
-        print("Created scenario directory: {}".format(real_folder_path))
-
-        display_status("Generating CK kernel.")
-        output_ck_path = os.path.abspath(os.path.join(real_folder_path, ck_file_name))
-        print("Generating CK kernel: {}".format(output_ck_path))
-        convert(attitude_file, output_ck_path)
-
-        display_status("Generating scenario file.")
-        if apply_solar_panels:
-            display_status("Generating solar panel kernel.")
-        new_scenario_file_path = gui.scenario_processor.process_scenario(
-            metakernel_file, real_folder_path, ck_file_name, apply_solar_panels)
-        print("Generating scenario file: {}".format(new_scenario_file_path))
-        gui.timeline_processor.process_scenario(target_name, timeline_file,
-                                                new_scenario_file_path, gui.parse_custom_start_time(),
-                                                apply_solar_panels, metakernel_file,
-                                                os.path.abspath(os.path.join(real_folder_path, ck_file_name)))
+        # GUI values are remembered in the temporary config, which is written once
+        with gui.juice_config.transaction():
+            gui.parse_instrument_checkboxes()
+            target_name = gui.form.comboBox_targetList.currentText()
+            gui.juice_config.set_selected_target(target_name)
+
+            apply_solar_panels = gui.form.cb_solarPanels.isChecked()
+            gui.juice_config.set_is_solar_panel_rotation_enabled(apply_solar_panels)
+
+            obs_lifetime_min = int(gui.form.le_ObsDecayTimeMin.text())
+            gui.timeline_processor.set_observation_lifetime_seconds(60 * obs_lifetime_min)
+            gui.juice_config.set_observation_lifetime_min(obs_lifetime_min)
+
+            output_folder_path = gui.form.le_OutputFolderPath.text()
+            output_folder_name = gui.form.le_OutputFolderName.text()
+            gui.juice_config.set_last_output_folder(output_folder_name)
+            update_existing = gui.form.cb_updateExisting.isChecked()
+            gui.juice_config.set_is_incremental_update_enabled(update_existing)
+            job = ScenarioJob(gui.form.le_MappsAttitude.text(), gui.form.le_MappsTimeline.text(),
+                              gui.form.le_Metakernel.text(), os.path.join(output_folder_path, output_folder_name),
+                              target_name, tuple(gui.timeline_processor.instruments), obs_lifetime_min,
+                              apply_solar_panels, gui.parse_custom_start_time(), update_existing)
+
+        new_scenario_file_path = run_job(gui.juice_config, job, display_status,
+                                         progress_function=display_progress, cancel_token=cancel_token)
         print("Finished.")
+    except GenerationCancelled:
+        print("Generation cancelled.")
+        msg = (CANCELLED_EXIT_CODE, "Generation cancelled.", "")
     except Exception as e:
         msg = (1, traceback.format_exc(0) + "\nSee console for more details.", "")
         traceback.print_exc()
@@ -80,18 +84,6 @@ def generation_task(gui: 'MappsConverter', display_function = None) -> Tuple[int
     return msg
 
 
-def create_output_folder(output_folder_path: str) -> str:
-    if not os.path.exists(output_folder_path):
-        os.makedirs(output_folder_path)
-        return output_folder_path
-    else:
-        for i in range(1000):
-            new_path = os.path.join(os.path.dirname(output_folder_path),os.path.basename(output_folder_path) + f"_{i:03d}")
-            if not os.path.exists(new_path):
-                os.makedirs(new_path)
-                return new_path
-        raise RuntimeError(f"Could not create folder {output_folder_path}")
-
 class TaskRunner(QThread):
     """
     Thread that actually executes the generation_task
@@ -100,16 +92,25 @@ class TaskRunner(QThread):
         super(TaskRunner, self).__init__()
         self.gui = gui
         self._message_function = None
+        self._progress_function = None
+        self.cancel_token = CancellationToken()
 
     def run(self):
         """Execute the generation_task, and dump the exit message back to
         the gui."""
-        msg = generation_task(self.gui, self._message_function)
+        msg = generation_task(self.gui, self._message_function, self._progress_function, self.cancel_token)
         self.dump_msg(msg)
 
+    def cancel(self):
+        """ Asks the generation to stop. It stops at its next cancellation check, within a second. """
+        self.cancel_token.cancel()
+
     def set_message_function(self, message_function):
         self._message_function = message_function
 
+    def set_progress_function(self, progress_function: Callable[[ProgressEvent], None]):
+        self._progress_function = progress_function
+
     def dump_msg(self, msg: Tuple[int, str, str]):
         self.gui.set_exit_message(msg)
 
@@ -123,8 +124,14 @@ class WorkingMessage(QtWidgets.QDialog):
         # Initialize Values
         self.o_msg = msg
         self.val = 0
+        # latest progress event of the current stage, set by the worker thread and shown by the timer
+        self.progress_event = None
+        self._cancel_function = None
+        self.cancelling = False
 
         self.dialog.info_label.setText(msg)
+        self.dialog.cancel_button.setEnabled(False)
+        self.dialog.cancel_button.clicked.connect(self.cancel)
 
         self.timer = QtCore.QTimer()
         self.timer.setInterval(250)
@@ -132,9 +139,30 @@ class WorkingMessage(QtWidgets.QDialog):
         self.timer.start()
 
     def set_message(self, status: str):
+        if self.cancelling:
+            return
         self.o_msg = status
+        self.progress_event = None
+        self.update_message()
+
+    def set_cancel_function(self, cancel_function: Callable[[], None]):
+        """ :param cancel_function: Function called by the Cancel button, which is disabled without it. """
+        self._cancel_function = cancel_function
+        self.dialog.cancel_button.setEnabled(cancel_function is not None)
+
+    def cancel(self):
+        if self._cancel_function is None or self.cancelling:
+            return
+        self.cancelling = True
+        self._cancel_function()
+        self.dialog.cancel_button.setEnabled(False)
+        self.o_msg = "Cancelling"
+        self.progress_event = None
         self.update_message()
 
+    def set_progress(self, event: ProgressEvent):
+        self.progress_event = event
+
     def update_message(self):
         if self.val < 3:
             self.val += 1
@@ -144,6 +172,16 @@ class WorkingMessage(QtWidgets.QDialog):
         msg = self.o_msg + "." * self.val
         self.dialog.info_label.setText(msg)
 
+        event = self.progress_event
+        if event is not None and event.total and event.done < event.total:
+            self.dialog.progressBar.setMaximum(1000)
+            self.dialog.progressBar.setValue(int(1000 * event.done / event.total))
+            self.dialog.progress_label.setText(format_event(event))
+        else:
+            # busy indicator while there is no progress to show
+            self.dialog.progressBar.setMaximum(0)
+            self.dialog.progress_label.setText("")
+
     def loading_stop(self):
         self.timer.stop()
         self.destroy()